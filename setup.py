@@ -53,7 +53,8 @@ setup(
     ],
     platforms=['Any'],
     scripts=[
-        'bin/st2-apply-rbac-definitions'
+        'bin/st2-apply-rbac-definitions',
+        'bin/st2-rbac-indexes'
     ],
     provides=['st2rbac_backend'],
     packages=find_packages(),
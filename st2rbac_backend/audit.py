@@ -0,0 +1,319 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module for auditing RBAC permission check decisions.
+
+Decision records are produced by the decision trace hooks (see st2rbac_backend.trace) and added to
+a bounded in-memory buffer. The buffer is flushed in batches by a background worker so writing
+audit records never blocks the request path. When the buffer is full, new records are dropped and
+counted instead.
+"""
+
+from __future__ import absolute_import
+
+import json
+import atexit
+import threading
+import collections
+import logging as stdlib_logging
+from logging.handlers import RotatingFileHandler
+
+import mongoengine as me
+from oslo_config import cfg
+
+from st2common import log as logging
+from st2common.models.db import stormbase
+
+from st2rbac_backend import trace as decision_trace
+
+__all__ = [
+    'RBACAuditDB',
+
+    'DecisionAuditSink',
+    'FileAuditWriter',
+    'MongoAuditWriter',
+
+    'setup_audit_sink',
+    'get_audit_sink'
+]
+
+LOG = logging.getLogger(__name__)
+
+# Process wide audit sink (if auditing is enabled)
+_AUDIT_SINK = {
+    'sink': None
+}
+
+
+class RBACAuditDB(stormbase.StormFoundationDB):
+    timestamp = me.FloatField(required=True)
+    user = me.StringField()
+    permission_type = me.StringField()
+    resource_uid = me.StringField()
+    outcome = me.BooleanField()
+    matched = me.StringField()
+    latency_ms = me.FloatField()
+
+    meta = {
+        'collection': 'rbac_audit',
+        'indexes': [
+            {'fields': ['timestamp']},
+            {'fields': ['user']}
+        ]
+    }
+
+
+class FileAuditWriter(object):
+    """
+    Writer which writes audit records as JSON lines to a size based rotating file.
+    """
+
+    def __init__(self, file_path, max_bytes=0, backup_count=0):
+        self._handler = RotatingFileHandler(file_path, maxBytes=max_bytes,
+                                            backupCount=backup_count, delay=True)
+
+    def write(self, records):
+        for record in records:
+            line = json.dumps(record, sort_keys=True)
+            self._handler.emit(stdlib_logging.makeLogRecord({'msg': line}))
+
+    def close(self):
+        self._handler.close()
+
+
+class MongoAuditWriter(object):
+    """
+    Writer which writes audit records to a database collection using a single insert per batch.
+    """
+
+    def __init__(self, collection_name=None):
+        self._collection_name = collection_name or RBACAuditDB._get_collection_name()
+        self._collection = None
+
+    def write(self, records):
+        collection = self._get_collection()
+
+        # insert_many mutates the documents (adds _id) so we pass in copies
+        collection.insert_many([dict(record) for record in records], ordered=False)
+
+    def close(self):
+        pass
+
+    def _get_collection(self):
+        """
+        Return the configured collection and make sure it has the same indexes as the model
+        collection.
+
+        Note: Collection is retrieved directly from the database so the default model collection
+        isn't created when a different collection is configured. Collection is resolved lazily
+        (on the first write) since the database connection is not necessarily established yet
+        when the writer is set up.
+        """
+        if self._collection is None:
+            collection = RBACAuditDB._get_db()[self._collection_name]
+
+            for index in RBACAuditDB._meta['indexes']:
+                collection.create_index([(field, 1) for field in index['fields']],
+                                        background=True)
+
+            self._collection = collection
+
+        return self._collection
+
+
+class DecisionAuditSink(object):
+    """
+    Bounded buffer of decision audit records which is flushed in batches by a background worker.
+    """
+
+    def __init__(self, writer, buffer_size=10000, batch_size=500, flush_interval=1.0):
+        """
+        :param writer: Object with "write(records)" and "close()" method.
+
+        :param buffer_size: Maximum number of buffered records.
+        :type buffer_size: ``int``
+
+        :param batch_size: Maximum number of records passed to a single write() call.
+        :type batch_size: ``int``
+
+        :param flush_interval: How often (in seconds) the buffer is flushed.
+        :type flush_interval: ``float``
+        """
+        self.writer = writer
+        self.buffer_size = max(1, buffer_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        # Note: _lock guards the buffer and the stats and is only held for the duration of the
+        # buffer and counter updates, never while writing. _flush_lock serializes the flushes.
+        self._buffer = collections.deque()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+        self._stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'written': 0,
+            'batches': 0,
+            'failed': 0
+        }
+
+    def enqueue(self, record):
+        """
+        Add record to the buffer.
+
+        :return: False if the buffer is full and the record has been dropped.
+        :rtype: ``bool``
+        """
+        with self._lock:
+            if len(self._buffer) >= self.buffer_size:
+                self._stats['dropped'] += 1
+                return False
+
+            self._buffer.append(record)
+            self._stats['enqueued'] += 1
+            batch_ready = len(self._buffer) >= self.batch_size
+
+        if batch_ready:
+            self._wakeup.set()
+
+        return True
+
+    def flush(self):
+        """
+        Write all the buffered records.
+
+        :return: Number of written records.
+        :rtype: ``int``
+        """
+        written = 0
+
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = []
+
+                    while self._buffer and len(batch) < self.batch_size:
+                        batch.append(self._buffer.popleft())
+
+                if not batch:
+                    break
+
+                try:
+                    self.writer.write(batch)
+                except Exception:
+                    LOG.exception('Failed to write %s RBAC audit records' % (len(batch)))
+
+                    with self._lock:
+                        self._stats['failed'] += len(batch)
+
+                    continue
+
+                written += len(batch)
+
+                with self._lock:
+                    self._stats['written'] += len(batch)
+                    self._stats['batches'] += 1
+
+        return written
+
+    def start(self):
+        if self._thread:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='st2rbac-audit')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Stop the background worker and write the remaining buffered records.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+        self.flush()
+        self.writer.close()
+
+    def get_stats(self):
+        """
+        :rtype: ``dict``
+        """
+        with self._lock:
+            result = dict(self._stats)
+            result['pending'] = len(self._buffer)
+
+        return result
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def __repr__(self):
+        return ('<DecisionAuditSink writer=%s,buffer_size=%s,pending=%s>' %
+                (self.writer.__class__.__name__, self.buffer_size, len(self._buffer)))
+
+
+def setup_audit_sink():
+    """
+    Set up decision auditing based on the config (rbac.audit_*).
+
+    This function is idempotent - sink is only created once per process.
+
+    :rtype: :class:`DecisionAuditSink`
+    """
+    if not cfg.CONF.rbac.audit:
+        return None
+
+    if _AUDIT_SINK['sink']:
+        return _AUDIT_SINK['sink']
+
+    if cfg.CONF.rbac.audit_backend == 'mongo':
+        writer = MongoAuditWriter(collection_name=cfg.CONF.rbac.audit_collection)
+    else:
+        writer = FileAuditWriter(file_path=cfg.CONF.rbac.audit_file_path,
+                                 max_bytes=cfg.CONF.rbac.audit_file_max_bytes,
+                                 backup_count=cfg.CONF.rbac.audit_file_backup_count)
+
+    sink = DecisionAuditSink(writer=writer, buffer_size=cfg.CONF.rbac.audit_buffer_size,
+                             batch_size=cfg.CONF.rbac.audit_batch_size,
+                             flush_interval=cfg.CONF.rbac.audit_flush_interval)
+    sink.start()
+    atexit.register(sink.stop)
+
+    decision_trace.set_audit_sink(sink)
+    _AUDIT_SINK['sink'] = sink
+
+    return sink
+
+
+def get_audit_sink():
+    """
+    Return process wide audit sink or None if auditing is not enabled.
+
+    :rtype: :class:`DecisionAuditSink`
+    """
+    return _AUDIT_SINK['sink']
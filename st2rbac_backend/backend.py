@@ -15,7 +15,9 @@
 
 from st2common.rbac.backends.base import BaseRBACBackend
 
+from st2rbac_backend import audit
 from st2rbac_backend import resolvers
+from st2rbac_backend import trace as decision_trace
 from st2rbac_backend.service import RBACService
 from st2rbac_backend.utils import RBACUtils
 from st2rbac_backend.syncer import RBACRemoteGroupToRoleSyncer
@@ -26,6 +28,13 @@ __all__ = [
 
 
 class RBACBackend(BaseRBACBackend):
+    def __init__(self):
+        super(RBACBackend, self).__init__()
+
+        # Config has been parsed by the time the backend is instantiated
+        decision_trace.configure()
+        audit.setup_audit_sink()
+
     def get_resolver_for_resource_type(self, resource_type):
         return resolvers.get_resolver_for_resource_type(resource_type=resource_type)
 
@@ -0,0 +1,236 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing caches used to avoid repeated RBAC database lookups.
+"""
+
+from __future__ import absolute_import
+
+import time
+import threading
+import contextlib
+from collections import OrderedDict
+
+__all__ = [
+    'RequestScope',
+    'LRUCache',
+
+    'request_scope',
+    'get_request_scope',
+    'get_request_scope_stats',
+    'reset_request_scope_stats'
+]
+
+# Note: st2 services run under eventlet with the threading module monkey patched which means
+# this storage is local to each green thread (aka request)
+_THREAD_LOCAL = threading.local()
+
+# Marker used to distinguish cache misses from cached None values
+_MISSING = object()
+
+# Process wide counters aggregated over all the request scopes
+_REQUEST_SCOPE_STATS = {
+    'scopes': 0,
+    'hits': 0,
+    'misses': 0
+}
+
+
+class RequestScope(object):
+    """
+    Memoization context which lives for the duration of a single request.
+
+    Values (user roles, compiled permission indexes, etc.) are fetched from the database at most
+    once per scope and served from memory for all the subsequent lookups in the same request.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+
+    def get_or_set(self, key, func):
+        """
+        Return value for the provided key, calling func() and storing the result on a miss.
+        """
+        try:
+            value = self._values[key]
+        except KeyError:
+            self.misses += 1
+            _REQUEST_SCOPE_STATS['misses'] += 1
+
+            value = func()
+            self._values[key] = value
+            return value
+
+        self.hits += 1
+        _REQUEST_SCOPE_STATS['hits'] += 1
+        return value
+
+    def clear(self):
+        self._values = {}
+
+    def __repr__(self):
+        return '<RequestScope hits=%s,misses=%s,keys=%s>' % (self.hits, self.misses,
+                                                             len(self._values))
+
+
+@contextlib.contextmanager
+def request_scope():
+    """
+    Context manager which activates RBAC memoization for the code running inside it.
+
+    Nested usage is supported - inner contexts re-use the outer scope.
+    """
+    scope = get_request_scope()
+
+    if scope is not None:
+        yield scope
+        return
+
+    scope = RequestScope()
+    _THREAD_LOCAL.scope = scope
+    _REQUEST_SCOPE_STATS['scopes'] += 1
+
+    try:
+        yield scope
+    finally:
+        _THREAD_LOCAL.scope = None
+
+
+def get_request_scope():
+    """
+    Return currently active request scope or None if there is no active scope.
+
+    :rtype: :class:`RequestScope`
+    """
+    return getattr(_THREAD_LOCAL, 'scope', None)
+
+
+def get_request_scope_stats():
+    """
+    Return process wide request scope hit / miss counters.
+
+    :rtype: ``dict``
+    """
+    return dict(_REQUEST_SCOPE_STATS)
+
+
+def reset_request_scope_stats():
+    for key in _REQUEST_SCOPE_STATS:
+        _REQUEST_SCOPE_STATS[key] = 0
+
+
+class LRUCache(object):
+    """
+    Thread safe, size bounded cache with least recently used eviction and per entry TTL.
+
+    Unlike the request scope, instances of this class are shared by all the requests handled by
+    a particular process.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        """
+        :param max_size: Maximum number of entries stored in the cache.
+        :type max_size: ``int``
+
+        :param ttl: Number of seconds after which an entry expires. None to never expire entries.
+        :type ttl: ``int``
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # key -> (expire_timestamp, value), ordered from least to most recently used
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return value for the provided key or default if the key is not in the cache or the entry
+        has expired.
+        """
+        now = time.time()
+
+        with self._lock:
+            item = self._values.pop(key, _MISSING)
+
+            if item is _MISSING or (item[0] is not None and item[0] <= now):
+                self.misses += 1
+                return default
+
+            # Re-insert the item so it's marked as the most recently used one
+            self._values[key] = item
+            self.hits += 1
+
+        return item[1]
+
+    def set(self, key, value):
+        expire_timestamp = (time.time() + self.ttl) if self.ttl else None
+
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = (expire_timestamp, value)
+
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, func):
+        """
+        Return value for the provided key, calling func() and storing the result on a miss.
+
+        Note: func() is called without holding the lock so concurrent misses for the same key can
+        result in func() being called more than once.
+        """
+        value = self.get(key, _MISSING)
+
+        if value is _MISSING:
+            value = func()
+            self.set(key, value)
+
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def get_stats(self):
+        """
+        :rtype: ``dict``
+        """
+        return {
+            'size': len(self._values),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return '<LRUCache size=%s,max_size=%s,ttl=%s>' % (len(self._values), self.max_size,
+                                                          self.ttl)
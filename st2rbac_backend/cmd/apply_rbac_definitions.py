@@ -15,23 +15,53 @@
 
 """
 A script which applies RBAC definitions and role assignments stored on disk.
+
+With --watch, the script keeps running, watches the definition directories for changes and only
+applies the roles, user role assignments and group to role mappings which have changed.
 """
 
 from __future__ import absolute_import
 
+from oslo_config import cfg
+
 from st2common import config
+from st2common import log as logging
 from st2common.script_setup import setup as common_setup
 from st2common.script_setup import teardown as common_teardown
 
 from st2rbac_backend.loader import RBACDefinitionsLoader
 from st2rbac_backend.syncer import RBACDefinitionsDBSyncer
+from st2rbac_backend.watcher import get_watcher
+from st2rbac_backend.watcher import wait_for_changes
 
 __all__ = [
     'main'
 ]
 
+LOG = logging.getLogger(__name__)
+
+
+def _register_cli_opts():
+    cli_opts = [
+        cfg.BoolOpt('watch', default=False,
+                    help='Keep running and apply the definitions as soon as the definition '
+                         'files change.'),
+        cfg.FloatOpt('debounce', default=0.5,
+                     help='Number of seconds without further changes to wait for before applying '
+                          'the changes in watch mode.'),
+        cfg.FloatOpt('poll-interval', default=1.0,
+                     help='How often (in seconds) to check the definition files for changes in '
+                          'watch mode when inotify is not available.')
+    ]
+
+    try:
+        cfg.CONF.register_cli_opts(cli_opts)
+    except Exception:
+        pass
+
 
 def setup(argv):
+    _register_cli_opts()
     common_setup(config=config, setup_db=True, register_mq_exchanges=True)
 
 
@@ -39,8 +69,8 @@ def teartown():
     common_teardown()
 
 
-def apply_definitions():
-    loader = RBACDefinitionsLoader()
+def apply_definitions(loader=None):
+    loader = loader or RBACDefinitionsLoader()
     result = loader.load()
 
     role_definition_apis = list(result['roles'].values())
@@ -52,10 +82,100 @@ def apply_definitions():
                          role_assignment_apis=role_assignment_apis,
                          group_to_role_map_apis=group_to_role_map_apis)
 
+    _log_changes(loader=loader)
+
+    # Note: Manifest is only updated once the definitions have been successfully applied
+    loader.save_manifest()
+
     return result
 
 
+def apply_changed_definitions(loader):
+    """
+    Apply only the definitions which have changed since the last time the provided loader has
+    been used.
+
+    Note: Only files which have changed are parsed and validated again.
+
+    :param loader: Incremental loader.
+    :type loader: :class:`RBACDefinitionsLoader`
+    """
+    result = loader.load()
+    changes = loader.get_changes()
+
+    _log_changes(loader=loader)
+
+    syncer = RBACDefinitionsDBSyncer()
+
+    # Note: Roles need to be synchronized first since assignments reference them. Unchanged
+    # roles are skipped by the syncer so the whole list is passed in
+    if _has_changes(changes['roles']):
+        syncer.sync_roles(list(result['roles'].values()))
+
+    role_assignment_changes = changes['role_assignments']
+    if _has_changes(role_assignment_changes):
+        usernames = (role_assignment_changes['added'] + role_assignment_changes['modified'] +
+                     role_assignment_changes['removed'])
+        syncer.sync_users_role_assignments(list(result['role_assignments'].values()),
+                                           usernames=usernames)
+
+    if _has_changes(changes['group_to_role_maps']):
+        syncer.sync_group_to_role_maps(list(result['group_to_role_maps'].values()))
+
+    loader.save_manifest()
+
+    return changes
+
+
+def watch(debounce=0.5, poll_interval=1.0):
+    """
+    Apply all the definitions and then keep applying the changed definitions as soon as the
+    definition files change.
+    """
+    loader = RBACDefinitionsLoader(incremental=True)
+    apply_definitions(loader=loader)
+
+    watcher = get_watcher(paths=loader.get_definitions_paths(), poll_interval=poll_interval)
+    LOG.info('Watching for changes in: %s' % (', '.join(loader.get_definitions_paths())))
+
+    try:
+        while True:
+            wait_for_changes(watcher=watcher, debounce=debounce)
+
+            try:
+                apply_changed_definitions(loader=loader)
+            except Exception:
+                # Note: Manifest is not updated so the changes are applied again on the next change
+                LOG.exception('Failed to apply changed definitions')
+    finally:
+        watcher.close()
+
+
 def main(argv):
     setup(argv)
-    apply_definitions()
-    teartown()
+
+    try:
+        if cfg.CONF.watch:
+            watch(debounce=cfg.CONF.debounce, poll_interval=cfg.CONF.poll_interval)
+        else:
+            apply_definitions()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        teartown()
+
+
+def _has_changes(changes):
+    return bool(changes['added'] or changes['modified'] or changes['removed'])
+
+
+def _log_changes(loader):
+    changes = loader.get_changes()
+
+    if changes is None:
+        return
+
+    for definition_type, definition_changes in sorted(changes.items()):
+        LOG.info('Changed %s: added=%r, modified=%r, removed=%r' %
+                 (definition_type, definition_changes['added'],
+                  definition_changes['modified'], definition_changes['removed']))
@@ -0,0 +1,113 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A script which verifies that all the queries issued by the RBAC backend are served by an index.
+
+For each query shape, the query is explained against the live collection and the used indexes
+and collection scans are reported. With --create, the recommended indexes which don't exist yet
+are created.
+"""
+
+from __future__ import absolute_import
+
+import sys
+
+from oslo_config import cfg
+
+from st2common import config
+from st2common import log as logging
+from st2common.script_setup import setup as common_setup
+from st2common.script_setup import teardown as common_teardown
+
+from st2rbac_backend.indexes import QUERY_SHAPES
+from st2rbac_backend.indexes import explain_query_shape
+from st2rbac_backend.indexes import get_covering_index
+from st2rbac_backend.indexes import create_recommended_index
+
+__all__ = [
+    'main'
+]
+
+LOG = logging.getLogger(__name__)
+
+
+def _register_cli_opts():
+    cli_opts = [
+        cfg.BoolOpt('create', default=False,
+                    help='Create the recommended indexes which don\'t exist yet.')
+    ]
+
+    try:
+        cfg.CONF.register_cli_opts(cli_opts)
+    except Exception:
+        pass
+
+
+def setup(argv):
+    _register_cli_opts()
+    common_setup(config=config, setup_db=True, register_mq_exchanges=False)
+
+
+def teartown():
+    common_teardown()
+
+
+def verify_indexes(create=False):
+    """
+    Explain all the query shapes and optionally create the missing recommended indexes.
+
+    :return: Number of query shapes which are not served by an index.
+    :rtype: ``int``
+    """
+    unindexed_count = 0
+
+    for query_shape in QUERY_SHAPES:
+        covering_index = get_covering_index(query_shape=query_shape)
+
+        if not covering_index and create:
+            covering_index = create_recommended_index(query_shape=query_shape)
+            LOG.info('Created index "%s" for query shape "%s"' % (covering_index,
+                                                                 query_shape.name))
+
+        plan = explain_query_shape(query_shape=query_shape)
+
+        if plan.collection_scan:
+            unindexed_count += 1
+
+        recommended_index = ', '.join(['%s:%s' % (field, direction) for field, direction
+                                       in query_shape.recommended_index])
+
+        sys.stdout.write('%s (%s)\n' % (plan.shape, plan.collection))
+        sys.stdout.write('  plan: %s\n' % (' <- '.join([str(stage) for stage in plan.stages])))
+        sys.stdout.write('  used indexes: %s\n' % (', '.join(plan.index_names) or '-'))
+        sys.stdout.write('  collection scan: %s\n' % ('yes' if plan.collection_scan else 'no'))
+        sys.stdout.write('  examined: keys=%s, docs=%s, returned=%s\n' %
+                         (plan.keys_examined, plan.docs_examined, plan.returned))
+        sys.stdout.write('  recommended index: %s (%s)\n' %
+                         (recommended_index, covering_index or 'missing'))
+
+    return unindexed_count
+
+
+def main(argv):
+    setup(argv)
+
+    try:
+        unindexed_count = verify_indexes(create=cfg.CONF.create)
+    finally:
+        teartown()
+
+    return 1 if unindexed_count else 0
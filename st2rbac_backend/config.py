@@ -0,0 +1,129 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing configuration options for the RBAC backend.
+
+Options are registered under the existing "rbac" config group.
+"""
+
+from __future__ import absolute_import
+
+from oslo_config import cfg
+
+__all__ = [
+    'register_opts'
+]
+
+
+def register_opts(ignore_errors=True):
+    rbac_opts = [
+        cfg.IntOpt(
+            'cache_size', default=0,
+            help='Maximum number of entries in each of the process wide RBAC caches (user '
+                 'roles, role permission grants and compiled user permission indexes). 0 '
+                 'disables caching.'),
+        cfg.IntOpt(
+            'cache_ttl', default=60,
+            help='Number of seconds after which cached RBAC entries expire.'),
+        cfg.IntOpt(
+            'decision_cache_size', default=0,
+            help='Maximum number of cached permission check outcomes (including denials) keyed by '
+                 'user, permission type and resource. Entries expire after cache_ttl seconds and '
+                 'are purged on any RBAC data change. 0 disables the cache.'),
+        cfg.IntOpt(
+            'cache_generation_check_interval', default=5,
+            help='How often (in seconds) to check the RBAC data generation counter for changes '
+                 'made by other processes. This is the maximum time stale data can be served '
+                 'from the process wide caches. 0 means check on every lookup.'),
+        cfg.BoolOpt(
+            'permission_grants_aggregation', default=False,
+            help='True to retrieve permission grants for a user using a single aggregation '
+                 'query instead of three sequential queries. Requires MongoDB >= 4.0.'),
+        cfg.BoolOpt(
+            'effective_permissions', default=False,
+            help='True to maintain a materialized collection of flattened effective permission '
+                 'grants for each user and answer one-off permission checks with a single '
+                 'indexed lookup on it instead of joining role assignments, roles and permission '
+                 'grants.'),
+        cfg.BoolOpt(
+            'decision_trace', default=False,
+            help='True to emit a structured trace record (evaluation steps, matched grant and '
+                 'outcome) for every permission check decision.'),
+        cfg.FloatOpt(
+            'decision_trace_sample_rate', default=0.0,
+            help='Fraction (0.0 - 1.0) of permission check decisions to emit trace records for '
+                 'when decision_trace is disabled.'),
+        cfg.BoolOpt(
+            'remote_group_sync_fingerprint', default=False,
+            help='True to skip the remote group to role assignments sync on login when the user '
+                 'groups and the group to role mappings haven\'t changed since the last sync. '
+                 'Mappings and roles need to be manipulated through st2-apply-rbac-definitions '
+                 'or the RBAC service for the changes to be detected.'),
+        cfg.BoolOpt(
+            'group_to_role_maps_cache', default=False,
+            help='True to keep all the group to role mappings (with role existence resolved) '
+                 'compiled in memory of each process so the remote group sync on login doesn\'t '
+                 'need to query them. The table is rebuilt when mappings or roles change (checked '
+                 'every cache_generation_check_interval seconds).'),
+        cfg.IntOpt(
+            'loader_workers', default=1,
+            help='Number of worker processes used to parse and validate RBAC definition files. '
+                 '1 means files are loaded sequentially in the current process.'),
+        cfg.StrOpt(
+            'loader_manifest_path', default=None,
+            help='Path to the file where digests and parsed contents of the loaded RBAC '
+                 'definition files are stored. When set, only the files which have changed since '
+                 'the previous run are parsed and validated again.'),
+        cfg.BoolOpt(
+            'audit', default=False,
+            help='True to record every permission check decision to the RBAC audit log.'),
+        cfg.StrOpt(
+            'audit_backend', default='file', choices=['file', 'mongo'],
+            help='Where to write RBAC audit records to.'),
+        cfg.StrOpt(
+            'audit_file_path', default='/var/log/st2/st2rbac.audit.log',
+            help='Path to the RBAC audit log file (used with the "file" audit backend).'),
+        cfg.IntOpt(
+            'audit_file_max_bytes', default=100 * 1024 * 1024,
+            help='Size (in bytes) after which the RBAC audit log file is rotated.'),
+        cfg.IntOpt(
+            'audit_file_backup_count', default=5,
+            help='Number of rotated RBAC audit log files to keep.'),
+        cfg.StrOpt(
+            'audit_collection', default='rbac_audit',
+            help='Name of the collection RBAC audit records are written to (used with the '
+                 '"mongo" audit backend).'),
+        cfg.IntOpt(
+            'audit_buffer_size', default=10000,
+            help='Maximum number of audit records buffered in memory. Records which don\'t fit '
+                 'into the buffer are dropped instead of blocking the request.'),
+        cfg.IntOpt(
+            'audit_batch_size', default=500,
+            help='Maximum number of audit records written in a single batch.'),
+        cfg.FloatOpt(
+            'audit_flush_interval', default=1.0,
+            help='How often (in seconds) buffered audit records are flushed.')
+    ]
+
+    _do_register_opts(rbac_opts, group='rbac', ignore_errors=ignore_errors)
+
+
+def _do_register_opts(opts, group=None, ignore_errors=False):
+    try:
+        cfg.CONF.register_opts(opts, group=group)
+    except Exception:
+        if not ignore_errors:
+            raise
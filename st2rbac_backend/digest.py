@@ -0,0 +1,130 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing role definition digests.
+
+Digest of the normalized role definition (description and permission grants) is stored for each
+role created by the definitions syncer. On the next sync, roles whose definition digest hasn't
+changed are left alone instead of being deleted and re-created.
+
+Digest is bound to the role document id and it's removed when role permission grants are
+manipulated directly, so a stale digest can never hide a change.
+"""
+
+from __future__ import absolute_import
+
+import json
+import hashlib
+
+import mongoengine as me
+from pymongo import UpdateOne
+
+from st2common.models.db import stormbase
+
+__all__ = [
+    'RBACRoleDigestDB',
+
+    'get_role_definition_digest',
+    'get_role_digests',
+    'set_role_digests',
+    'delete_role_digests'
+]
+
+
+class RBACRoleDigestDB(stormbase.StormFoundationDB):
+    name = me.StringField(required=True, unique=True)
+    role_id = me.StringField(required=True)
+    digest = me.StringField(required=True)
+
+    meta = {
+        'collection': 'rbac_role_digest'
+    }
+
+
+def get_role_definition_digest(description, permission_grants):
+    """
+    Return stable digest of the normalized role definition.
+
+    Order of the permission grants and permission types inside a grant doesn't affect the digest.
+
+    :param description: Role description.
+    :type description: ``str``
+
+    :param permission_grants: Role permission grants (dicts with "resource_uid" and
+                              "permission_types" key).
+    :type permission_grants: ``list`` of ``dict``
+
+    :rtype: ``str``
+    """
+    grants = []
+    for permission_grant in permission_grants or []:
+        grant = {
+            'resource_uid': permission_grant.get('resource_uid', None) or None,
+            'permission_types': sorted(set(permission_grant.get('permission_types', None) or []))
+        }
+        grants.append(json.dumps(grant, sort_keys=True))
+
+    definition = {
+        'description': description or '',
+        'permission_grants': sorted(grants)
+    }
+
+    value = json.dumps(definition, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+
+def get_role_digests():
+    """
+    Retrieve stored digests for all the roles.
+
+    :return: Dictionary mapping role name to a (role_id, digest) tuple.
+    :rtype: ``dict``
+    """
+    result = {}
+
+    for role_digest_db in RBACRoleDigestDB.objects.only('name', 'role_id', 'digest'):
+        result[role_digest_db.name] = (role_digest_db.role_id, role_digest_db.digest)
+
+    return result
+
+
+def set_role_digests(role_digests):
+    """
+    Store digests for the provided roles using a single bulk write.
+
+    :param role_digests: List of (role name, role id, digest) tuples.
+    :type role_digests: ``list`` of ``tuple``
+    """
+    if not role_digests:
+        return
+
+    operations = [UpdateOne({'name': name}, {'$set': {'role_id': str(role_id), 'digest': digest}},
+                            upsert=True)
+                  for name, role_id, digest in role_digests]
+    RBACRoleDigestDB._get_collection().bulk_write(operations, ordered=False)
+
+
+def delete_role_digests(names):
+    """
+    Delete stored digests for the provided roles.
+
+    :param names: Role names.
+    :type names: ``list`` of ``str``
+    """
+    if not names:
+        return
+
+    RBACRoleDigestDB.objects(name__in=list(names)).delete()
@@ -0,0 +1,195 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing materialized (denormalized) effective permissions.
+
+For each user, the role assignments -> roles -> permission grants chain is flattened into:
+
+* a single RBACEffectiveUserDB document with the names of all the roles assigned to the user
+  (system role flags are derived from those)
+* one RBACEffectivePermissionDB document per permission grant with the user, resource and
+  permission types and the role the grant comes from
+
+This way any permission grant lookup for a user is a single indexed query on (user, resource_uid)
+instead of the three collection join.
+
+Effective permissions are maintained incrementally by the RBAC service and the syncers each time
+role assignments, roles or permission grants change. Users which haven't been materialized yet
+(no RBACEffectiveUserDB document) are served using the regular lookups.
+
+Permission types are stored as a list of strings and matched with $in on top of the indexed
+(user, resource_uid) or (user, resource_type) lookup.
+"""
+
+from __future__ import absolute_import
+
+from collections import defaultdict
+from itertools import chain
+
+import mongoengine as me
+
+from st2common.models.db import stormbase
+from st2common.persistence.rbac import Role
+from st2common.persistence.rbac import UserRoleAssignment
+from st2common.persistence.rbac import PermissionGrant
+
+__all__ = [
+    'RBACEffectiveUserDB',
+    'RBACEffectivePermissionDB',
+
+    'get_effective_user',
+    'get_usernames_for_roles',
+    'get_unmaterialized_usernames',
+    'materialize_effective_permissions'
+]
+
+# Maximum number of documents written by a single bulk insert
+BULK_WRITE_BATCH_SIZE = 1000
+
+
+class RBACEffectiveUserDB(stormbase.StormFoundationDB):
+    user = me.StringField(required=True, unique=True)
+    roles = me.ListField(field=me.StringField())
+
+    meta = {
+        'collection': 'rbac_effective_user'
+    }
+
+
+class RBACEffectivePermissionDB(stormbase.StormFoundationDB):
+    user = me.StringField(required=True)
+    role = me.StringField(required=True)
+    permission_grant_id = me.StringField(required=True)
+    resource_uid = me.StringField(required=False)
+    resource_type = me.StringField(required=False)
+    permission_types = me.ListField(field=me.StringField())
+
+    meta = {
+        'collection': 'rbac_effective_permission',
+        'indexes': [
+            {'fields': ['user', 'resource_uid']},
+            {'fields': ['user', 'resource_type']}
+        ]
+    }
+
+
+def get_effective_user(username):
+    """
+    Retrieve materialized roles for the provided user.
+
+    :return: Effective user or None if the user hasn't been materialized yet.
+    :rtype: :class:`RBACEffectiveUserDB`
+    """
+    return RBACEffectiveUserDB.objects(user=username).only('user', 'roles').first()
+
+
+def get_usernames_for_roles(role_names):
+    """
+    Return names of all the users which have any of the provided roles assigned.
+
+    :rtype: ``list`` of ``str``
+    """
+    if not role_names:
+        return []
+
+    return UserRoleAssignment.query(role__in=list(role_names)).distinct('user')
+
+
+def get_unmaterialized_usernames():
+    """
+    Return names of all the users which have roles assigned, but haven't been materialized yet.
+
+    :rtype: ``list`` of ``str``
+    """
+    usernames = set(UserRoleAssignment.query().distinct('user'))
+    materialized_usernames = set(RBACEffectiveUserDB.objects.distinct('user'))
+
+    return sorted(usernames - materialized_usernames)
+
+
+def materialize_effective_permissions(usernames):
+    """
+    (Re-)build effective permissions for the provided users.
+
+    Role assignments, roles and permission grants for all the provided users are retrieved using
+    three queries and the existing effective permissions are replaced using bulk writes.
+
+    :param usernames: Names of the users.
+    :type usernames: ``list`` of ``str``
+
+    :return: Number of materialized permission grants.
+    :rtype: ``int``
+    """
+    usernames = sorted(set(usernames or []))
+
+    if not usernames:
+        return 0
+
+    user_role_names = defaultdict(set)
+    role_assignment_dbs = UserRoleAssignment.query(user__in=usernames).only('user', 'role')
+
+    for role_assignment_db in role_assignment_dbs:
+        user_role_names[role_assignment_db.user].add(role_assignment_db.role)
+
+    # Note: Assignments can reference roles which don't exist (anymore)
+    role_names = set(chain.from_iterable(user_role_names.values()))
+    role_dbs = Role.query(name__in=list(role_names)).only('name', 'permission_grants')
+    role_permission_grant_ids = dict([(role_db.name, role_db.permission_grants or [])
+                                      for role_db in role_dbs])
+
+    permission_grant_ids = list(set(chain.from_iterable(role_permission_grant_ids.values())))
+    permission_grant_dbs = PermissionGrant.query(id__in=permission_grant_ids)
+    permission_grant_dbs = dict([(str(permission_grant_db.id), permission_grant_db)
+                                 for permission_grant_db in permission_grant_dbs])
+
+    user_dbs = []
+    permission_dbs = []
+
+    for username in usernames:
+        user_roles = sorted([role_name for role_name in user_role_names.get(username, [])
+                             if role_name in role_permission_grant_ids])
+        user_dbs.append(RBACEffectiveUserDB(user=username, roles=user_roles))
+
+        for role_name in user_roles:
+            for permission_grant_id in role_permission_grant_ids[role_name]:
+                permission_grant_db = permission_grant_dbs.get(str(permission_grant_id), None)
+
+                if not permission_grant_db:
+                    continue
+
+                permission_db = RBACEffectivePermissionDB(
+                    user=username, role=role_name, permission_grant_id=str(permission_grant_id),
+                    resource_uid=permission_grant_db.resource_uid,
+                    resource_type=permission_grant_db.resource_type,
+                    permission_types=permission_grant_db.permission_types or [])
+                permission_dbs.append(permission_db)
+
+    # Note: User documents mark users as materialized so they are deleted first and inserted
+    # last. This way readers fall back to the regular lookups while the permissions are being
+    # replaced instead of seeing missing or partial permissions
+    RBACEffectiveUserDB.objects(user__in=usernames).delete()
+    RBACEffectivePermissionDB.objects(user__in=usernames).delete()
+
+    for index in range(0, len(permission_dbs), BULK_WRITE_BATCH_SIZE):
+        RBACEffectivePermissionDB.objects.insert(permission_dbs[index:index +
+                                                                BULK_WRITE_BATCH_SIZE],
+                                                 load_bulk=False)
+
+    for index in range(0, len(user_dbs), BULK_WRITE_BATCH_SIZE):
+        RBACEffectiveUserDB.objects.insert(user_dbs[index:index + BULK_WRITE_BATCH_SIZE],
+                                           load_bulk=False)
+
+    return len(permission_dbs)
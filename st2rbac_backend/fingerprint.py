@@ -0,0 +1,111 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing remote group sync fingerprints.
+
+Fingerprint of the remote groups user is a member of and the group to role mappings generation
+is stored for each user after the remote role assignments have been synchronized. On the next
+login, the sync is skipped if the fingerprint hasn't changed.
+
+Fingerprint is removed when user remote role assignments are manipulated outside of the syncer,
+so a stale fingerprint can never hide a change.
+"""
+
+from __future__ import absolute_import
+
+import json
+import hashlib
+
+import mongoengine as me
+
+from st2common.models.db import stormbase
+
+from st2rbac_backend.generation import GROUP_TO_ROLE_MAPS_GENERATION_NAME
+from st2rbac_backend.generation import get_generation
+
+__all__ = [
+    'RBACRemoteSyncFingerprintDB',
+
+    'get_remote_sync_fingerprint',
+    'get_user_remote_sync_fingerprint',
+    'set_user_remote_sync_fingerprint',
+    'delete_remote_sync_fingerprints'
+]
+
+
+class RBACRemoteSyncFingerprintDB(stormbase.StormFoundationDB):
+    user = me.StringField(required=True, unique=True)
+    fingerprint = me.StringField(required=True)
+
+    meta = {
+        'collection': 'rbac_remote_sync_fingerprint'
+    }
+
+
+def get_remote_sync_fingerprint(groups):
+    """
+    Return fingerprint for the provided groups and the current group to role mappings generation.
+
+    Note: Generation needs to be retrieved before the mappings are read so a change which happens
+    during the sync is detected on the next sync.
+
+    :param groups: A list of remote groups user is a member of.
+    :type groups: ``list`` of ``str``
+
+    :rtype: ``str``
+    """
+    value = {
+        'groups': sorted(set(groups)),
+        'generation': get_generation(name=GROUP_TO_ROLE_MAPS_GENERATION_NAME)
+    }
+
+    value = json.dumps(value, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+
+def get_user_remote_sync_fingerprint(username):
+    """
+    Retrieve stored fingerprint for the provided user.
+
+    :rtype: ``str``
+    """
+    fingerprint_db = RBACRemoteSyncFingerprintDB.objects(user=username).only('fingerprint').first()
+
+    if not fingerprint_db:
+        return None
+
+    return fingerprint_db.fingerprint
+
+
+def set_user_remote_sync_fingerprint(username, fingerprint):
+    """
+    Store fingerprint for the provided user.
+    """
+    RBACRemoteSyncFingerprintDB.objects(user=username).update_one(
+        upsert=True, set__fingerprint=fingerprint)
+
+
+def delete_remote_sync_fingerprints(usernames):
+    """
+    Delete stored fingerprints for the provided users.
+
+    :param usernames: Names of the users.
+    :type usernames: ``list`` of ``str``
+    """
+    if not usernames:
+        return
+
+    RBACRemoteSyncFingerprintDB.objects(user__in=list(usernames)).delete()
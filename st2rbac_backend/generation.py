@@ -0,0 +1,91 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing RBAC data generation counter.
+
+The counter is stored in a single database document which is incremented every time RBAC data
+(roles, grants, role assignments, group to role mappings) is changed. Processes which cache RBAC
+data compare the counter with the value they have last seen to find out if data has been changed
+by some other process.
+
+Separate counter is maintained for the group to role mappings (and role existence which the
+mappings depend on) so the remote group sync can tell whether the mappings have changed without
+being affected by unrelated RBAC data changes such as user role assignments.
+"""
+
+from __future__ import absolute_import
+
+import mongoengine as me
+
+from st2common.models.db import stormbase
+
+__all__ = [
+    'RBACGenerationDB',
+
+    'GENERATION_NAME',
+    'GROUP_TO_ROLE_MAPS_GENERATION_NAME',
+
+    'get_generation',
+    'bump_generation'
+]
+
+# Name of the generation counter document
+GENERATION_NAME = 'rbac'
+
+# Name of the group to role mappings generation counter document
+GROUP_TO_ROLE_MAPS_GENERATION_NAME = 'rbac_group_to_role_maps'
+
+
+class RBACGenerationDB(stormbase.StormFoundationDB):
+    name = me.StringField(required=True, unique=True)
+    generation = me.IntField(required=True, default=0)
+
+    meta = {
+        'collection': 'rbac_generation'
+    }
+
+
+def get_generation(name=GENERATION_NAME):
+    """
+    Retrieve current RBAC data generation.
+
+    :param name: Name of the generation counter.
+    :type name: ``str``
+
+    :return: Current generation or 0 if RBAC data has never been changed.
+    :rtype: ``int``
+    """
+    generation_db = RBACGenerationDB.objects(name=name).only('generation').first()
+
+    if not generation_db:
+        return 0
+
+    return generation_db.generation
+
+
+def bump_generation(name=GENERATION_NAME):
+    """
+    Atomically increment RBAC data generation.
+
+    :param name: Name of the generation counter.
+    :type name: ``str``
+
+    :return: New generation.
+    :rtype: ``int``
+    """
+    generation_db = RBACGenerationDB.objects(name=name).modify(
+        upsert=True, new=True, inc__generation=1)
+    return generation_db.generation
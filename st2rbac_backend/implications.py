@@ -0,0 +1,244 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing static permission implication table.
+
+For each permission type which is checked on a particular resource, the table contains a set of
+granted permission types which satisfy it and resource types the grants are looked up on (in
+order). This includes:
+
+* "view" permission being implied by other resource permissions (e.g. "action_execute" implies
+  "action_view")
+* "all" permission implying all the other resource permissions
+* execution permissions being satisfied by the grants on the execution action and its pack
+* rule enforcement permissions being satisfied by the grants on the enforcement rule and its pack
+* inquiry permissions being satisfied by "execute" grants on the parent workflow action and its
+  pack
+
+The table is compiled once at import time and shared by all the resolvers.
+"""
+
+from __future__ import absolute_import
+
+import collections
+
+from st2common.rbac.types import PermissionType
+from st2common.rbac.types import ResourceType
+
+__all__ = [
+    'PermissionImplication',
+
+    'VIEW_GRANT_PERMISSION_TYPES',
+    'INQUIRY_PERMISSION_TYPES',
+    'INQUIRY_WORKFLOW_IMPLICATION',
+
+    'get_permission_implication',
+    'get_permission_implications'
+]
+
+PermissionImplication = collections.namedtuple('PermissionImplication',
+                                               ['permission_types', 'resource_types'])
+
+# Resource-specific permission types which grant / imply "view" permission type
+VIEW_GRANT_PERMISSION_TYPES = {
+    ResourceType.SENSOR: [
+        PermissionType.SENSOR_ALL,
+        PermissionType.SENSOR_MODIFY
+    ],
+    ResourceType.ACTION: [
+        PermissionType.ACTION_ALL,
+        PermissionType.ACTION_CREATE,
+        PermissionType.ACTION_MODIFY,
+        PermissionType.ACTION_DELETE,
+        PermissionType.ACTION_EXECUTE,
+    ],
+    ResourceType.ACTION_ALIAS: [
+        PermissionType.ACTION_ALIAS_ALL,
+        PermissionType.ACTION_ALIAS_CREATE,
+        PermissionType.ACTION_ALIAS_MODIFY,
+        PermissionType.ACTION_ALIAS_DELETE
+    ],
+    ResourceType.RULE: [
+        PermissionType.RULE_ALL,
+        PermissionType.RULE_CREATE,
+        PermissionType.RULE_MODIFY,
+        PermissionType.RULE_DELETE
+    ],
+    ResourceType.POLICY: [
+        PermissionType.POLICY_ALL,
+        PermissionType.POLICY_CREATE,
+        PermissionType.POLICY_MODIFY,
+        PermissionType.POLICY_DELETE
+    ],
+    ResourceType.INQUIRY: [
+        PermissionType.INQUIRY_LIST,
+        PermissionType.INQUIRY_VIEW,
+        PermissionType.INQUIRY_RESPOND,
+        PermissionType.INQUIRY_ALL
+    ],
+    ResourceType.STREAM: []
+}
+
+# Resources which belong to a pack - grants are checked on the resource and on the parent pack
+CONTENT_PACK_RESOURCE_TYPES = [
+    ResourceType.SENSOR,
+    ResourceType.ACTION,
+    ResourceType.ACTION_ALIAS,
+    ResourceType.RULE,
+    ResourceType.POLICY
+]
+
+# Resources where "all" grant implies all the other permissions, but which don't belong to a pack
+STANDALONE_RESOURCE_TYPES = [
+    ResourceType.WEBHOOK,
+    ResourceType.TIMER,
+    ResourceType.API_KEY,
+    ResourceType.TRACE,
+    ResourceType.TRIGGER,
+    ResourceType.POLICY_TYPE
+]
+
+# Resources where only a direct grant satisfies the permission
+DIRECT_GRANT_RESOURCE_TYPES = [
+    ResourceType.PACK,
+    ResourceType.RUNNER
+]
+
+# Execution permission type -> action permission type which grants / implies it. Note:
+# "action_execute" also grants / implies "execution_re_run" and "execution_stop"
+EXECUTION_TO_ACTION_PERMISSION_TYPES = {
+    PermissionType.EXECUTION_VIEW: PermissionType.ACTION_VIEW,
+    PermissionType.EXECUTION_RE_RUN: PermissionType.ACTION_EXECUTE,
+    PermissionType.EXECUTION_STOP: PermissionType.ACTION_EXECUTE,
+    PermissionType.EXECUTION_ALL: PermissionType.ACTION_ALL,
+    PermissionType.EXECUTION_VIEWS_FILTERS_LIST: PermissionType.EXECUTION_VIEWS_FILTERS_LIST
+}
+
+# Rule enforcement permission type -> rule permission type which grants / implies it
+RULE_ENFORCEMENT_TO_RULE_PERMISSION_TYPES = {
+    PermissionType.RULE_ENFORCEMENT_VIEW: PermissionType.RULE_VIEW,
+    PermissionType.RULE_ENFORCEMENT_LIST: PermissionType.RULE_LIST
+}
+
+# Inquiry permission types which are checked on the inquiry itself. All the inquiry permission
+# types are global so any of those grants satisfies any of those permission types
+INQUIRY_PERMISSION_TYPES = [
+    PermissionType.INQUIRY_VIEW,
+    PermissionType.INQUIRY_RESPOND,
+    PermissionType.INQUIRY_ALL
+]
+
+# Inquiries which belong to a workflow inherit permissions from the parent workflow action
+INQUIRY_WORKFLOW_IMPLICATION = PermissionImplication(
+    permission_types=frozenset([PermissionType.ACTION_ALL, PermissionType.ACTION_EXECUTE]),
+    resource_types=(ResourceType.ACTION, ResourceType.PACK))
+
+
+def get_permission_implication(permission_type):
+    """
+    Return implication (granted permission types which satisfy the provided permission type and
+    resource types to look the grants up on) for the provided resource permission type.
+
+    :rtype: :class:`PermissionImplication`
+    """
+    implication = _IMPLICATIONS.get(permission_type, None)
+
+    if not implication:
+        raise ValueError('Invalid permission type: %s' % (permission_type))
+
+    return implication
+
+
+def get_permission_implications():
+    """
+    Return a copy of the whole implication table.
+
+    :rtype: ``dict``
+    """
+    return dict(_IMPLICATIONS)
+
+
+def _get_permission_types_for_resource_type(resource_type):
+    return [permission_type for permission_type in PermissionType.get_valid_values()
+            if PermissionType.get_resource_type(permission_type=permission_type) == resource_type]
+
+
+def _get_resource_permission_types(resource_type, permission_type):
+    """
+    Return permission types granted on a resource of the provided type which satisfy the provided
+    permission type.
+    """
+    view_permission_type = PermissionType.get_permission_type(resource_type=resource_type,
+                                                              permission_name='view')
+    all_permission_type = PermissionType.get_permission_type(resource_type=resource_type,
+                                                             permission_name='all')
+
+    if permission_type == view_permission_type:
+        # Note: Some permissions such as "create", "modify", "delete" and "execute" also
+        # grant / imply "view" permission
+        return VIEW_GRANT_PERMISSION_TYPES[resource_type] + [permission_type]
+
+    return [all_permission_type, permission_type]
+
+
+def _build_implications():
+    result = {}
+
+    for resource_type in CONTENT_PACK_RESOURCE_TYPES:
+        for permission_type in _get_permission_types_for_resource_type(resource_type):
+            permission_types = _get_resource_permission_types(resource_type=resource_type,
+                                                              permission_type=permission_type)
+            result[permission_type] = PermissionImplication(
+                permission_types=frozenset(permission_types),
+                resource_types=(resource_type, ResourceType.PACK))
+
+    for resource_type in STANDALONE_RESOURCE_TYPES:
+        all_permission_type = PermissionType.get_permission_type(resource_type=resource_type,
+                                                                 permission_name='all')
+
+        for permission_type in _get_permission_types_for_resource_type(resource_type):
+            result[permission_type] = PermissionImplication(
+                permission_types=frozenset([all_permission_type, permission_type]),
+                resource_types=(resource_type,))
+
+    for resource_type in DIRECT_GRANT_RESOURCE_TYPES:
+        for permission_type in _get_permission_types_for_resource_type(resource_type):
+            result[permission_type] = PermissionImplication(
+                permission_types=frozenset([permission_type]),
+                resource_types=(resource_type,))
+
+    for permission_type, action_permission_type in EXECUTION_TO_ACTION_PERMISSION_TYPES.items():
+        result[permission_type] = PermissionImplication(
+            permission_types=frozenset([PermissionType.ACTION_ALL, action_permission_type]),
+            resource_types=(ResourceType.ACTION, ResourceType.PACK))
+
+    for permission_type, rule_permission_type in RULE_ENFORCEMENT_TO_RULE_PERMISSION_TYPES.items():
+        permission_types = _get_resource_permission_types(resource_type=ResourceType.RULE,
+                                                          permission_type=rule_permission_type)
+        result[permission_type] = PermissionImplication(
+            permission_types=frozenset(permission_types),
+            resource_types=(ResourceType.RULE, ResourceType.PACK))
+
+    for permission_type in INQUIRY_PERMISSION_TYPES:
+        result[permission_type] = PermissionImplication(
+            permission_types=frozenset(INQUIRY_PERMISSION_TYPES),
+            resource_types=(ResourceType.INQUIRY,))
+
+    return result
+
+
+# Resource permission type -> PermissionImplication
+_IMPLICATIONS = _build_implications()
@@ -0,0 +1,351 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing in-memory compiled index of the roles and permission grants for a user.
+"""
+
+from __future__ import absolute_import
+
+import collections
+from itertools import chain
+
+from mongoengine.queryset.visitor import Q
+
+from st2common.rbac.types import SystemRole
+from st2common.persistence.rbac import PermissionGrant
+from st2common.models.db.rbac import PermissionGrantDB
+
+from st2rbac_backend.effective import RBACEffectivePermissionDB
+
+__all__ = [
+    'ResourcePermissionGrant',
+
+    'BasePermissionIndex',
+    'UserPermissionIndex',
+    'DatabasePermissionIndex',
+    'EffectivePermissionIndex'
+]
+
+# Permission grant matched on one of the resources passed to "find_resource_permission_grant"
+ResourcePermissionGrant = collections.namedtuple('ResourcePermissionGrant',
+                                                 ['permission_grant_id', 'resource_uid',
+                                                  'resource_type'])
+
+
+class BasePermissionIndex(object):
+    """
+    Base class for views of all the roles and permission grants which apply to a particular user.
+    """
+
+    def __init__(self, username, role_names):
+        self.username = username
+        self.role_names = frozenset(role_names)
+
+        self.is_system_admin = SystemRole.SYSTEM_ADMIN in self.role_names
+        self.is_admin = SystemRole.ADMIN in self.role_names
+        self.is_observer = SystemRole.OBSERVER in self.role_names
+
+    def find_permission_grant(self, permission_types, resource_uid=None, resource_types=None):
+        raise NotImplementedError('find_permission_grant not implemented')
+
+    def find_resource_permission_grant(self, resources, permission_types):
+        """
+        Find a permission grant on any of the provided resources (e.g. a resource and its parent
+        pack).
+
+        :param resources: Resources to match as (resource_uid, resource_type) tuples.
+        :type resources: ``list`` of ``tuple``
+
+        :param permission_types: Permission types to match (any of them).
+        :type permission_types: ``list`` of ``str``
+
+        :return: Matching permission grant or None if there is no match.
+        :rtype: :class:`ResourcePermissionGrant`
+        """
+        for resource_uid, resource_type in resources:
+            grant_id = self.find_permission_grant(permission_types=permission_types,
+                                                  resource_uid=resource_uid,
+                                                  resource_types=[resource_type])
+
+            if grant_id:
+                return ResourcePermissionGrant(permission_grant_id=grant_id,
+                                               resource_uid=resource_uid,
+                                               resource_type=resource_type)
+
+        return None
+
+    def get_resource_uids(self, resource_type, permission_types):
+        """
+        Return uids of all the resources of the provided type on which the user has any of the
+        provided permission types granted.
+
+        :rtype: ``set`` of ``str``
+        """
+        raise NotImplementedError('get_resource_uids not implemented')
+
+
+class UserPermissionIndex(BasePermissionIndex):
+    """
+    Compiled, read-only view of all the roles and permission grants which apply to a particular
+    user.
+
+    The index is built once from the role assignments, roles and permission grants in the database
+    and then answers permission grant lookups with dictionary lookups without touching the
+    database.
+    """
+
+    def __init__(self, username, role_names, permission_grants):
+        """
+        :param username: Name of the user this index belongs to.
+        :type username: ``str``
+
+        :param role_names: Names of all the roles which are assigned to the user.
+        :type role_names: ``list`` of ``str``
+
+        :param permission_grants: Permission grants for all the user roles represented as
+                                  (id, resource_uid, resource_type, permission_types) tuples.
+        :type permission_grants: ``list`` of ``tuple``
+        """
+        super(UserPermissionIndex, self).__init__(username=username, role_names=role_names)
+
+        # (resource_uid, resource_type) -> {permission_type: permission_grant_id}
+        self._resource_grants = {}
+
+        # resource_type -> {permission_type: permission_grant_id}
+        self._resource_type_grants = {}
+
+        # permission_type -> permission_grant_id (grants on any resource including global grants
+        # which are not tied to a particular resource)
+        self._global_grants = {}
+
+        for grant_id, resource_uid, resource_type, permission_types in permission_grants:
+            grant_id = str(grant_id)
+            permission_types = permission_types or []
+
+            for permission_type in permission_types:
+                self._global_grants.setdefault(permission_type, grant_id)
+
+                if resource_type:
+                    grants = self._resource_type_grants.setdefault(resource_type, {})
+                    grants.setdefault(permission_type, grant_id)
+
+                if resource_uid:
+                    grants = self._resource_grants.setdefault((resource_uid, resource_type), {})
+                    grants.setdefault(permission_type, grant_id)
+
+    def find_permission_grant(self, permission_types, resource_uid=None, resource_types=None):
+        if resource_uid:
+            assert resource_types, 'resource_types are required when resource_uid is provided'
+            grant_maps = [self._resource_grants.get((resource_uid, resource_type), None)
+                          for resource_type in resource_types]
+        elif resource_types:
+            grant_maps = [self._resource_type_grants.get(resource_type, None)
+                          for resource_type in resource_types]
+        else:
+            grant_maps = [self._global_grants]
+
+        for grant_map in grant_maps:
+            if not grant_map:
+                continue
+
+            for permission_type in permission_types:
+                grant_id = grant_map.get(permission_type, None)
+
+                if grant_id:
+                    return grant_id
+
+        return None
+
+    def get_resource_uids(self, resource_type, permission_types):
+        result = set([])
+
+        for (resource_uid, grant_resource_type), grants in self._resource_grants.items():
+            if grant_resource_type != resource_type:
+                continue
+
+            if any(permission_type in grants for permission_type in permission_types):
+                result.add(resource_uid)
+
+        return result
+
+    def __repr__(self):
+        return ('<UserPermissionIndex username=%s,roles=%s,resources=%s>' %
+                (self.username, sorted(self.role_names), len(self._resource_grants)))
+
+
+class DatabasePermissionIndex(BasePermissionIndex):
+    """
+    View of the roles and permission grants for a particular user which answers permission grant
+    lookups with existence queries against the database.
+
+    This is used for one-off checks where compiling a full index would mean retrieving all the
+    user permission grants just to answer a single lookup. Each lookup asks the database only if a
+    matching grant exists (limit 1, projection on id) instead of retrieving and hydrating all the
+    matching grants.
+    """
+
+    def __init__(self, username, role_dbs):
+        """
+        :param username: Name of the user this index belongs to.
+        :type username: ``str``
+
+        :param role_dbs: All the roles which are assigned to the user.
+        :type role_dbs: ``list`` of :class:`RoleDB`
+        """
+        role_names = [role_db.name for role_db in role_dbs]
+        super(DatabasePermissionIndex, self).__init__(username=username, role_names=role_names)
+
+        self._permission_grant_ids = list(set(chain.from_iterable(role_db.permission_grants or []
+                                                                  for role_db in role_dbs)))
+
+    def find_permission_grant(self, permission_types=None, resource_uid=None,
+                              resource_types=None):
+        if not self._permission_grant_ids:
+            return None
+
+        queryset = self._get_queryset(permission_types=permission_types,
+                                      resource_uid=resource_uid,
+                                      resource_types=resource_types)
+        permission_grant_id = queryset.only('id').limit(1).scalar('id').first()
+
+        if not permission_grant_id:
+            return None
+
+        return str(permission_grant_id)
+
+    def find_resource_permission_grant(self, resources, permission_types):
+        """
+        Find a permission grant on any of the provided resources using a single query.
+        """
+        if not self._permission_grant_ids or not resources:
+            return None
+
+        resources_filter = None
+        for resource_uid, resource_type in resources:
+            resource_filter = Q(resource_uid=resource_uid, resource_type=resource_type)
+            resources_filter = (resource_filter if resources_filter is None else
+                                resources_filter | resource_filter)
+
+        queryset_filter = (Q(id__in=self._permission_grant_ids) &
+                           Q(permission_types__in=list(permission_types)) &
+                           resources_filter)
+        permission_grant_db = PermissionGrantDB.objects(queryset_filter).only(
+            'id', 'resource_uid', 'resource_type').first()
+
+        if not permission_grant_db:
+            return None
+
+        return ResourcePermissionGrant(permission_grant_id=str(permission_grant_db.id),
+                                       resource_uid=permission_grant_db.resource_uid,
+                                       resource_type=permission_grant_db.resource_type)
+
+    def get_resource_uids(self, resource_type, permission_types):
+        if not self._permission_grant_ids:
+            return set([])
+
+        queryset = self._get_queryset(permission_types=permission_types,
+                                      resource_types=[resource_type])
+        result = set([resource_uid for resource_uid in queryset.distinct('resource_uid')
+                      if resource_uid])
+        return result
+
+    def _get_queryset(self, permission_types=None, resource_uid=None, resource_types=None):
+        filters = {}
+        filters['id__in'] = self._permission_grant_ids
+
+        if resource_uid:
+            filters['resource_uid'] = resource_uid
+
+        if resource_types:
+            filters['resource_type__in'] = resource_types
+
+        if permission_types:
+            filters['permission_types__in'] = list(permission_types)
+
+        return PermissionGrant.query(**filters)
+
+    def __repr__(self):
+        return ('<DatabasePermissionIndex username=%s,roles=%s,grants=%s>' %
+                (self.username, sorted(self.role_names), len(self._permission_grant_ids)))
+
+
+class EffectivePermissionIndex(BasePermissionIndex):
+    """
+    View of the roles and permission grants for a particular user which answers permission grant
+    lookups with a single indexed query against the materialized effective permissions.
+    """
+
+    def find_permission_grant(self, permission_types=None, resource_uid=None,
+                              resource_types=None):
+        queryset = self._get_queryset(permission_types=permission_types,
+                                      resource_uid=resource_uid,
+                                      resource_types=resource_types)
+        permission_grant_id = queryset.only('permission_grant_id').limit(1).scalar(
+            'permission_grant_id').first()
+
+        return permission_grant_id or None
+
+    def find_resource_permission_grant(self, resources, permission_types):
+        """
+        Find a permission grant on any of the provided resources using a single query.
+        """
+        if not resources:
+            return None
+
+        resources_filter = None
+        for resource_uid, resource_type in resources:
+            resource_filter = Q(resource_uid=resource_uid, resource_type=resource_type)
+            resources_filter = (resource_filter if resources_filter is None else
+                                resources_filter | resource_filter)
+
+        queryset_filter = (Q(user=self.username) &
+                           Q(permission_types__in=list(permission_types)) &
+                           resources_filter)
+        permission_db = RBACEffectivePermissionDB.objects(queryset_filter).only(
+            'permission_grant_id', 'resource_uid', 'resource_type').first()
+
+        if not permission_db:
+            return None
+
+        return ResourcePermissionGrant(permission_grant_id=permission_db.permission_grant_id,
+                                       resource_uid=permission_db.resource_uid,
+                                       resource_type=permission_db.resource_type)
+
+    def get_resource_uids(self, resource_type, permission_types):
+        queryset = self._get_queryset(permission_types=permission_types,
+                                      resource_types=[resource_type])
+        result = set([resource_uid for resource_uid in queryset.distinct('resource_uid')
+                      if resource_uid])
+        return result
+
+    def _get_queryset(self, permission_types=None, resource_uid=None, resource_types=None):
+        filters = {}
+        filters['user'] = self.username
+
+        if resource_uid:
+            filters['resource_uid'] = resource_uid
+
+        if resource_types:
+            filters['resource_type__in'] = list(resource_types)
+
+        if permission_types:
+            filters['permission_types__in'] = list(permission_types)
+
+        return RBACEffectivePermissionDB.objects(**filters)
+
+    def __repr__(self):
+        return ('<EffectivePermissionIndex username=%s,roles=%s>' %
+                (self.username, sorted(self.role_names)))
@@ -0,0 +1,259 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing the shapes of the hot queries issued by the RBAC backend and the indexes
+recommended for them.
+
+Each query shape can be explained against the live collections (using values sampled from the
+collection so the planner sees realistic data) to find out which index, if any, the database
+uses for it.
+"""
+
+from __future__ import absolute_import
+
+import collections
+
+from st2common.models.db.rbac import RoleDB
+from st2common.models.db.rbac import UserRoleAssignmentDB
+from st2common.models.db.rbac import PermissionGrantDB
+from st2common.models.db.rbac import GroupToRoleMappingDB
+
+from st2rbac_backend.effective import RBACEffectivePermissionDB
+
+__all__ = [
+    'QueryShape',
+    'QueryPlan',
+
+    'QUERY_SHAPES',
+
+    'explain_query_shape',
+    'get_covering_index',
+    'create_recommended_index'
+]
+
+# name - query shape name
+# model - model class the query is issued against
+# get_filter - function which receives the collection and returns an example filter
+# recommended_index - list of (field, direction) tuples
+QueryShape = collections.namedtuple('QueryShape', ['name', 'model', 'get_filter',
+                                                   'recommended_index'])
+
+# stages - names of all the plan stages
+# index_names - names of the indexes used by the winning plan
+# collection_scan - True if the winning plan includes a collection scan
+QueryPlan = collections.namedtuple('QueryPlan', ['shape', 'collection', 'stages', 'index_names',
+                                                 'collection_scan', 'docs_examined',
+                                                 'keys_examined', 'returned'])
+
+
+def _get_sample_value(collection, field, default):
+    """
+    Return value of the provided field from a sample document (first item for list fields).
+    """
+    document = collection.find_one({field: {'$exists': True, '$ne': None}}, {field: 1})
+
+    if not document:
+        return default
+
+    value = document[field]
+
+    if isinstance(value, list):
+        return value[0] if value else default
+
+    return value
+
+
+def _get_permission_grants_for_user_filter(collection):
+    # RBACService.get_all_permission_grants_for_user, DatabasePermissionIndex. Note: Actual query
+    # also restricts the grants to the ids of the user role grants. That restriction is left out
+    # since the planner would always pick the "_id_" index for it and the explain wouldn't show
+    # whether the resource lookups are served by an index
+    return {
+        'resource_uid': _get_sample_value(collection, 'resource_uid', 'pack:dummy'),
+        'resource_type': {'$in': [_get_sample_value(collection, 'resource_type', 'pack')]},
+        'permission_types': {'$in': [_get_sample_value(collection, 'permission_types',
+                                                       'pack_all')]}
+    }
+
+
+def _get_permission_grant_for_resource_filter(collection):
+    # RBACService.remove_permission_grant_for_resource_db
+    return {
+        'resource_uid': _get_sample_value(collection, 'resource_uid', 'pack:dummy'),
+        'resource_type': _get_sample_value(collection, 'resource_type', 'pack'),
+        'permission_types': _get_sample_value(collection, 'permission_types', 'pack_all')
+    }
+
+
+def _get_local_role_assignments_for_user_filter(collection):
+    # RBACService.get_roles_for_user(include_remote=False)
+    return {
+        'user': _get_sample_value(collection, 'user', 'dummy'),
+        '$or': [{'is_remote': False}, {'is_remote': {'$exists': False}}]
+    }
+
+
+def _get_remote_role_assignments_for_user_filter(collection):
+    # RBACRemoteGroupToRoleSyncer.sync
+    return {
+        'user': _get_sample_value(collection, 'user', 'dummy'),
+        'is_remote': True
+    }
+
+
+def _get_role_assignments_for_roles_filter(collection):
+    # Effective permissions maintenance
+    return {
+        'role': {'$in': [_get_sample_value(collection, 'role', 'dummy')]}
+    }
+
+
+def _get_roles_by_name_filter(collection):
+    # RBACService.get_roles_for_user
+    return {
+        'name': {'$in': [_get_sample_value(collection, 'name', 'dummy')]}
+    }
+
+
+def _get_group_to_role_maps_for_groups_filter(collection):
+    # RBACRemoteGroupToRoleSyncer.sync
+    return {
+        'group': {'$in': [_get_sample_value(collection, 'group', 'dummy')]}
+    }
+
+
+def _get_effective_permissions_for_resource_filter(collection):
+    # EffectivePermissionIndex.find_permission_grant
+    return {
+        'user': _get_sample_value(collection, 'user', 'dummy'),
+        'resource_uid': _get_sample_value(collection, 'resource_uid', 'pack:dummy'),
+        'permission_types': {'$in': [_get_sample_value(collection, 'permission_types',
+                                                       'pack_all')]}
+    }
+
+
+def _get_effective_permissions_for_resource_type_filter(collection):
+    # EffectivePermissionIndex.get_resource_uids
+    return {
+        'user': _get_sample_value(collection, 'user', 'dummy'),
+        'resource_type': {'$in': [_get_sample_value(collection, 'resource_type', 'pack')]}
+    }
+
+
+QUERY_SHAPES = [
+    QueryShape(name='permission_grants_for_user', model=PermissionGrantDB,
+               get_filter=_get_permission_grants_for_user_filter,
+               recommended_index=[('resource_uid', 1), ('resource_type', 1),
+                                  ('permission_types', 1)]),
+    QueryShape(name='permission_grant_for_resource', model=PermissionGrantDB,
+               get_filter=_get_permission_grant_for_resource_filter,
+               recommended_index=[('resource_uid', 1), ('resource_type', 1),
+                                  ('permission_types', 1)]),
+    QueryShape(name='local_role_assignments_for_user', model=UserRoleAssignmentDB,
+               get_filter=_get_local_role_assignments_for_user_filter,
+               recommended_index=[('user', 1), ('is_remote', 1)]),
+    QueryShape(name='remote_role_assignments_for_user', model=UserRoleAssignmentDB,
+               get_filter=_get_remote_role_assignments_for_user_filter,
+               recommended_index=[('user', 1), ('is_remote', 1)]),
+    QueryShape(name='role_assignments_for_roles', model=UserRoleAssignmentDB,
+               get_filter=_get_role_assignments_for_roles_filter,
+               recommended_index=[('role', 1)]),
+    QueryShape(name='roles_by_name', model=RoleDB,
+               get_filter=_get_roles_by_name_filter,
+               recommended_index=[('name', 1)]),
+    QueryShape(name='group_to_role_maps_for_groups', model=GroupToRoleMappingDB,
+               get_filter=_get_group_to_role_maps_for_groups_filter,
+               recommended_index=[('group', 1)]),
+    QueryShape(name='effective_permissions_for_resource', model=RBACEffectivePermissionDB,
+               get_filter=_get_effective_permissions_for_resource_filter,
+               recommended_index=[('user', 1), ('resource_uid', 1)]),
+    QueryShape(name='effective_permissions_for_resource_type', model=RBACEffectivePermissionDB,
+               get_filter=_get_effective_permissions_for_resource_type_filter,
+               recommended_index=[('user', 1), ('resource_type', 1)])
+]
+
+
+def explain_query_shape(query_shape):
+    """
+    Explain the provided query shape against the live collection.
+
+    :type query_shape: :class:`QueryShape`
+
+    :rtype: :class:`QueryPlan`
+    """
+    collection = query_shape.model._get_collection()
+    queryset_filter = query_shape.get_filter(collection)
+
+    explain = collection.find(queryset_filter).explain()
+
+    winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+    stages = []
+    index_names = []
+    _walk_plan(winning_plan, stages=stages, index_names=index_names)
+
+    execution_stats = explain.get('executionStats', {})
+
+    return QueryPlan(shape=query_shape.name, collection=collection.name, stages=stages,
+                     index_names=index_names, collection_scan='COLLSCAN' in stages,
+                     docs_examined=execution_stats.get('totalDocsExamined', None),
+                     keys_examined=execution_stats.get('totalKeysExamined', None),
+                     returned=execution_stats.get('nReturned', None))
+
+
+def get_covering_index(query_shape):
+    """
+    Return name of the existing index which has the recommended index fields as its prefix.
+
+    :return: Index name or None if no such index exists.
+    :rtype: ``str``
+    """
+    collection = query_shape.model._get_collection()
+    recommended_fields = [field for field, _ in query_shape.recommended_index]
+
+    for index_name, index_info in collection.index_information().items():
+        index_fields = [field for field, _ in index_info['key']]
+
+        if index_fields[:len(recommended_fields)] == recommended_fields:
+            return index_name
+
+    return None
+
+
+def create_recommended_index(query_shape):
+    """
+    Create the recommended index for the provided query shape.
+
+    :return: Name of the created index.
+    :rtype: ``str``
+    """
+    collection = query_shape.model._get_collection()
+    return collection.create_index(query_shape.recommended_index, background=True)
+
+
+def _walk_plan(plan, stages, index_names):
+    if not plan:
+        return
+
+    stages.append(plan.get('stage', None))
+
+    if plan.get('indexName', None):
+        index_names.append(plan['indexName'])
+
+    if plan.get('inputStage', None):
+        _walk_plan(plan['inputStage'], stages=stages, index_names=index_names)
+
+    for input_stage in plan.get('inputStages', []):
+        _walk_plan(input_stage, stages=stages, index_names=index_names)
@@ -22,6 +22,7 @@ from __future__ import absolute_import
 import os
 import glob
 import functools
+import multiprocessing
 
 from oslo_config import cfg
 
@@ -32,20 +33,60 @@ from st2common.models.api.rbac import UserRoleAssignmentFileFormatAPI
 from st2common.models.api.rbac import AuthGroupToRoleMapAssignmentFileFormatAPI
 from st2common.util.misc import compare_path_file_name
 
+from st2rbac_backend import config as rbac_config
+from st2rbac_backend.manifest import DefinitionsManifest
+
 LOG = logging.getLogger(__name__)
 
 __all__ = [
     'RBACDefinitionsLoader'
 ]
 
+rbac_config.register_opts()
+
+# Load method -> (definition type, file format API class, name attribute, skip disabled)
+LOAD_METHODS = {
+    'load_role_definition_from_file': ('roles', RoleDefinitionFileFormatAPI, 'name', True),
+    'load_user_role_assignments_from_file': ('role_assignments', UserRoleAssignmentFileFormatAPI,
+                                             'username', True),
+    'load_group_to_role_map_assignment_from_file': ('group_to_role_maps',
+                                                    AuthGroupToRoleMapAssignmentFileFormatAPI,
+                                                    'group', False)
+}
+
+# Loader instance used by the worker processes
+_WORKER_STATE = {
+    'loader': None
+}
+
 
 class RBACDefinitionsLoader(object):
     """
     A class which loads role definitions and user role assignments from files on
     disk.
+
+    Files can optionally be parsed and validated in parallel by a pool of worker processes. The
+    results are always processed in the same (deterministic) order as with sequential loading.
+
+    If a manifest path is configured, only the files which have changed since the previous run
+    are parsed and validated again.
     """
 
-    def __init__(self):
+    def __init__(self, workers=None, manifest_path=None, incremental=False):
+        """
+        :param workers: Number of worker processes used to parse and validate the files. Defaults
+                        to rbac.loader_workers config option.
+        :type workers: ``int``
+
+        :param manifest_path: Path to the manifest of the loaded files. Defaults to
+                              rbac.loader_manifest_path config option.
+        :type manifest_path: ``str``
+
+        :param incremental: True to always use a manifest. If no manifest path is configured, the
+                            manifest is only kept in memory and the loader instance needs to be
+                            reused between the runs.
+        :type incremental: ``bool``
+        """
         base_path = cfg.CONF.system.base_path
 
         self._rbac_definitions_path = os.path.join(base_path, 'rbac/')
@@ -54,11 +95,28 @@ class RBACDefinitionsLoader(object):
         self._role_maps_path = os.path.join(self._rbac_definitions_path, 'mappings/')
         self._meta_loader = MetaLoader()
 
+        if workers is None:
+            workers = cfg.CONF.rbac.loader_workers
+
+        self._workers = max(1, workers or 1)
+
+        if manifest_path is None:
+            manifest_path = cfg.CONF.rbac.loader_manifest_path
+
+        if manifest_path or incremental:
+            self._manifest = DefinitionsManifest(file_path=manifest_path or None)
+        else:
+            self._manifest = None
+
     def load(self):
         """
         :return: Dict with the following keys: roles, role_assiginments
         :rtype: ``dict``
         """
+        if self._manifest:
+            # Discard leftovers from the previous run which hasn't been applied
+            self._manifest.reset()
+
         result = {}
         result['roles'] = self.load_role_definitions()
         result['role_assignments'] = self.load_user_role_assignments()
@@ -66,6 +124,40 @@ class RBACDefinitionsLoader(object):
 
         return result
 
+    def get_definitions_paths(self):
+        """
+        Return paths to the directories containing the definition files.
+
+        :rtype: ``list`` of ``str``
+        """
+        return [self._role_definitions_path, self._role_assignments_path, self._role_maps_path]
+
+    def get_changes(self):
+        """
+        Return names of the roles, users and groups whose definitions have been added, modified
+        or removed since the previous run.
+
+        :return: Dictionary mapping definition type to a dictionary with "added", "modified" and
+                 "removed" keys or None if the manifest is not used.
+        :rtype: ``dict``
+        """
+        if not self._manifest:
+            return None
+
+        return self._manifest.get_changes()
+
+    def save_manifest(self):
+        """
+        Persist the manifest of the loaded files.
+
+        Note: This method should be called after the loaded definitions have been successfully
+        applied.
+        """
+        if not self._manifest:
+            return
+
+        self._manifest.save()
+
     def load_role_definitions(self):
         """
         Load all the role definitions.
@@ -76,9 +168,9 @@ class RBACDefinitionsLoader(object):
         file_paths = self._get_role_definitions_file_paths()
 
         result = {}
-        for file_path in file_paths:
-            LOG.debug('Loading role definition from: %s' % (file_path))
-            role_definition_api = self.load_role_definition_from_file(file_path=file_path)
+        for file_path, role_definition_api in self._load_files(
+                file_paths=file_paths, load_method='load_role_definition_from_file'):
+            LOG.debug('Loaded role definition from: %s' % (file_path))
             role_name = role_definition_api.name
             enabled = getattr(role_definition_api, 'enabled', True)
 
@@ -103,9 +195,9 @@ class RBACDefinitionsLoader(object):
         file_paths = self._get_role_assiginments_file_paths()
 
         result = {}
-        for file_path in file_paths:
-            LOG.debug('Loading user role assignments from: %s' % (file_path))
-            role_assignment_api = self.load_user_role_assignments_from_file(file_path=file_path)
+        for file_path, role_assignment_api in self._load_files(
+                file_paths=file_paths, load_method='load_user_role_assignments_from_file'):
+            LOG.debug('Loaded user role assignments from: %s' % (file_path))
             username = role_assignment_api.username  # pylint: disable=no-member
             enabled = getattr(role_assignment_api, 'enabled', True)
 
@@ -130,11 +222,9 @@ class RBACDefinitionsLoader(object):
         file_paths = self._get_group_to_role_maps_file_paths()
 
         result = {}
-        for file_path in file_paths:
-            LOG.debug('Loading group to role mapping from: %s' % (file_path))
-            group_to_role_map_api = self.load_group_to_role_map_assignment_from_file(
-                file_path=file_path)
-
+        for file_path, group_to_role_map_api in self._load_files(
+                file_paths=file_paths, load_method='load_group_to_role_map_assignment_from_file'):
+            LOG.debug('Loaded group to role mapping from: %s' % (file_path))
             group_name = group_to_role_map_api.group  # pylint: disable=no-member
             result[group_name] = group_to_role_map_api
 
@@ -196,6 +286,102 @@ class RBACDefinitionsLoader(object):
 
         return group_to_role_map_api
 
+    def _load_files(self, file_paths, load_method):
+        """
+        Load the provided files using the provided loader method. Definitions for the files which
+        haven't changed since the previous run are retrieved from the manifest.
+
+        :param file_paths: Paths to the files to load.
+        :type file_paths: ``list`` of ``str``
+
+        :param load_method: Name of the method which loads a single file.
+        :type load_method: ``str``
+
+        :return: Generator which yields (file_path, loaded API object) tuples in the same order
+                 as the provided file paths.
+        """
+        if not self._manifest:
+            for item in self._load_files_from_disk(file_paths=file_paths,
+                                                   load_method=load_method):
+                yield item
+            return
+
+        definition_type, api_cls, name_attribute, skip_disabled = LOAD_METHODS[load_method]
+
+        cached_apis = {}
+        for file_path in file_paths:
+            result = self._manifest.get_result(file_path=file_path,
+                                               definition_type=definition_type)
+
+            if result is not None:
+                cached_apis[file_path] = api_cls(**result)
+
+        file_paths_to_load = [file_path for file_path in file_paths
+                              if file_path not in cached_apis]
+
+        LOG.debug('%s of %s files haven\'t changed since the previous run' %
+                  (len(cached_apis), len(file_paths)))
+
+        loaded_apis = self._load_files_from_disk(file_paths=file_paths_to_load,
+                                                 load_method=load_method)
+
+        try:
+            for file_path in file_paths:
+                if file_path in cached_apis:
+                    yield (file_path, cached_apis[file_path])
+                    continue
+
+                _, api = next(loaded_apis)
+
+                enabled = getattr(api, 'enabled', True) if skip_disabled else True
+                self._manifest.set_result(file_path=file_path, name=getattr(api, name_attribute),
+                                          enabled=enabled, result=dict(vars(api)))
+
+                yield (file_path, api)
+        finally:
+            loaded_apis.close()
+
+    def _load_files_from_disk(self, file_paths, load_method):
+        """
+        Load the provided files using the provided loader method.
+
+        :param file_paths: Paths to the files to load.
+        :type file_paths: ``list`` of ``str``
+
+        :param load_method: Name of the method which loads a single file.
+        :type load_method: ``str``
+
+        :return: Generator which yields (file_path, loaded API object) tuples in the same order
+                 as the provided file paths.
+        """
+        if self._workers <= 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                yield (file_path, getattr(self, load_method)(file_path=file_path))
+            return
+
+        workers = min(self._workers, len(file_paths))
+        chunksize = max(1, len(file_paths) // (workers * 4))
+
+        LOG.debug('Loading %s files using %s worker processes' % (len(file_paths), workers))
+
+        pool = multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                                    initargs=(self,))
+
+        try:
+            args = [(load_method, file_path) for file_path in file_paths]
+            results = pool.imap(_load_file_in_worker, args, chunksize)
+
+            for file_path, (success, result) in zip(file_paths, results):
+                if not success:
+                    # Load the file again in this process so the original exception is raised
+                    # in the same order as with sequential loading
+                    result = getattr(self, load_method)(file_path=file_path)
+
+                yield (file_path, result)
+        finally:
+            pool.terminate()
+            pool.join()
+
     def _get_role_definitions_file_paths(self):
         """
         Retrieve a list of paths for all the role definitions.
@@ -232,3 +418,26 @@ class RBACDefinitionsLoader(object):
         file_paths = glob.glob(glob_str)
         file_paths = sorted(file_paths, key=functools.cmp_to_key(compare_path_file_name))
         return file_paths
+
+
+def _init_worker(loader):
+    _WORKER_STATE['loader'] = loader
+
+
+def _load_file_in_worker(args):
+    """
+    Load a single file inside the worker process.
+
+    :return: (success, result) tuple.
+    :rtype: ``tuple``
+    """
+    load_method, file_path = args
+
+    try:
+        result = getattr(_WORKER_STATE['loader'], load_method)(file_path=file_path)
+    except Exception:
+        # Note: Exceptions are not guaranteed to be picklable so the file is loaded again in the
+        # parent process which raises the original exception
+        return (False, None)
+
+    return (True, result)
@@ -0,0 +1,260 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing on-disk manifest of the loaded RBAC definition files.
+
+For each loaded file, the manifest stores file modification time, size, content digest and the
+parsed and validated definition. On the next run, files whose modification time and size (or
+content digest) haven't changed are not parsed and validated again.
+
+The manifest is also used to determine which roles, user role assignments and group to role
+mappings have been added, modified or removed since the previous run.
+
+Manifest without a file path is only kept in memory which is useful for long running processes
+which load the definitions multiple times.
+"""
+
+from __future__ import absolute_import
+
+import os
+import json
+import hashlib
+
+from st2common import log as logging
+
+__all__ = [
+    'DefinitionsManifest',
+
+    'DEFINITION_TYPES'
+]
+
+LOG = logging.getLogger(__name__)
+
+DEFINITION_TYPES = [
+    'roles',
+    'role_assignments',
+    'group_to_role_maps'
+]
+
+# Note: Version needs to be bumped each time the format of the stored results changes
+MANIFEST_VERSION = 1
+
+
+class DefinitionsManifest(object):
+    """
+    Manifest of the loaded RBAC definition files.
+    """
+
+    def __init__(self, file_path):
+        """
+        :param file_path: Path to the manifest file (None to only keep the manifest in memory).
+        :type file_path: ``str``
+        """
+        self._file_path = file_path
+
+        # Entries recorded during the previous run
+        self._previous_entries = self._read()
+
+        # Entries recorded during this run
+        self._entries = {}
+
+        # File information (modification time, size, digest) for the files which need to be loaded
+        self._pending = {}
+
+        # Definition types which have been loaded during this run
+        self._loaded_types = set([])
+
+    def get_result(self, file_path, definition_type):
+        """
+        Return stored parsed definition for the provided file if the file hasn't changed since it
+        has been recorded.
+
+        :param file_path: Path to the definition file.
+        :type file_path: ``str``
+
+        :param definition_type: Definition type (roles, role_assignments, group_to_role_maps).
+        :type definition_type: ``str``
+
+        :return: Parsed definition values or None if the file needs to be loaded.
+        :rtype: ``dict``
+        """
+        self._loaded_types.add(definition_type)
+
+        entry = self._previous_entries.get(file_path, None)
+
+        if entry and entry['type'] != definition_type:
+            entry = None
+
+        stat = os.stat(file_path)
+
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            self._entries[file_path] = entry
+            return entry['result']
+
+        file_info = {
+            'type': definition_type,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'digest': _get_file_digest(file_path=file_path)
+        }
+
+        if entry and entry['digest'] == file_info['digest']:
+            # Only the modification time has changed, content is the same
+            entry = dict(entry, mtime=file_info['mtime'])
+            self._entries[file_path] = entry
+            return entry['result']
+
+        self._pending[file_path] = file_info
+        return None
+
+    def set_result(self, file_path, name, enabled, result):
+        """
+        Record parsed definition for the provided file.
+
+        Note: get_result() needs to be called for the file before it's loaded so the recorded
+        modification time and digest can never be newer than the recorded definition.
+
+        :param name: Name of the role, user or group the definition belongs to.
+        :type name: ``str``
+
+        :param enabled: True if the definition is enabled.
+        :type enabled: ``bool``
+
+        :param result: Parsed definition values.
+        :type result: ``dict``
+        """
+        entry = self._pending.pop(file_path)
+        entry['name'] = name
+        entry['enabled'] = enabled
+        entry['result'] = result
+
+        self._entries[file_path] = entry
+
+    def get_changes(self):
+        """
+        Return names of the roles, users and groups whose definitions have been added, modified or
+        removed since the previous run.
+
+        Note: Only definition types which have been loaded during this run are included.
+
+        :return: Dictionary mapping definition type to a dictionary with "added", "modified" and
+                 "removed" keys.
+        :rtype: ``dict``
+        """
+        result = {}
+
+        for definition_type in DEFINITION_TYPES:
+            if definition_type not in self._loaded_types:
+                continue
+
+            previous_items = _get_items(self._previous_entries, definition_type)
+            current_items = _get_items(self._entries, definition_type)
+
+            previous_names = set(previous_items.keys())
+            current_names = set(current_items.keys())
+
+            result[definition_type] = {
+                'added': sorted(current_names - previous_names),
+                'modified': sorted([name for name in (current_names & previous_names)
+                                    if current_items[name] != previous_items[name]]),
+                'removed': sorted(previous_names - current_names)
+            }
+
+        return result
+
+    def save(self):
+        """
+        Persist the manifest to disk and mark the entries recorded during this run as the entries
+        of the previous run.
+
+        Entries for the definition types which haven't been loaded during this run are preserved.
+        """
+        entries = {}
+
+        for file_path, entry in self._previous_entries.items():
+            if entry['type'] not in self._loaded_types:
+                entries[file_path] = entry
+
+        entries.update(self._entries)
+
+        self._previous_entries = entries
+        self.reset()
+
+        if not self._file_path:
+            return
+
+        data = {
+            'version': MANIFEST_VERSION,
+            'files': entries
+        }
+
+        # Write to a temporary file first so a partially written manifest is never read
+        tmp_file_path = '%s.tmp' % (self._file_path)
+
+        with open(tmp_file_path, 'w') as fp:
+            json.dump(data, fp, sort_keys=True)
+
+        os.rename(tmp_file_path, self._file_path)
+
+        LOG.debug('Saved manifest with %s entries to "%s"' % (len(entries), self._file_path))
+
+    def reset(self):
+        """
+        Discard all the entries recorded during this run.
+        """
+        self._entries = {}
+        self._pending = {}
+        self._loaded_types = set([])
+
+    def _read(self):
+        if not self._file_path or not os.path.isfile(self._file_path):
+            return {}
+
+        try:
+            with open(self._file_path, 'r') as fp:
+                data = json.load(fp)
+        except Exception as e:
+            LOG.warning('Failed to read manifest "%s", all the files will be loaded: %s' %
+                        (self._file_path, str(e)))
+            return {}
+
+        if not isinstance(data, dict) or data.get('version', None) != MANIFEST_VERSION:
+            LOG.info('Manifest "%s" has been created by a different version, all the files will '
+                     'be loaded' % (self._file_path))
+            return {}
+
+        return data.get('files', {})
+
+
+def _get_items(entries, definition_type):
+    """
+    Return a dictionary mapping name of each enabled definition of the provided type to a
+    (file path, digest) tuple.
+    """
+    result = {}
+
+    for file_path, entry in entries.items():
+        if entry['type'] != definition_type or not entry.get('enabled', True):
+            continue
+
+        result[entry['name']] = (file_path, entry['digest'])
+
+    return result
+
+
+def _get_file_digest(file_path):
+    with open(file_path, 'rb') as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
@@ -0,0 +1,143 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing compiled group to role mappings used by the remote group sync.
+
+Each mapping is compiled into a GroupToRoleMap tuple with the mapped roles already split into the
+ones which exist in the database and the ones which don't.
+
+If rbac.group_to_role_maps_cache is enabled, all the mappings are compiled into a process wide
+group -> GroupToRoleMap table which is rebuilt when the group to role mappings generation changes
+so the login path only needs dictionary lookups. Otherwise mappings for the provided groups are
+retrieved and compiled on each call.
+"""
+
+from __future__ import absolute_import
+
+import time
+import collections
+
+from oslo_config import cfg
+
+from st2common.persistence.rbac import Role
+from st2common.persistence.rbac import GroupToRoleMapping
+
+from st2rbac_backend import config as rbac_config
+from st2rbac_backend.generation import GROUP_TO_ROLE_MAPS_GENERATION_NAME
+from st2rbac_backend.generation import get_generation
+
+__all__ = [
+    'GroupToRoleMap',
+
+    'get_group_to_role_maps',
+    'invalidate_group_to_role_maps_table'
+]
+
+rbac_config.register_opts()
+
+GroupToRoleMap = collections.namedtuple('GroupToRoleMap', ['group', 'enabled', 'roles',
+                                                           'missing_roles', 'source'])
+
+# Compiled table (group -> (position, GroupToRoleMap)), generation it has been built for and the
+# time the generation was last checked
+_TABLE_STATE = {
+    'table': None,
+    'generation': None,
+    'checked_at': 0
+}
+
+
+def get_group_to_role_maps(groups):
+    """
+    Return compiled group to role mappings for the provided groups.
+
+    Mappings are returned in the same order as they are stored in the database.
+
+    :param groups: A list of remote groups.
+    :type groups: ``list`` of ``str``
+
+    :rtype: ``list`` of :class:`GroupToRoleMap`
+    """
+    if not cfg.CONF.rbac.group_to_role_maps_cache:
+        mapping_dbs = list(GroupToRoleMapping.query(group__in=list(groups)))
+        role_names = set([])
+
+        for mapping_db in mapping_dbs:
+            if mapping_db.enabled:
+                role_names.update(mapping_db.roles)
+
+        if role_names:
+            role_names = set(Role.query(name__in=list(role_names)).only('name').scalar('name'))
+
+        return [_compile_group_to_role_map(mapping_db=mapping_db, role_names=role_names)
+                for mapping_db in mapping_dbs]
+
+    table = _get_table()
+    result = [table[group] for group in set(groups) if group in table]
+
+    return [group_to_role_map for _, group_to_role_map in sorted(result, key=lambda i: i[0])]
+
+
+def invalidate_group_to_role_maps_table():
+    """
+    Discard the compiled table so it's rebuilt on the next lookup.
+    """
+    _TABLE_STATE['table'] = None
+
+
+def _get_table():
+    """
+    Return compiled table, rebuilding it if the group to role mappings generation has changed.
+
+    To keep the overhead low, the generation is only read from the database once every
+    rbac.cache_generation_check_interval seconds.
+    """
+    interval = cfg.CONF.rbac.cache_generation_check_interval
+    now = time.time()
+    table = _TABLE_STATE['table']
+
+    if table is not None and interval and (now - _TABLE_STATE['checked_at']) < interval:
+        return table
+
+    _TABLE_STATE['checked_at'] = now
+
+    # Note: Generation needs to be retrieved before the mappings so a change which happens while
+    # the table is being built causes another rebuild
+    generation = get_generation(name=GROUP_TO_ROLE_MAPS_GENERATION_NAME)
+
+    if table is not None and generation == _TABLE_STATE['generation']:
+        return table
+
+    role_names = set(Role.query().only('name').scalar('name'))
+
+    table = {}
+    for position, mapping_db in enumerate(GroupToRoleMapping.get_all()):
+        table[mapping_db.group] = (position, _compile_group_to_role_map(mapping_db=mapping_db,
+                                                                        role_names=role_names))
+
+    _TABLE_STATE['table'] = table
+    _TABLE_STATE['generation'] = generation
+
+    return table
+
+
+def _compile_group_to_role_map(mapping_db, role_names):
+    roles = tuple([role_name for role_name in mapping_db.roles if role_name in role_names])
+    missing_roles = tuple([role_name for role_name in mapping_db.roles
+                           if role_name not in role_names])
+
+    return GroupToRoleMap(group=mapping_db.group, enabled=mapping_db.enabled, roles=roles,
+                          missing_roles=missing_roles, source=mapping_db.source)
@@ -19,8 +19,8 @@ types.
 """
 
 from __future__ import absolute_import
-import sys
-import logging as stdlib_logging
+import re
+import functools
 
 from st2common import log as logging
 from st2common.models.db.pack import PackDB
@@ -28,11 +28,17 @@ from st2common.models.db.webhook import WebhookDB
 from st2common.models.system.common import ResourceReference
 from st2common.constants.triggers import WEBHOOK_TRIGGER_TYPE
 from st2common.persistence.execution import ActionExecution
+from st2common.util.uid import parse_uid
 from st2common.rbac.backends.base import BaseRBACPermissionResolver
+from st2rbac_backend import trace as decision_trace
+from st2rbac_backend.implications import VIEW_GRANT_PERMISSION_TYPES
+from st2rbac_backend.implications import INQUIRY_PERMISSION_TYPES
+from st2rbac_backend.implications import INQUIRY_WORKFLOW_IMPLICATION
+from st2rbac_backend.implications import get_permission_implication
+from st2rbac_backend.cache import request_scope
 from st2rbac_backend.service import RBACService as rbac_service
 from st2common.rbac.types import PermissionType
 from st2common.rbac.types import ResourceType
-from st2common.rbac.types import SystemRole
 from st2common.rbac.types import GLOBAL_PACK_PERMISSION_TYPES
 
 LOG = logging.getLogger(__name__)
@@ -53,8 +59,12 @@ __all__ = [
     'StreamPermissionsResolver',
     'InquiryPermissionsResolver',
 
+    'register_resolver',
     'get_resolver_for_resource_type',
-    'get_resolver_for_permission_type'
+    'get_resolver_for_permission_type',
+
+    'cached_permission_decision',
+    'cached_resource_db_permission_decision'
 ]
 
 # "Read" permission names which are granted to observer role by default
@@ -65,6 +75,78 @@ READ_PERMISSION_NAMES = [
 ]
 
 
+def cached_permission_decision(func):
+    """
+    Decorator for "user_has_permission" methods which caches the outcome (including denials) in
+    the process wide decision cache (if enabled).
+    """
+    @functools.wraps(func)
+    def user_has_permission(self, user_db, permission_type):
+        cache = rbac_service.get_permission_decision_cache()
+
+        if cache is None:
+            return func(self, user_db=user_db, permission_type=permission_type)
+
+        key = (user_db.name, permission_type, None, None)
+        result = cache.get(key, None)
+
+        if result is None:
+            result = func(self, user_db=user_db, permission_type=permission_type)
+            cache.set(key, result)
+        elif decision_trace.ACTIVE:
+            # Cached decisions are still traced (and audited)
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'permission_type': permission_type
+            })
+
+            if trace:
+                trace.finish(result, 'Found a cached decision')
+
+        return result
+
+    return user_has_permission
+
+
+def cached_resource_db_permission_decision(func):
+    """
+    Decorator for "user_has_resource_db_permission" methods which caches the outcome (including
+    denials) in the process wide decision cache (if enabled).
+    """
+    @functools.wraps(func)
+    def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
+        cache = rbac_service.get_permission_decision_cache()
+
+        if cache is None:
+            return func(self, user_db=user_db, resource_db=resource_db,
+                        permission_type=permission_type)
+
+        resource_uid = resource_db.get_uid()
+        pack_uid = getattr(resource_db, 'pack', None)
+
+        key = (user_db.name, permission_type, resource_uid, pack_uid)
+        result = cache.get(key, None)
+
+        if result is None:
+            result = func(self, user_db=user_db, resource_db=resource_db,
+                          permission_type=permission_type)
+            cache.set(key, result)
+        elif decision_trace.ACTIVE:
+            # Cached decisions are still traced (and audited)
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_uid': resource_uid,
+                'permission_type': permission_type
+            })
+
+            if trace:
+                trace.finish(result, 'Found a cached decision')
+
+        return result
+
+    return user_has_resource_db_permission
+
+
 class PermissionsResolver(BaseRBACPermissionResolver):
     """
     Base Permissions Resolver class.
@@ -95,6 +177,39 @@ class PermissionsResolver(BaseRBACPermissionResolver):
         """
         raise NotImplementedError()
 
+    def user_has_resource_db_permissions(self, user_db, resource_dbs, permission_type):
+        """
+        Batch version of "user_has_resource_db_permission" method which checks user permissions on
+        multiple existing resources (e.g. results of a list operation).
+
+        User roles and permission grants are loaded once and all the resources (including the
+        parent pack fallback) are evaluated in memory.
+
+        :return: List of booleans with the same length and order as resource_dbs.
+        :rtype: ``list`` of ``bool``
+        """
+        with request_scope():
+            result = [self.user_has_resource_db_permission(user_db=user_db,
+                                                           resource_db=resource_db,
+                                                           permission_type=permission_type)
+                      for resource_db in resource_dbs]
+
+        return result
+
+    def get_resource_db_query_filter(self, user_db, permission_type):
+        """
+        Method which returns a MongoDB filter expression which matches only the resources on which
+        the user has the provided permission.
+
+        Callers can push the returned filter down into their own queries (e.g.
+        Model.objects(__raw__=query_filter)) instead of fetching all the resources and checking
+        permissions on each of them.
+
+        :return: MongoDB filter or None if the user has the permission on all the resources.
+        :rtype: ``dict`` or ``None``
+        """
+        raise NotImplementedError()
+
     def _user_has_list_permission(self, user_db, permission_type):
         """
         Common method for checking if a user has specific "list" resource permission (e.g.
@@ -108,57 +223,92 @@ class PermissionsResolver(BaseRBACPermissionResolver):
         Custom method for checking if user has a particular global permission which doesn't apply
         to a specific resource but it's system-wide aka global permission.
         """
-        log_context = {
-            'user_db': user_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         permission_types = [permission_type]
 
         # Check direct grants
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
+        permission_grant_id = permission_index.find_permission_grant(
             permission_types=permission_types)
-        if len(permission_grants) >= 1:
-            self._log('Found a direct grant', extra=log_context)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a direct grant', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
-    def _user_has_system_role_permission(self, user_db, permission_type):
+    def _user_has_system_role_permission(self, user_db, permission_type, permission_index=None):
         """
         Check the user system roles and return True if user has the required permission.
 
+        :param permission_index: Optional already compiled permission index for the user.
+        :type permission_index: :class:`BasePermissionIndex`
+
         :rtype: ``bool``
         """
-        permission_name = PermissionType.get_permission_name(permission_type)
-
-        user_role_dbs = rbac_service.get_roles_for_user(user_db=user_db)
-        user_role_names = [role_db.name for role_db in user_role_dbs]
+        if permission_index is None:
+            permission_index = self._get_permission_index(user_db=user_db)
 
-        if SystemRole.SYSTEM_ADMIN in user_role_names:
+        if permission_index.is_system_admin:
             # System admin has all the permissions
             return True
-        elif SystemRole.ADMIN in user_role_names:
+        elif permission_index.is_admin:
             # Admin has all the permissions
             return True
-        elif SystemRole.OBSERVER in user_role_names and permission_name in READ_PERMISSION_NAMES:
+        elif permission_index.is_observer:
             # Observer role has "view" permission on all the resources
-            return True
+            permission_name = PermissionType.get_permission_name(permission_type)
+            return permission_name in READ_PERMISSION_NAMES
 
         return False
 
+    def _get_permission_index(self, user_db):
+        """
+        Retrieve permission index with all the roles and permission grants for the provided user.
+
+        This is either a compiled in-memory index (when it can be re-used for multiple checks) or
+        a database backed index which answers each lookup with an existence query.
+
+        :rtype: :class:`BasePermissionIndex`
+        """
+        return rbac_service.get_permission_index_for_user(user_db=user_db)
+
+    def _get_implication_resources(self, implication, resource_uids):
+        """
+        Return resources to look the grants up on for the provided permission implication.
+
+        :param implication: Permission implication.
+        :type implication: :class:`PermissionImplication`
+
+        :param resource_uids: Dictionary mapping resource type to the uid of the checked resource
+                              (or its parent) of that type.
+        :type resource_uids: ``dict``
+
+        :return: (resource_uid, resource_type) tuples in the implication order.
+        :rtype: ``list`` of ``tuple``
+        """
+        return [(resource_uids[resource_type], resource_type)
+                for resource_type in implication.resource_types]
+
     def _matches_permission_grant(self, resource_db, permission_grant, permission_type,
                                   all_permission_type):
         """
@@ -182,17 +332,6 @@ class PermissionsResolver(BaseRBACPermissionResolver):
                                                              permission_name='all')
         return permission_type
 
-    def _log(self, message, extra, level=stdlib_logging.DEBUG, **kwargs):
-        """
-        Custom logger method which prefix message with the class and caller method name.
-        """
-        class_name = self.__class__.__name__
-        method_name = sys._getframe().f_back.f_code.co_name
-        message_prefix = '%s.%s: ' % (class_name, method_name)
-        message = message_prefix + message
-
-        LOG.log(level, message, extra=extra, **kwargs)
-
 
 class ContentPackResourcePermissionsResolver(PermissionsResolver):
     """
@@ -206,64 +345,58 @@ class ContentPackResourcePermissionsResolver(PermissionsResolver):
     view_grant_permission_types = []
 
     def _user_has_resource_permission(self, user_db, pack_uid, resource_uid, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'pack_uid': pack_uid,
-            'resource_uid': resource_uid,
-            'resource_type': self.resource_type,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'pack_uid': pack_uid,
+                'resource_uid': resource_uid,
+                'resource_type': self.resource_type,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
-        self._log('Checking grants via system role permissions', extra=log_context)
+        if trace:
+            trace.step('Checking grants via system role permissions')
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
-        # Check custom roles
-        view_permission_type = PermissionType.get_permission_type(resource_type=self.resource_type,
-                                                                  permission_name='view')
-        all_permission_type = PermissionType.get_permission_type(resource_type=self.resource_type,
-                                                                 permission_name='all')
-
-        if permission_type == view_permission_type:
-            # Note: Some permissions such as "create", "modify", "delete" and "execute" also
-            # grant / imply "view" permission
-            permission_types = self.view_grant_permission_types[:] + [permission_type]
-        elif permission_type not in all_permission_type:
-            permission_types = [all_permission_type, permission_type]
-        else:
-            permission_types = [permission_type]
-
-        # Check direct grants on the specified resource
-        self._log('Checking direct grants on the specified resource', extra=log_context)
-        resource_types = [self.resource_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                                 resource_uid=resource_uid,
-                                                                 resource_types=resource_types,
-                                                                 permission_types=permission_types)
-        if len(permission_grants) >= 1:
-            self._log('Found a direct grant on the action', extra=log_context)
+        # Check custom roles. Note: Some permissions such as "create", "modify", "delete" and
+        # "execute" also grant / imply "view" permission and "all" grants / implies all the other
+        # permissions
+        implication = get_permission_implication(permission_type)
+        permission_types = implication.permission_types
+
+        # Check direct grants on the specified resource and grants on the parent pack
+        if trace:
+            trace.step('Checking direct grants on the specified resource and grants on the parent '
+                       'resource')
+        resources = self._get_implication_resources(implication=implication, resource_uids={
+            self.resource_type: resource_uid,
+            ResourceType.PACK: pack_uid
+        })
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=resources, permission_types=permission_types)
+
+        if matched_grant and matched_grant.resource_type == self.resource_type:
+            if trace:
+                trace.finish(True, 'Found a direct grant on the action',
+                             matched=matched_grant.permission_grant_id)
             return True
-
-        # Check grants on the parent pack
-        self._log('Checking grants on the parent resource', extra=log_context)
-        resource_types = [ResourceType.PACK]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                                resource_uid=pack_uid,
-                                                                resource_types=resource_types,
-                                                                permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the action parent pack', extra=log_context)
+        elif matched_grant:
+            if trace:
+                trace.finish(True, 'Found a grant on the action parent pack',
+                             matched=matched_grant.permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -273,41 +406,48 @@ class RunnerPermissionsResolver(PermissionsResolver):
     """
     resource_type = ResourceType.RUNNER
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.RUNNER_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         resource_uid = resource_db.get_uid()
-        resource_types = [ResourceType.RUNNER]
-        permission_types = [permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=resource_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=resource_uid, resource_types=resource_types,
+            permission_types=permission_types)
 
-        if len(permission_grants) >= 1:
-            self._log('Found a direct grant on the runner type', extra=log_context)
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a direct grant on the runner type',
+                             matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -318,6 +458,7 @@ class PackPermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.PACK
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in GLOBAL_PACK_PERMISSION_TYPES
 
@@ -327,37 +468,42 @@ class PackPermissionsResolver(PermissionsResolver):
             return self._user_has_global_permission(user_db=user_db,
                                                     permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         resource_uid = resource_db.get_uid()
-        resource_types = [ResourceType.PACK]
-        permission_types = [permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=resource_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=resource_uid, resource_types=resource_types,
+            permission_types=permission_types)
 
-        if len(permission_grants) >= 1:
-            self._log('Found a direct grant on the pack', extra=log_context)
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a direct grant on the pack', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -367,15 +513,14 @@ class SensorPermissionsResolver(ContentPackResourcePermissionsResolver):
     """
 
     resource_type = ResourceType.SENSOR
-    view_grant_permission_types = [
-        PermissionType.SENSOR_ALL,
-        PermissionType.SENSOR_MODIFY
-    ]
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.SENSOR_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
         sensor_uid = resource_db.get_uid()
         pack_uid = resource_db.get_pack_uid()
@@ -390,14 +535,9 @@ class ActionPermissionsResolver(ContentPackResourcePermissionsResolver):
     """
 
     resource_type = ResourceType.ACTION
-    view_grant_permission_types = [
-        PermissionType.ACTION_ALL,
-        PermissionType.ACTION_CREATE,
-        PermissionType.ACTION_MODIFY,
-        PermissionType.ACTION_DELETE,
-        PermissionType.ACTION_EXECUTE,
-    ]
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.ACTION_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
@@ -411,6 +551,7 @@ class ActionPermissionsResolver(ContentPackResourcePermissionsResolver):
                                                   resource_uid=action_uid,
                                                   permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
         action_uid = resource_db.get_uid()
         pack_uid = resource_db.get_pack_uid()
@@ -425,13 +566,9 @@ class ActionAliasPermissionsResolver(ContentPackResourcePermissionsResolver):
     """
 
     resource_type = ResourceType.ACTION_ALIAS
-    view_grant_permission_types = [
-        PermissionType.ACTION_ALIAS_ALL,
-        PermissionType.ACTION_ALIAS_CREATE,
-        PermissionType.ACTION_ALIAS_MODIFY,
-        PermissionType.ACTION_ALIAS_DELETE
-    ]
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.ACTION_ALIAS_LIST,
                                    PermissionType.ACTION_ALIAS_MATCH,
@@ -455,6 +592,7 @@ class ActionAliasPermissionsResolver(ContentPackResourcePermissionsResolver):
                                                   resource_uid=action_alias_uid,
                                                   permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
         action_alias_uid = resource_db.get_uid()
         pack_uid = resource_db.get_pack_uid()
@@ -469,12 +607,7 @@ class RulePermissionsResolver(ContentPackResourcePermissionsResolver):
     """
 
     resource_type = ResourceType.RULE
-    view_grant_permission_types = [
-        PermissionType.RULE_ALL,
-        PermissionType.RULE_CREATE,
-        PermissionType.RULE_MODIFY,
-        PermissionType.RULE_DELETE
-    ]
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
     def user_has_trigger_permission(self, user_db, trigger):
         """
@@ -488,18 +621,20 @@ class RulePermissionsResolver(ContentPackResourcePermissionsResolver):
         :param trigger: "trigger" attribute of the RuleAPI object.
         :type trigger: ``dict``
         """
-        log_context = {
-            'user_db': user_db,
-            'trigger': trigger,
-            'resolver': self.__class__.__name__
-        }
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'trigger': trigger
+            })
 
         trigger_type = trigger['type']
         trigger_parameters = trigger.get('parameters', {})
 
         if trigger_type != WEBHOOK_TRIGGER_TYPE:
-            self._log('Not a webhook trigger type, ignoring trigger permission checking',
-                      extra=log_context)
+            if trace:
+                trace.finish(True, 'Not a webhook trigger type, ignoring trigger permission '
+                                   'checking')
             return True
 
         resolver = get_resolver_for_resource_type(ResourceType.WEBHOOK)
@@ -510,10 +645,12 @@ class RulePermissionsResolver(ContentPackResourcePermissionsResolver):
                                                           permission_type=permission_type)
 
         if result is True:
-            self._log('Found a matching trigger grant', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching trigger grant')
             return True
 
-        self._log('No matching trigger grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching trigger grants found')
         return False
 
     def user_has_action_permission(self, user_db, action_ref):
@@ -522,6 +659,7 @@ class RulePermissionsResolver(ContentPackResourcePermissionsResolver):
         """
         pass
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.RULE_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
@@ -535,6 +673,7 @@ class RulePermissionsResolver(ContentPackResourcePermissionsResolver):
                                                   resource_uid=rule_uid,
                                                   permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
         rule_uid = resource_db.get_uid()
         pack_uid = resource_db.get_pack_uid()
@@ -549,26 +688,30 @@ class RuleEnforcementPermissionsResolver(PermissionsResolver):
     """
     resource_type = ResourceType.RULE_ENFORCEMENT
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.RULE_ENFORCEMENT_LIST]
         permission_type = PermissionType.RULE_LIST
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
@@ -581,53 +724,72 @@ class RuleEnforcementPermissionsResolver(PermissionsResolver):
             LOG.error('Rule UID or ID or PACK not present in enforcement object. ' +
                       ('UID = %s, ID = %s, PACK = %s' % (rule_uid, rule_id, rule_pack)) +
                       'Cannot assess access permissions without it. Defaulting to DENY.')
+            if trace:
+                trace.finish(False, 'Rule UID or ID or PACK not present in enforcement object')
             return False
 
         # TODO: Add utility methods for constructing uids from parts
         pack_db = PackDB(ref=rule_pack)
         rule_pack_uid = pack_db.get_uid()
 
-        rule_permission_type = None
-        if permission_type == PermissionType.RULE_ENFORCEMENT_VIEW:
-            rule_permission_type = PermissionType.RULE_VIEW
-        elif permission_type == PermissionType.RULE_ENFORCEMENT_LIST:
-            rule_permission_type = PermissionType.RULE_LIST
-        else:
-            raise ValueError('Invalid permission type: %s' % (permission_type))
+        implication = get_permission_implication(permission_type)
+        permission_types = implication.permission_types
+
+        # Check grants on the pack of the rule to which enforcement belongs to and grants on the
+        # rule the enforcement belongs to
+        resources = self._get_implication_resources(implication=implication, resource_uids={
+            ResourceType.RULE: rule_uid,
+            ResourceType.PACK: rule_pack_uid
+        })
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=resources, permission_types=permission_types)
+
+        if matched_grant and matched_grant.resource_type == ResourceType.PACK:
+            if trace:
+                trace.finish(True, 'Found a grant on the enforcement rule parent pack',
+                             matched=matched_grant.permission_grant_id)
+            return True
+        elif matched_grant:
+            if trace:
+                trace.finish(True, 'Found a grant on the enforcement\'s rule.',
+                             matched=matched_grant.permission_grant_id)
+            return True
 
-        permission_types = [PermissionType.RULE_ALL, rule_permission_type]
+        if trace:
+            trace.finish(False, 'No matching grants found')
+        return False
 
-        view_permission_type = PermissionType.get_permission_type(resource_type=ResourceType.RULE,
-                                                                  permission_name='view')
+    def get_resource_db_query_filter(self, user_db, permission_type):
+        """
+        Return MongoDB filter which matches enforcements of the rules (and rules in the packs) on
+        which the user has the corresponding rule permission granted.
+        """
+        permission_index = self._get_permission_index(user_db=user_db)
+        has_system_role_permission = self._user_has_system_role_permission(
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
-        if rule_permission_type == view_permission_type:
-            permission_types = (RulePermissionsResolver.view_grant_permission_types[:] +
-                                [rule_permission_type])
+        if has_system_role_permission:
+            return None
 
-        # Check grants on the pack of the rule to which enforcement belongs to
-        resource_types = [ResourceType.PACK]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=rule_pack_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
+        permission_types = get_permission_implication(permission_type).permission_types
 
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the enforcement rule parent pack', extra=log_context)
-            return True
+        rule_uids = permission_index.get_resource_uids(resource_type=ResourceType.RULE,
+                                                       permission_types=permission_types)
+        pack_uids = permission_index.get_resource_uids(resource_type=ResourceType.PACK,
+                                                       permission_types=permission_types)
+        pack_refs = [_get_pack_ref_from_uid(pack_uid) for pack_uid in pack_uids]
 
-        # Check grants on the rule the enforcement belongs to
-        resource_types = [ResourceType.RULE]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=rule_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
+        query_filters = []
 
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the enforcement\'s rule.', extra=log_context)
-            return True
+        if rule_uids:
+            query_filters.append({'rule.uid': {'$in': sorted(rule_uids)}})
 
-        self._log('No matching grants found', extra=log_context)
-        return False
+        # Enforcements don't store rule pack so we match on the rule ref prefix. Note: Simple
+        # anchored prefix regex can still utilize the index on "rule.ref".
+        for pack_ref in sorted(pack_refs):
+            query_filters.append({'rule.ref': {'$regex': '^%s\\.' % (re.escape(pack_ref))}})
+
+        return _combine_query_filters(query_filters)
 
 
 class KeyValuePermissionsResolver(PermissionsResolver):
@@ -637,12 +799,35 @@ class KeyValuePermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.KEY_VALUE_PAIR
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'permission_type': permission_type
+            })
+
         # TODO: We don't support assigning permissions on key value pairs yet
+        if trace:
+            trace.finish(True, 'Permissions on key value pairs are not enforced')
+
         return True
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
+
         # TODO: We don't support assigning permissions on key value pairs yet
+        if trace:
+            trace.finish(True, 'Permissions on key value pairs are not enforced')
+
         return True
 
 
@@ -653,26 +838,30 @@ class ExecutionPermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.EXECUTION
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.EXECUTION_LIST,
                                    PermissionType.EXECUTION_VIEWS_FILTERS_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
@@ -684,88 +873,111 @@ class ExecutionPermissionsResolver(PermissionsResolver):
         action_uid = action['uid']
         action_pack_uid = pack_db.get_uid()
 
-        # Note: "action_execute" also grants / implies "execution_re_run" and "execution_stop"
-        if permission_type == PermissionType.EXECUTION_VIEW:
-            action_permission_type = PermissionType.ACTION_VIEW
-        elif permission_type in [PermissionType.EXECUTION_RE_RUN,
-                                 PermissionType.EXECUTION_STOP]:
-            action_permission_type = PermissionType.ACTION_EXECUTE
-        elif permission_type == PermissionType.EXECUTION_ALL:
-            action_permission_type = PermissionType.ACTION_ALL
-        elif permission_type == PermissionType.EXECUTION_VIEWS_FILTERS_LIST:
-            action_permission_type = PermissionType.EXECUTION_VIEWS_FILTERS_LIST
-        else:
-            raise ValueError('Invalid permission type: %s' % (permission_type))
-
-        # Check grants on the pack of the action to which execution belongs to
-        resource_types = [ResourceType.PACK]
-        permission_types = [PermissionType.ACTION_ALL, action_permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=action_pack_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the execution action parent pack', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        permission_types = implication.permission_types
+
+        # Check grants on the pack of the action to which execution belongs to and grants on the
+        # action the execution belongs to
+        resources = self._get_implication_resources(implication=implication, resource_uids={
+            ResourceType.ACTION: action_uid,
+            ResourceType.PACK: action_pack_uid
+        })
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=resources, permission_types=permission_types)
+
+        if matched_grant and matched_grant.resource_type == ResourceType.PACK:
+            if trace:
+                trace.finish(True, 'Found a grant on the execution action parent pack',
+                             matched=matched_grant.permission_grant_id)
             return True
-
-        # Check grants on the action the execution belongs to
-        resource_types = [ResourceType.ACTION]
-        permission_types = [PermissionType.ACTION_ALL, action_permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=action_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the execution action', extra=log_context)
+        elif matched_grant:
+            if trace:
+                trace.finish(True, 'Found a grant on the execution action',
+                             matched=matched_grant.permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
+    def get_resource_db_query_filter(self, user_db, permission_type):
+        """
+        Return MongoDB filter which matches executions of the actions (and actions in the packs)
+        on which the user has the corresponding action permission granted.
+        """
+        permission_index = self._get_permission_index(user_db=user_db)
+        has_system_role_permission = self._user_has_system_role_permission(
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
+
+        if has_system_role_permission:
+            return None
+
+        permission_types = get_permission_implication(permission_type).permission_types
+
+        action_uids = permission_index.get_resource_uids(resource_type=ResourceType.ACTION,
+                                                         permission_types=permission_types)
+        pack_uids = permission_index.get_resource_uids(resource_type=ResourceType.PACK,
+                                                       permission_types=permission_types)
+        pack_refs = [_get_pack_ref_from_uid(pack_uid) for pack_uid in pack_uids]
+
+        query_filters = []
+
+        if action_uids:
+            query_filters.append({'action.uid': {'$in': sorted(action_uids)}})
+
+        if pack_refs:
+            query_filters.append({'action.pack': {'$in': sorted(pack_refs)}})
+
+        return _combine_query_filters(query_filters)
+
 
 class WebhookPermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.WEBHOOK
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.WEBHOOK_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         webhook_uid = resource_db.get_uid()
 
         # Check direct grants on the webhook
-        resource_types = [ResourceType.WEBHOOK]
-        permission_types = [PermissionType.WEBHOOK_ALL, permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=webhook_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the webhook', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=webhook_uid, resource_types=resource_types,
+            permission_types=permission_types)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the webhook', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -776,43 +988,49 @@ class TimerPermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.TIMER
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.TIMER_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         timer_uid = resource_db.get_uid()
 
         # Check direct grants on the webhook
-        resource_types = [ResourceType.TIMER]
-        permission_types = [PermissionType.TIMER_ALL, permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=timer_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the timer', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=timer_uid, resource_types=resource_types,
+            permission_types=permission_types)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the timer', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -823,6 +1041,7 @@ class ApiKeyPermissionResolver(PermissionsResolver):
 
     resource_type = ResourceType.API_KEY
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.API_KEY_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
@@ -831,39 +1050,44 @@ class ApiKeyPermissionResolver(PermissionsResolver):
         assert permission_type in [PermissionType.API_KEY_CREATE]
         return self._user_has_global_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         api_key_uid = resource_db.get_uid()
 
         # Check direct grants on the webhook
-        resource_types = [ResourceType.API_KEY]
-        permission_types = [PermissionType.API_KEY_ALL, permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=api_key_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the api key', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=api_key_uid, resource_types=resource_types,
+            permission_types=permission_types)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the api key', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -874,43 +1098,49 @@ class TracePermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.TRACE
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.TRACE_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         trace_uid = resource_db.get_uid()
 
         # Check direct grants on the webhook
-        resource_types = [ResourceType.TRACE]
-        permission_types = [PermissionType.TRACE_ALL, permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=trace_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the trace', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=trace_uid, resource_types=resource_types,
+            permission_types=permission_types)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the trace', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -921,43 +1151,49 @@ class TriggerPermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.TRIGGER
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.TRIGGER_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         timer_uid = resource_db.get_uid()
 
         # Check direct grants on the webhook
-        resource_types = [ResourceType.TRIGGER]
-        permission_types = [PermissionType.TRIGGER_ALL, permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=timer_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the timer', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=timer_uid, resource_types=resource_types,
+            permission_types=permission_types)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the timer', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -968,43 +1204,49 @@ class PolicyTypePermissionsResolver(PermissionsResolver):
 
     resource_type = ResourceType.POLICY_TYPE
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.POLICY_TYPE_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check custom roles
         policy_type_uid = resource_db.get_uid()
 
         # Check direct grants on the webhook
-        resource_types = [ResourceType.POLICY_TYPE]
-        permission_types = [PermissionType.POLICY_TYPE_ALL, permission_type]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_uid=policy_type_uid,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
-
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the policy type', extra=log_context)
+        implication = get_permission_implication(permission_type)
+        resource_types = list(implication.resource_types)
+        permission_types = implication.permission_types
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_uid=policy_type_uid, resource_types=resource_types,
+            permission_types=permission_types)
+
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the policy type', matched=permission_grant_id)
             return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
@@ -1014,13 +1256,9 @@ class PolicyPermissionsResolver(ContentPackResourcePermissionsResolver):
     """
 
     resource_type = ResourceType.POLICY
-    view_grant_permission_types = [
-        PermissionType.POLICY_ALL,
-        PermissionType.POLICY_CREATE,
-        PermissionType.POLICY_MODIFY,
-        PermissionType.POLICY_DELETE
-    ]
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.POLICY_LIST]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
@@ -1034,6 +1272,7 @@ class PolicyPermissionsResolver(ContentPackResourcePermissionsResolver):
                                                   resource_uid=policy_uid,
                                                   permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
         policy_uid = resource_db.get_uid()
         pack_uid = resource_db.get_pack_uid()
@@ -1044,8 +1283,9 @@ class PolicyPermissionsResolver(ContentPackResourcePermissionsResolver):
 
 class StreamPermissionsResolver(PermissionsResolver):
     resource_type = ResourceType.STREAM
-    view_grant_permission_types = []
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.STREAM_VIEW]
         return self._user_has_global_permission(user_db=user_db, permission_type=permission_type)
@@ -1053,17 +1293,14 @@ class StreamPermissionsResolver(PermissionsResolver):
 
 class InquiryPermissionsResolver(PermissionsResolver):
     resource_type = ResourceType.INQUIRY
-    view_grant_permission_types = [
-        PermissionType.INQUIRY_LIST,
-        PermissionType.INQUIRY_VIEW,
-        PermissionType.INQUIRY_RESPOND,
-        PermissionType.INQUIRY_ALL
-    ]
+    view_grant_permission_types = VIEW_GRANT_PERMISSION_TYPES[resource_type]
 
+    @cached_permission_decision
     def user_has_permission(self, user_db, permission_type):
         assert permission_type in [PermissionType.INQUIRY_LIST, PermissionType.INQUIRY_ALL]
         return self._user_has_list_permission(user_db=user_db, permission_type=permission_type)
 
+    @cached_resource_db_permission_decision
     def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
         """
         Method for checking user permissions on an existing resource (e.g. get one, edit, delete
@@ -1071,43 +1308,42 @@ class InquiryPermissionsResolver(PermissionsResolver):
 
         NOTE:
         Because we're borrowing the ActionExecutionDB model, the resource_db parameter is
-        effectively ignored. All other filters are passed to get_all_permission_grants_for_user.
+        effectively ignored. All other filters are passed to the user permission index lookup.
         Since all Inquiry permission types are global, this will still correctly return a list of
         grants.
         """
 
-        permission_types = [
-            PermissionType.INQUIRY_VIEW,
-            PermissionType.INQUIRY_RESPOND,
-            PermissionType.INQUIRY_ALL
-        ]
+        assert permission_type in INQUIRY_PERMISSION_TYPES
 
-        assert permission_type in permission_types
+        implication = get_permission_implication(permission_type)
+        permission_types = implication.permission_types
 
-        log_context = {
-            'user_db': user_db,
-            'resource_db': resource_db,
-            'permission_type': permission_type,
-            'resolver': self.__class__.__name__
-        }
-        self._log('Checking user resource permissions', extra=log_context)
+        trace = None
+        if decision_trace.ACTIVE:
+            trace = decision_trace.start_trace(self, {
+                'user_db': user_db,
+                'resource_db': resource_db,
+                'permission_type': permission_type
+            })
 
         # First check the system role permissions
+        permission_index = self._get_permission_index(user_db=user_db)
         has_system_role_permission = self._user_has_system_role_permission(
-            user_db=user_db, permission_type=permission_type)
+            user_db=user_db, permission_type=permission_type, permission_index=permission_index)
 
         if has_system_role_permission:
-            self._log('Found a matching grant via system role', extra=log_context)
+            if trace:
+                trace.finish(True, 'Found a matching grant via system role')
             return True
 
         # Check for explicit Inquiry grants first
-        resource_types = [ResourceType.INQUIRY]
-        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
-                                                               resource_types=resource_types,
-                                                               permission_types=permission_types)
+        resource_types = list(implication.resource_types)
+        permission_grant_id = permission_index.find_permission_grant(
+            resource_types=resource_types, permission_types=permission_types)
 
-        if len(permission_grants) >= 1:
-            self._log('Found a grant on the inquiry', extra=log_context)
+        if permission_grant_id:
+            if trace:
+                trace.finish(True, 'Found a grant on the inquiry', matched=permission_grant_id)
             return True
 
         # If the inquiry has a parent (is in a workflow) we want to
@@ -1123,89 +1359,99 @@ class InquiryPermissionsResolver(PermissionsResolver):
             wf_action_uid = wf_action['uid']
             wf_action_pack_uid = wf_pack_db.get_uid()
 
-            # Check grants on the pack of the workflow that the Inquiry was generated from
-            resource_types = [ResourceType.PACK]
-            permission_types = [PermissionType.ACTION_ALL, PermissionType.ACTION_EXECUTE]
-            permission_grants = rbac_service.get_all_permission_grants_for_user(
-                user_db=user_db,
-                resource_uid=wf_action_pack_uid,
-                resource_types=resource_types,
-                permission_types=permission_types
-            )
-
-            if len(permission_grants) >= 1:
-                log_context['wf_action_pack_uid'] = wf_action_pack_uid
-                self._log(
-                    'Found a grant on the parent pack for an inquiry workflow',
-                    extra=log_context
-                )
+            # Check grants on the pack of the workflow and grants on the workflow that the
+            # Inquiry was generated from
+            resources = self._get_implication_resources(
+                implication=INQUIRY_WORKFLOW_IMPLICATION, resource_uids={
+                    ResourceType.ACTION: wf_action_uid,
+                    ResourceType.PACK: wf_action_pack_uid
+                })
+            permission_types = INQUIRY_WORKFLOW_IMPLICATION.permission_types
+            matched_grant = permission_index.find_resource_permission_grant(
+                resources=resources, permission_types=permission_types)
+
+            if matched_grant and matched_grant.resource_type == ResourceType.PACK:
+                if trace:
+                    trace.context['wf_action_pack_uid'] = wf_action_pack_uid
+                    trace.finish(True, 'Found a grant on the parent pack for an inquiry workflow',
+                                 matched=matched_grant.permission_grant_id)
                 return True
-
-            # Check grants on the workflow that the Inquiry was generated from
-            resource_types = [ResourceType.ACTION]
-            permission_types = [PermissionType.ACTION_ALL, PermissionType.ACTION_EXECUTE]
-            permission_grants = rbac_service.get_all_permission_grants_for_user(
-                user_db=user_db,
-                resource_uid=wf_action_uid,
-                resource_types=resource_types,
-                permission_types=permission_types
-            )
-
-            if len(permission_grants) >= 1:
-                log_context['wf_action_uid'] = wf_action_uid
-                self._log('Found a grant on the inquiry workflow', extra=log_context)
+            elif matched_grant:
+                if trace:
+                    trace.context['wf_action_uid'] = wf_action_uid
+                    trace.finish(True, 'Found a grant on the inquiry workflow',
+                                 matched=matched_grant.permission_grant_id)
                 return True
 
-        self._log('No matching grants found', extra=log_context)
+        if trace:
+            trace.finish(False, 'No matching grants found')
         return False
 
 
+def _get_pack_ref_from_uid(pack_uid):
+    """
+    Return pack ref from the provided pack uid (e.g. "pack:examples" -> "examples").
+    """
+    _, uid_remainder = parse_uid(pack_uid)
+    return uid_remainder[0]
+
+
+def _combine_query_filters(query_filters):
+    """
+    Combine the provided MongoDB filters using "$or" operator.
+
+    If no filters are provided, filter which matches no documents is returned.
+    """
+    if not query_filters:
+        return {'_id': {'$in': []}}
+    elif len(query_filters) == 1:
+        return query_filters[0]
+
+    return {'$or': query_filters}
+
+
+def register_resolver(resource_type, resolver_cls, permission_types=None):
+    """
+    Register resolver class for the provided resource type.
+
+    This allows additional (e.g. third-party) resource types to plug in their resolvers and it
+    can also be used to override a resolver for one of the built-in resource types.
+
+    :param resource_type: Resource type the resolver handles.
+    :type resource_type: ``str``
+
+    :param resolver_cls: Resolver class. The class is instantiated once and the same instance is
+                         returned for all the lookups so resolvers need to be stateless.
+    :type resolver_cls: ``type``
+
+    :param permission_types: Optional permission types the resolver handles. Only needs to be
+                             provided for permission types whose resource type can't be
+                             derived using "PermissionType.get_resource_type".
+    :type permission_types: ``list`` of ``str``
+
+    :return: Resolver instance.
+    :rtype: Instance of :class:`PermissionsResolver`
+    """
+    resolver_instance = resolver_cls()
+    _RESOLVERS_BY_RESOURCE_TYPE[resource_type] = resolver_instance
+
+    for permission_type in permission_types or []:
+        _PERMISSION_TYPE_TO_RESOURCE_TYPE[permission_type] = resource_type
+
+    return resolver_instance
+
+
 def get_resolver_for_resource_type(resource_type):
     """
     Return resolver instance for the provided resource type.
 
     :rtype: Instance of :class:`PermissionsResolver`
     """
-    if resource_type == ResourceType.RUNNER:
-        resolver_cls = RunnerPermissionsResolver
-    elif resource_type == ResourceType.PACK:
-        resolver_cls = PackPermissionsResolver
-    elif resource_type == ResourceType.SENSOR:
-        resolver_cls = SensorPermissionsResolver
-    elif resource_type == ResourceType.ACTION:
-        resolver_cls = ActionPermissionsResolver
-    elif resource_type == ResourceType.ACTION_ALIAS:
-        resolver_cls = ActionAliasPermissionsResolver
-    elif resource_type == ResourceType.RULE:
-        resolver_cls = RulePermissionsResolver
-    elif resource_type == ResourceType.EXECUTION:
-        resolver_cls = ExecutionPermissionsResolver
-    elif resource_type == ResourceType.KEY_VALUE_PAIR:
-        resolver_cls = KeyValuePermissionsResolver
-    elif resource_type == ResourceType.WEBHOOK:
-        resolver_cls = WebhookPermissionsResolver
-    elif resource_type == ResourceType.TIMER:
-        resolver_cls = TimerPermissionsResolver
-    elif resource_type == ResourceType.API_KEY:
-        resolver_cls = ApiKeyPermissionResolver
-    elif resource_type == ResourceType.RULE_ENFORCEMENT:
-        resolver_cls = RuleEnforcementPermissionsResolver
-    elif resource_type == ResourceType.TRACE:
-        resolver_cls = TracePermissionsResolver
-    elif resource_type == ResourceType.TRIGGER:
-        resolver_cls = TriggerPermissionsResolver
-    elif resource_type == ResourceType.POLICY_TYPE:
-        resolver_cls = PolicyTypePermissionsResolver
-    elif resource_type == ResourceType.POLICY:
-        resolver_cls = PolicyPermissionsResolver
-    elif resource_type == ResourceType.STREAM:
-        resolver_cls = StreamPermissionsResolver
-    elif resource_type == ResourceType.INQUIRY:
-        resolver_cls = InquiryPermissionsResolver
-    else:
+    resolver_instance = _RESOLVERS_BY_RESOURCE_TYPE.get(resource_type, None)
+
+    if not resolver_instance:
         raise ValueError('Unsupported resource: %s' % (resource_type))
 
-    resolver_instance = resolver_cls()
     return resolver_instance
 
 
@@ -1215,6 +1461,41 @@ def get_resolver_for_permission_type(permission_type):
 
     :rtype: Instance of :class:`PermissionsResolver`
     """
-    resource_type = PermissionType.get_resource_type(permission_type=permission_type)
+    resource_type = _PERMISSION_TYPE_TO_RESOURCE_TYPE.get(permission_type, None)
+
+    if not resource_type:
+        resource_type = PermissionType.get_resource_type(permission_type=permission_type)
+        _PERMISSION_TYPE_TO_RESOURCE_TYPE[permission_type] = resource_type
+
     resolver_instance = get_resolver_for_resource_type(resource_type=resource_type)
     return resolver_instance
+
+
+# Resource type -> resolver instance
+_RESOLVERS_BY_RESOURCE_TYPE = {}
+
+# Permission type -> resource type. Pre-computed for all the built-in permission types so a
+# lookup doesn't need to parse the permission type
+_PERMISSION_TYPE_TO_RESOURCE_TYPE = dict([
+    (permission_type, PermissionType.get_resource_type(permission_type=permission_type))
+    for permission_type in PermissionType.get_valid_values()
+])
+
+register_resolver(ResourceType.RUNNER, RunnerPermissionsResolver)
+register_resolver(ResourceType.PACK, PackPermissionsResolver)
+register_resolver(ResourceType.SENSOR, SensorPermissionsResolver)
+register_resolver(ResourceType.ACTION, ActionPermissionsResolver)
+register_resolver(ResourceType.ACTION_ALIAS, ActionAliasPermissionsResolver)
+register_resolver(ResourceType.RULE, RulePermissionsResolver)
+register_resolver(ResourceType.EXECUTION, ExecutionPermissionsResolver)
+register_resolver(ResourceType.KEY_VALUE_PAIR, KeyValuePermissionsResolver)
+register_resolver(ResourceType.WEBHOOK, WebhookPermissionsResolver)
+register_resolver(ResourceType.TIMER, TimerPermissionsResolver)
+register_resolver(ResourceType.API_KEY, ApiKeyPermissionResolver)
+register_resolver(ResourceType.RULE_ENFORCEMENT, RuleEnforcementPermissionsResolver)
+register_resolver(ResourceType.TRACE, TracePermissionsResolver)
+register_resolver(ResourceType.TRIGGER, TriggerPermissionsResolver)
+register_resolver(ResourceType.POLICY_TYPE, PolicyTypePermissionsResolver)
+register_resolver(ResourceType.POLICY, PolicyPermissionsResolver)
+register_resolver(ResourceType.STREAM, StreamPermissionsResolver)
+register_resolver(ResourceType.INQUIRY, InquiryPermissionsResolver)
@@ -19,8 +19,14 @@ Module containing utility RBAC service related functions.
 
 from __future__ import absolute_import
 
+import time
+import functools
+from itertools import chain
+
+from bson.objectid import ObjectId
 from mongoengine.queryset.visitor import Q
 from mongoengine import NotUniqueError
+from oslo_config import cfg
 
 from st2common.rbac.types import PermissionType
 from st2common.rbac.types import ResourceType
@@ -35,12 +41,48 @@ from st2common.models.db.rbac import PermissionGrantDB
 from st2common.models.db.rbac import GroupToRoleMappingDB
 from st2common.exceptions.db import StackStormDBObjectConflictError
 from st2common.rbac.backends.base import BaseRBACService
-
+from st2common import log as logging
+
+from st2rbac_backend import config as rbac_config
+from st2rbac_backend.cache import LRUCache
+from st2rbac_backend.cache import get_request_scope
+from st2rbac_backend.digest import delete_role_digests
+from st2rbac_backend.effective import get_effective_user
+from st2rbac_backend.effective import get_usernames_for_roles
+from st2rbac_backend.effective import materialize_effective_permissions
+from st2rbac_backend.fingerprint import delete_remote_sync_fingerprints
+from st2rbac_backend.generation import GROUP_TO_ROLE_MAPS_GENERATION_NAME
+from st2rbac_backend.generation import get_generation
+from st2rbac_backend.generation import bump_generation
+from st2rbac_backend.index import UserPermissionIndex
+from st2rbac_backend.index import DatabasePermissionIndex
+from st2rbac_backend.index import EffectivePermissionIndex
+from st2rbac_backend.mappings import invalidate_group_to_role_maps_table
+
+
+LOG = logging.getLogger(__name__)
 
 __all__ = [
     'RBACService'
 ]
 
+rbac_config.register_opts()
+
+# Names of the process wide caches. Names are also used as the first element of the cache keys
+ROLES_FOR_USER_CACHE = 'roles_for_user'
+PERMISSION_GRANTS_FOR_ROLE_CACHE = 'permission_grants_for_role'
+PERMISSION_INDEX_CACHE = 'permission_index'
+PERMISSION_DECISION_CACHE = 'permission_decision'
+
+# Process wide caches which are shared across requests, keyed by the cache name
+_PROCESS_CACHES = {}
+
+# RBAC data generation process wide caches are valid for and the time it was last checked
+_GENERATION_STATE = {
+    'generation': None,
+    'checked_at': 0
+}
+
 
 class RBACService(BaseRBACService):
     @staticmethod
@@ -83,17 +125,13 @@ class RBACService(BaseRBACService):
 
         :rtype: ``list`` of :class:`RoleDB`
         """
-        if include_remote:
-            queryset = UserRoleAssignment.query(user=user_db.name)
-        else:
-            # when upgrading from pre v2.3.0 when this field didn't exist yet
-            # Note: We also include None for pre v2.3 when this field didn't exist yet
-            queryset_filter = (Q(user=user_db.name) &
-                               (Q(is_remote=False) | Q(is_remote__exists=False)))
-            queryset = UserRoleAssignmentDB.objects(queryset_filter)
+        if not _is_caching_active(ROLES_FOR_USER_CACHE):
+            result = _query_roles_for_user(user_db=user_db, include_remote=include_remote)
+            return result
 
-        role_names = queryset.only('role').scalar('role')
-        result = Role.query(name__in=role_names)
+        key = (ROLES_FOR_USER_CACHE, user_db.name, include_remote)
+        result = _get_or_set_cached_value(ROLES_FOR_USER_CACHE, key, lambda: list(
+            _query_roles_for_user(user_db=user_db, include_remote=include_remote)))
         return result
 
     @staticmethod
@@ -160,8 +198,76 @@ class RBACService(BaseRBACService):
 
         role_db = RoleDB(name=name, description=description)
         role_db = Role.add_or_update(role_db)
+        _invalidate_caches()
+        _invalidate_group_to_role_maps()
+        _update_effective_permissions(role_names=[name])
+
         return role_db
 
+    @staticmethod
+    def create_roles_with_permission_grants(roles):
+        """
+        Create multiple roles and their permission grants using a single bulk insert for all the
+        permission grants and a single bulk insert for all the roles (each role is written once,
+        with its full permission grant list).
+
+        :param roles: List of (name, description, permission_grants) tuples where
+                      permission_grants is a list of (resource_uid, resource_type,
+                      permission_types) tuples.
+        :type roles: ``list`` of ``tuple``
+
+        :return: Created roles (in the same order as the provided roles).
+        :rtype: ``list`` of :class:`RoleDB`
+        """
+        system_role_names = SystemRole.get_valid_values()
+        role_dbs = []
+        role_permission_grant_dbs = []
+
+        for name, description, permission_grants in roles:
+            if name in system_role_names:
+                raise ValueError('"%s" role name is blacklisted' % (name))
+
+            role_db = RoleDB(name=name, description=description)
+            role_db.validate()
+            role_dbs.append(role_db)
+
+            permission_grant_dbs = []
+            for resource_uid, resource_type, permission_types in permission_grants:
+                permission_grant_db = PermissionGrantDB(resource_uid=resource_uid,
+                                                        resource_type=resource_type,
+                                                        permission_types=permission_types)
+                permission_grant_db.validate()
+                permission_grant_dbs.append(permission_grant_db)
+
+            role_permission_grant_dbs.append(permission_grant_dbs)
+
+        if not role_dbs:
+            return []
+
+        all_permission_grant_dbs = list(chain.from_iterable(role_permission_grant_dbs))
+        _bulk_insert(PermissionGrantDB, all_permission_grant_dbs)
+
+        for role_db, permission_grant_dbs in zip(role_dbs, role_permission_grant_dbs):
+            # Note: Ids are generated upfront so roles which have been inserted before a failure
+            # can be removed
+            role_db.id = ObjectId()
+            role_db.permission_grants = [str(permission_grant_db.id)
+                                         for permission_grant_db in permission_grant_dbs]
+
+        try:
+            _bulk_insert(RoleDB, role_dbs)
+        except Exception:
+            # Don't leave orphaned permission grants and partially inserted roles behind
+            Role.query(id__in=[role_db.id for role_db in role_dbs]).delete()
+            PermissionGrant.query(id__in=[permission_grant_db.id for permission_grant_db
+                                          in all_permission_grant_dbs]).delete()
+            raise
+        _invalidate_caches()
+        _invalidate_group_to_role_maps()
+        _update_effective_permissions(role_names=[role_db.name for role_db in role_dbs])
+
+        return role_dbs
+
     @staticmethod
     def delete_role(name):
         """"
@@ -172,6 +278,10 @@ class RBACService(BaseRBACService):
 
         role_db = Role.get(name=name)
         result = Role.delete(role_db)
+        _invalidate_caches()
+        _invalidate_group_to_role_maps()
+        _update_effective_permissions(role_names=[name])
+
         return result
 
     @staticmethod
@@ -213,6 +323,11 @@ class RBACService(BaseRBACService):
                                                           source=source,
                                                           description=description).first()
 
+        if is_remote:
+            delete_remote_sync_fingerprints([user_db.name])
+
+        _invalidate_caches(username=user_db.name)
+        _update_effective_permissions(usernames=[user_db.name])
         return role_assignment_db
 
     @staticmethod
@@ -231,6 +346,10 @@ class RBACService(BaseRBACService):
         for role_assignment_db in role_assignment_dbs:
             UserRoleAssignment.delete(role_assignment_db)
 
+        delete_remote_sync_fingerprints([user_db.name])
+        _invalidate_caches(username=user_db.name)
+        _update_effective_permissions(usernames=[user_db.name])
+
     @staticmethod
     def get_all_permission_grants_for_user(user_db, resource_uid=None, resource_types=None,
                                            permission_types=None):
@@ -244,11 +363,20 @@ class RBACService(BaseRBACService):
         The result is a union of all the permission grants assigned to the roles which are assigned
         to the user.
 
+        If rbac.permission_grants_aggregation config option is enabled, the whole assignments ->
+        roles -> permission grants chain is resolved using a single aggregation query.
+
         :rtype: ``list`` or :class:`PermissionGrantDB`
         """
+        if cfg.CONF.rbac.permission_grants_aggregation:
+            return _aggregate_permission_grants_for_user(user_db=user_db,
+                                                         resource_uid=resource_uid,
+                                                         resource_types=resource_types,
+                                                         permission_types=permission_types)
+
         role_names = UserRoleAssignment.query(user=user_db.name).only('role').scalar('role')
         permission_grant_ids = Role.query(name__in=role_names).scalar('permission_grants')
-        permission_grant_ids = sum(permission_grant_ids, [])
+        permission_grant_ids = list(chain.from_iterable(permission_grant_ids))
 
         permission_grants_filters = {}
         permission_grants_filters['id__in'] = permission_grant_ids
@@ -265,6 +393,138 @@ class RBACService(BaseRBACService):
         permission_grant_dbs = PermissionGrant.query(**permission_grants_filters)
         return permission_grant_dbs
 
+    @staticmethod
+    def user_has_any_permission_grant(user_db, resource_uid=None, resource_types=None,
+                                      permission_types=None):
+        """
+        Return True if the user has at least one permission grant which matches the provided
+        filters.
+
+        The filters have the same semantics as the ones accepted by
+        "get_all_permission_grants_for_user", but the database is only asked whether a matching
+        grant exists (limit 1, projection on id) and no grant documents are retrieved.
+
+        :rtype: ``bool``
+        """
+        if cfg.CONF.rbac.permission_grants_aggregation:
+            permission_grants = _aggregate_permission_grants_for_user(
+                user_db=user_db, resource_uid=resource_uid, resource_types=resource_types,
+                permission_types=permission_types, exists_only=True)
+            return bool(permission_grants)
+
+        role_dbs = RBACService.get_roles_for_user(user_db=user_db)
+        permission_index = DatabasePermissionIndex(username=user_db.name, role_dbs=role_dbs)
+        permission_grant_id = permission_index.find_permission_grant(
+            permission_types=permission_types, resource_uid=resource_uid,
+            resource_types=resource_types)
+        return bool(permission_grant_id)
+
+    @staticmethod
+    def get_permission_index_for_user(user_db):
+        """
+        Retrieve an index of all the roles and permission grants for a particular user.
+
+        When caching is active (inside a request scope or when the process wide cache is enabled
+        using rbac.cache_size), a compiled in-memory index is returned. The index is built with at
+        most three queries (role assignments, roles and permission grants) and can then answer any
+        number of permission checks for that user without touching the database. It is built only
+        once per request scope and re-used across requests until it expires or the RBAC data is
+        changed.
+
+        Otherwise the index couldn't be re-used so a database backed index which answers each
+        lookup with an existence query is returned instead. If rbac.effective_permissions is
+        enabled and the user effective permissions have been materialized, each lookup is a
+        single indexed query against the materialized effective permissions.
+
+        :rtype: :class:`BasePermissionIndex`
+        """
+        if not _is_caching_active(PERMISSION_INDEX_CACHE):
+            if cfg.CONF.rbac.effective_permissions:
+                effective_user_db = get_effective_user(username=user_db.name)
+
+                if effective_user_db:
+                    return EffectivePermissionIndex(username=user_db.name,
+                                                    role_names=effective_user_db.roles)
+
+            role_dbs = RBACService.get_roles_for_user(user_db=user_db)
+            result = DatabasePermissionIndex(username=user_db.name, role_dbs=role_dbs)
+            return result
+
+        key = (PERMISSION_INDEX_CACHE, user_db.name)
+        result = _get_or_set_cached_value(PERMISSION_INDEX_CACHE, key,
+                                          lambda: _build_permission_index_for_user(user_db=user_db))
+        return result
+
+    @staticmethod
+    def get_permission_decision_cache():
+        """
+        Retrieve process wide cache of permission check outcomes.
+
+        Cache is keyed by (username, permission type, resource uid, pack) and stores both, the
+        granted and the denied outcomes. It's purged on any RBAC data change.
+
+        :return: Cache or None if the decision cache is disabled (rbac.decision_cache_size).
+        :rtype: :class:`LRUCache`
+        """
+        return _get_process_cache(PERMISSION_DECISION_CACHE)
+
+    @staticmethod
+    def invalidate_caches(username=None):
+        """
+        Invalidate cached RBAC data.
+
+        This needs to be called by any code which manipulates RBAC data in the database directly
+        instead of going through this service. It also bumps the RBAC data generation so other
+        processes invalidate their caches as well.
+
+        :param username: Optional name of the user to only invalidate the cached roles and
+                         permission indexes for. If not provided, all the cached data is
+                         invalidated.
+        :type username: ``str``
+        """
+        _invalidate_caches(username=username)
+
+    @staticmethod
+    def invalidate_group_to_role_maps():
+        """
+        Bump the group to role mappings generation.
+
+        This needs to be called by any code which manipulates group to role mappings or roles in
+        the database directly instead of going through this service.
+        """
+        _invalidate_group_to_role_maps()
+
+    @staticmethod
+    def update_effective_permissions(usernames=None, role_names=None):
+        """
+        Re-build materialized effective permissions for the provided users and for all the users
+        which have any of the provided roles assigned (if rbac.effective_permissions is enabled).
+
+        This needs to be called by any code which manipulates role assignments, roles or
+        permission grants in the database directly instead of going through this service.
+
+        :param usernames: Names of the users whose role assignments have changed.
+        :type usernames: ``list`` of ``str``
+
+        :param role_names: Names of the roles which have been changed, created or removed.
+        :type role_names: ``list`` of ``str``
+        """
+        _update_effective_permissions(usernames=usernames, role_names=role_names)
+
+    @staticmethod
+    def get_cache_stats():
+        """
+        Return statistics for all the process wide RBAC caches.
+
+        :rtype: ``dict``
+        """
+        result = {}
+
+        for name, cache in _PROCESS_CACHES.items():
+            result[name] = cache.get_stats()
+
+        return result
+
     @staticmethod
     def create_permission_grant_for_resource_db(role_db, resource_db, permission_types):
         """
@@ -304,6 +564,11 @@ class RBACService(BaseRBACService):
         # Add assignment to the role
         role_db.update(push__permission_grants=str(permission_grant_db.id))
 
+        # Role no longer matches its definition digest
+        delete_role_digests([role_db.name])
+        _invalidate_caches()
+        _update_effective_permissions(role_names=[role_db.name])
+
         return permission_grant_db
 
     @staticmethod
@@ -328,6 +593,11 @@ class RBACService(BaseRBACService):
         # Remove assignment from a role
         role_db.update(pull__permission_grants=str(permission_grant_db.id))
 
+        # Role no longer matches its definition digest
+        delete_role_digests([role_db.name])
+        _invalidate_caches()
+        _update_effective_permissions(role_names=[role_db.name])
+
         return permission_grant_db
 
     @staticmethod
@@ -344,6 +614,7 @@ class RBACService(BaseRBACService):
                                                     enabled=enabled)
 
         group_to_role_map_db = GroupToRoleMapping.add_or_update(group_to_role_map_db)
+        _invalidate_group_to_role_maps()
 
         return group_to_role_map_db
 
@@ -365,6 +636,350 @@ class RBACService(BaseRBACService):
                 raise ValueError('Role "%s" doesn\'t exist in the database' % (role_name))
 
 
+def _query_roles_for_user(user_db, include_remote=True):
+    """
+    Query the database for all the roles assigned to the provided user.
+
+    :rtype: ``QuerySet`` of :class:`RoleDB`
+    """
+    if include_remote:
+        queryset = UserRoleAssignment.query(user=user_db.name)
+    else:
+        # when upgrading from pre v2.3.0 when this field didn't exist yet
+        # Note: We also include None for pre v2.3 when this field didn't exist yet
+        queryset_filter = (Q(user=user_db.name) &
+                           (Q(is_remote=False) | Q(is_remote__exists=False)))
+        queryset = UserRoleAssignmentDB.objects(queryset_filter)
+
+    role_names = queryset.only('role').scalar('role')
+    result = Role.query(name__in=role_names)
+    return result
+
+
+def _build_permission_index_for_user(user_db):
+    """
+    Build permission index for the provided user.
+
+    Note: Roles are retrieved using get_roles_for_user so the role lookup is shared with other
+    role checks performed in the same request scope.
+
+    :rtype: :class:`UserPermissionIndex`
+    """
+    role_dbs = RBACService.get_roles_for_user(user_db=user_db)
+
+    role_names = [role_db.name for role_db in role_dbs]
+    permission_grants = _get_permission_grants_for_roles(role_dbs=role_dbs)
+
+    result = UserPermissionIndex(username=user_db.name, role_names=role_names,
+                                 permission_grants=permission_grants)
+    return result
+
+
+def _aggregate_permission_grants_for_user(user_db, resource_uid=None, resource_types=None,
+                                          permission_types=None, exists_only=False):
+    """
+    Retrieve permission grants for the provided user using a single aggregation query which joins
+    role assignments, roles and permission grants.
+
+    :param exists_only: True to only return the id of the first matching grant. This is used for
+                        existence checks.
+    :type exists_only: ``bool``
+
+    :rtype: ``list`` of :class:`PermissionGrantDB`
+    """
+    pipeline = _get_permission_grants_for_user_pipeline(user_db=user_db,
+                                                        resource_uid=resource_uid,
+                                                        resource_types=resource_types,
+                                                        permission_types=permission_types,
+                                                        exists_only=exists_only)
+    collection = UserRoleAssignmentDB._get_collection()
+
+    if exists_only:
+        return [document['_id'] for document in collection.aggregate(pipeline)]
+
+    result = [PermissionGrantDB._from_son(document) for document in collection.aggregate(pipeline)]
+    return result
+
+
+def _get_permission_grants_for_user_pipeline(user_db, resource_uid=None, resource_types=None,
+                                             permission_types=None, exists_only=False):
+    """
+    Return aggregation pipeline used by "_aggregate_permission_grants_for_user".
+
+    The permission grant filters are applied inside the permission grants $lookup sub-pipeline so
+    only the matching grants are joined (and for existence checks, only the first one).
+
+    Note: Role documents store permission grant ids as strings so they need to be converted to
+    ObjectIds before they can be joined with the permission grant documents.
+
+    :rtype: ``list`` of ``dict``
+    """
+    permission_grants_filters = {
+        '$expr': {'$in': ['$_id', '$$permission_grant_ids']}
+    }
+
+    if resource_uid:
+        permission_grants_filters['resource_uid'] = resource_uid
+
+    if resource_types:
+        permission_grants_filters['resource_type'] = {'$in': list(resource_types)}
+
+    if permission_types:
+        permission_grants_filters['permission_types'] = {'$in': list(permission_types)}
+
+    permission_grants_pipeline = [{'$match': permission_grants_filters}]
+
+    if exists_only:
+        permission_grants_pipeline.append({'$limit': 1})
+        permission_grants_pipeline.append({'$project': {'_id': 1}})
+
+    pipeline = [
+        {'$match': {'user': user_db.name}},
+        {'$lookup': {
+            'from': RoleDB._get_collection_name(),
+            'localField': 'role',
+            'foreignField': 'name',
+            'as': 'role_db'
+        }},
+        {'$unwind': '$role_db'},
+        {'$unwind': '$role_db.permission_grants'},
+        {'$group': {
+            '_id': None,
+            'permission_grant_ids': {'$addToSet': {'$toObjectId': '$role_db.permission_grants'}}
+        }},
+        {'$lookup': {
+            'from': PermissionGrantDB._get_collection_name(),
+            'let': {'permission_grant_ids': '$permission_grant_ids'},
+            'pipeline': permission_grants_pipeline,
+            'as': 'permission_grant_db'
+        }},
+        {'$unwind': '$permission_grant_db'},
+        {'$replaceRoot': {'newRoot': '$permission_grant_db'}}
+    ]
+
+    return pipeline
+
+
+def _get_permission_grants_for_roles(role_dbs):
+    """
+    Retrieve permission grants for the provided roles.
+
+    Grants for roles which are in the process wide cache are served from the cache and grants for
+    all the remaining roles are retrieved using a single query.
+
+    :return: Permission grants as (id, resource_uid, resource_type, permission_types) tuples.
+    :rtype: ``list`` of ``tuple``
+    """
+    cache = _get_process_cache(PERMISSION_GRANTS_FOR_ROLE_CACHE)
+
+    result = {}
+    missing_role_dbs = []
+
+    for role_db in role_dbs:
+        permission_grants = None
+
+        if cache is not None:
+            permission_grants = cache.get((PERMISSION_GRANTS_FOR_ROLE_CACHE, role_db.name))
+
+        if permission_grants is None:
+            missing_role_dbs.append(role_db)
+            continue
+
+        for permission_grant in permission_grants:
+            result[permission_grant[0]] = permission_grant
+
+    permission_grant_ids = list(set(chain.from_iterable(role_db.permission_grants or []
+                                                        for role_db in missing_role_dbs)))
+
+    if not permission_grant_ids:
+        return list(result.values())
+
+    permission_grants = PermissionGrant.query(id__in=permission_grant_ids).scalar(
+        'id', 'resource_uid', 'resource_type', 'permission_types')
+    permission_grants = dict([(str(permission_grant[0]), permission_grant)
+                              for permission_grant in permission_grants])
+
+    for role_db in missing_role_dbs:
+        role_permission_grants = [permission_grants[permission_grant_id] for permission_grant_id
+                                  in role_db.permission_grants or []
+                                  if permission_grant_id in permission_grants]
+
+        if cache is not None:
+            cache.set((PERMISSION_GRANTS_FOR_ROLE_CACHE, role_db.name), role_permission_grants)
+
+        for permission_grant in role_permission_grants:
+            result[permission_grant[0]] = permission_grant
+
+    return list(result.values())
+
+
+def _bulk_insert(model, model_dbs):
+    """
+    Insert the provided documents using a single insert_many call and assign the generated ids
+    to them.
+    """
+    if not model_dbs:
+        return []
+
+    ids = model.objects.insert(model_dbs, load_bulk=False)
+
+    for model_db, model_id in zip(model_dbs, ids):
+        model_db.id = model_id
+
+    return ids
+
+
+def _get_process_cache(name):
+    """
+    Return process wide cache with the provided name or None if caching is disabled.
+
+    Caches are (re-)created lazily so config changes are picked up without a restart.
+
+    :rtype: :class:`LRUCache`
+    """
+    if name == PERMISSION_DECISION_CACHE:
+        max_size = cfg.CONF.rbac.decision_cache_size
+    else:
+        max_size = cfg.CONF.rbac.cache_size
+
+    if not max_size or max_size <= 0:
+        return None
+
+    _check_generation()
+
+    ttl = cfg.CONF.rbac.cache_ttl
+    cache = _PROCESS_CACHES.get(name, None)
+
+    if cache is None or cache.max_size != max_size or cache.ttl != ttl:
+        cache = LRUCache(max_size=max_size, ttl=ttl)
+        _PROCESS_CACHES[name] = cache
+
+    return cache
+
+
+def _check_generation():
+    """
+    Clear process wide caches if RBAC data has been changed by another process since the caches
+    were populated.
+
+    To keep the overhead low, the generation is only read from the database once every
+    rbac.cache_generation_check_interval seconds.
+    """
+    interval = cfg.CONF.rbac.cache_generation_check_interval
+    now = time.time()
+
+    if interval and (now - _GENERATION_STATE['checked_at']) < interval:
+        return
+
+    _GENERATION_STATE['checked_at'] = now
+    generation = get_generation()
+
+    if generation == _GENERATION_STATE['generation']:
+        return
+
+    LOG.debug('RBAC data generation changed (%s -> %s), clearing caches' %
+              (_GENERATION_STATE['generation'], generation))
+
+    for cache in _PROCESS_CACHES.values():
+        cache.clear()
+
+    _GENERATION_STATE['generation'] = generation
+
+
+def _is_caching_active(cache_name):
+    return get_request_scope() is not None or _get_process_cache(cache_name) is not None
+
+
+def _get_or_set_cached_value(cache_name, key, func):
+    """
+    Return value for the provided key from the request scope or the process wide cache, calling
+    func() to retrieve it on a miss.
+    """
+    cache = _get_process_cache(cache_name)
+
+    if cache is not None:
+        get_value = functools.partial(cache.get_or_set, key, func)
+    else:
+        get_value = func
+
+    scope = get_request_scope()
+
+    if scope is not None:
+        return scope.get_or_set(key, get_value)
+
+    return get_value()
+
+
+def _invalidate_caches(username=None):
+    """
+    Invalidate cached RBAC data after the RBAC data in the database has been manipulated.
+
+    :param username: Optional name of the user to only invalidate the cached data for (used when
+                     only the role assignments for a particular user have changed).
+    :type username: ``str``
+    """
+    # Let other processes know the data has changed. Local caches stay valid for the new
+    # generation only if no other process has bumped it in the mean time, otherwise we leave the
+    # old generation so the next check clears all the local caches.
+    previous_generation = _GENERATION_STATE['generation']
+    generation = bump_generation()
+
+    if previous_generation is not None and generation == previous_generation + 1:
+        _GENERATION_STATE['generation'] = generation
+
+    scope = get_request_scope()
+
+    if scope is not None:
+        scope.clear()
+
+    if username is None:
+        for cache in _PROCESS_CACHES.values():
+            cache.clear()
+        return
+
+    roles_cache = _PROCESS_CACHES.get(ROLES_FOR_USER_CACHE, None)
+    if roles_cache is not None:
+        roles_cache.delete((ROLES_FOR_USER_CACHE, username, True))
+        roles_cache.delete((ROLES_FOR_USER_CACHE, username, False))
+
+    index_cache = _PROCESS_CACHES.get(PERMISSION_INDEX_CACHE, None)
+    if index_cache is not None:
+        index_cache.delete((PERMISSION_INDEX_CACHE, username))
+
+    # Decisions can't be purged selectively since they also depend on the resources so we purge
+    # all of them
+    decision_cache = _PROCESS_CACHES.get(PERMISSION_DECISION_CACHE, None)
+    if decision_cache is not None:
+        decision_cache.clear()
+
+
+def _invalidate_group_to_role_maps():
+    """
+    Let the remote group sync know the group to role mappings (or roles they reference) have
+    changed.
+    """
+    bump_generation(name=GROUP_TO_ROLE_MAPS_GENERATION_NAME)
+    invalidate_group_to_role_maps_table()
+
+
+def _update_effective_permissions(usernames=None, role_names=None):
+    """
+    Re-build materialized effective permissions for the affected users.
+    """
+    if not cfg.CONF.rbac.effective_permissions:
+        return
+
+    usernames = set(usernames or [])
+    usernames.update(get_usernames_for_roles(role_names=role_names))
+
+    if not usernames:
+        return
+
+    count = materialize_effective_permissions(usernames=usernames)
+    LOG.debug('Materialized %s effective permission grants for %s users' %
+              (count, len(usernames)))
+
+
 def _validate_resource_type(resource_db):
     """
     Validate that the permissions can be manipulated for the provided resource type.
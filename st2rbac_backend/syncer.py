@@ -19,21 +19,13 @@ Module for syncing RBAC definitions in the database with the ones from the files
 
 from __future__ import absolute_import
 
-import six
-
-from itertools import chain
-
-if six.PY3:
-    from itertools import zip_longest as izip_longest  # pylint: disable=no-name-in-module
-else:
-    from itertools import izip_longest    # pylint: disable=no-name-in-module
-
 from collections import defaultdict
 
 from mongoengine.queryset.visitor import Q
+from oslo_config import cfg
+from pymongo.errors import BulkWriteError
 
 from st2common import log as logging
-from st2common.models.db.auth import UserDB
 from st2common.models.db.rbac import UserRoleAssignmentDB
 from st2common.persistence.auth import User
 from st2common.persistence.rbac import Role
@@ -43,6 +35,15 @@ from st2common.persistence.rbac import GroupToRoleMapping
 from st2common.rbac.backends.base import BaseRBACRemoteGroupToRoleSyncer
 from st2common.util.uid import parse_uid
 
+from st2rbac_backend.digest import get_role_definition_digest
+from st2rbac_backend.digest import get_role_digests
+from st2rbac_backend.digest import set_role_digests
+from st2rbac_backend.digest import delete_role_digests
+from st2rbac_backend.effective import get_unmaterialized_usernames
+from st2rbac_backend.fingerprint import get_remote_sync_fingerprint
+from st2rbac_backend.fingerprint import get_user_remote_sync_fingerprint
+from st2rbac_backend.fingerprint import set_user_remote_sync_fingerprint
+from st2rbac_backend.mappings import get_group_to_role_maps
 from st2rbac_backend.service import RBACService as rbac_service
 
 
@@ -53,6 +54,12 @@ __all__ = [
     'RBACRemoteGroupToRoleSyncer'
 ]
 
+# Maximum number of documents written by a single bulk operation
+BULK_WRITE_BATCH_SIZE = 1000
+
+# MongoDB duplicate key error code
+DUPLICATE_KEY_ERROR_CODE = 11000
+
 
 class RBACDefinitionsDBSyncer(object):
     """
@@ -60,7 +67,8 @@ class RBACDefinitionsDBSyncer(object):
     match ones specified in the role definition files.
 
     The class works by simply deleting all the obsolete roles (either removed or updated) and
-    creating new roles (either new roles or one which have been updated).
+    creating new roles (either new roles or one which have been updated). Roles whose definition
+    digest hasn't changed since the last sync are left alone.
 
     Note #1: Our current datastore doesn't support transactions or similar which means that with
     the current data model there is a short time frame during sync when the definitions inside the
@@ -83,6 +91,14 @@ class RBACDefinitionsDBSyncer(object):
             group_to_role_map_apis
         )
 
+        # Make sure no stale roles and permission grants are served from the caches
+        rbac_service.invalidate_caches()
+
+        # Effective permissions are maintained incrementally, but users which had their roles
+        # assigned before the materialization has been enabled still need to be materialized
+        if cfg.CONF.rbac.effective_permissions:
+            rbac_service.update_effective_permissions(usernames=get_unmaterialized_usernames())
+
         return result
 
     def sync_roles(self, role_definition_apis):
@@ -111,14 +127,34 @@ class RBACDefinitionsDBSyncer(object):
         # A list of new roles which should be added to the database
         new_role_names = role_api_names.difference(role_db_names)
 
+        # A list of roles whose definition hasn't changed since the last sync. Digest is only
+        # valid for the role document it has been stored for
+        role_api_digests = {}
+        for role_definition_api in role_definition_apis:
+            permission_grants = getattr(role_definition_api, 'permission_grants', [])
+            role_api_digests[role_definition_api.name] = get_role_definition_digest(
+                description=role_definition_api.description, permission_grants=permission_grants)
+
+        role_db_digests = get_role_digests()
+        unchanged_role_names = set([])
+
+        for role_db in role_dbs:
+            if role_db.name not in role_api_names:
+                continue
+
+            role_db_digest = role_db_digests.get(role_db.name, None)
+            if role_db_digest == (str(role_db.id), role_api_digests[role_db.name]):
+                unchanged_role_names.add(role_db.name)
+
         # A list of roles which need to be updated in the database
-        updated_role_names = role_db_names.intersection(role_api_names)
+        updated_role_names = role_db_names.intersection(role_api_names) - unchanged_role_names
 
         # A list of roles which should be removed from the database
         removed_role_names = (role_db_names - role_api_names)
 
         LOG.debug('New roles: %r' % (new_role_names))
         LOG.debug('Updated roles: %r' % (updated_role_names))
+        LOG.debug('Unchanged roles: %r' % (unchanged_role_names))
         LOG.debug('Removed roles: %r' % (removed_role_names))
 
         # Build a list of roles to delete
@@ -140,18 +176,29 @@ class RBACDefinitionsDBSyncer(object):
         for role_db in role_dbs_to_delete:
             role_ids_to_delete.append(role_db.id)
 
-        LOG.debug('Deleting %s stale roles' % (len(role_ids_to_delete)))
-        Role.query(id__in=role_ids_to_delete, system=False).delete()
-        LOG.debug('Deleted %s stale roles' % (len(role_ids_to_delete)))
+        # Number of database writes issued by this sync
+        writes_count = 0
+
+        if role_ids_to_delete:
+            LOG.debug('Deleting %s stale roles' % (len(role_ids_to_delete)))
+            Role.query(id__in=role_ids_to_delete, system=False).delete()
+            writes_count += 1
+            LOG.debug('Deleted %s stale roles' % (len(role_ids_to_delete)))
 
         # Remove associated permission grants
         permission_grant_ids_to_delete = []
         for role_db in role_dbs_to_delete:
             permission_grant_ids_to_delete.extend(role_db.permission_grants)
 
-        LOG.debug('Deleting %s stale permission grants' % (len(permission_grant_ids_to_delete)))
-        PermissionGrant.query(id__in=permission_grant_ids_to_delete).delete()
-        LOG.debug('Deleted %s stale permission grants' % (len(permission_grant_ids_to_delete)))
+        if permission_grant_ids_to_delete:
+            LOG.debug('Deleting %s stale permission grants' %
+                      (len(permission_grant_ids_to_delete)))
+            PermissionGrant.query(id__in=permission_grant_ids_to_delete).delete()
+            writes_count += 1
+            LOG.debug('Deleted %s stale permission grants' %
+                      (len(permission_grant_ids_to_delete)))
+
+        deletes_count = writes_count
 
         ########
         # 2. Add new / updated roles to the DB
@@ -159,15 +206,16 @@ class RBACDefinitionsDBSyncer(object):
 
         LOG.debug('Creating %s new roles' % (len(role_apis_to_create)))
 
-        # Create new roles
-        created_role_dbs = []
+        # Create new roles and associated permission grants. All the permission grants are
+        # inserted using a single bulk insert and each role is written once with its full
+        # permission grant list
+        roles = []
+        permission_grants_count = 0
+
         for role_api in role_apis_to_create:
-            role_db = rbac_service.create_role(name=role_api.name,
-                                               description=role_api.description)
+            permission_grants = []
 
-            # Create associated permission grants
-            permission_grants = getattr(role_api, 'permission_grants', [])
-            for permission_grant in permission_grants:
+            for permission_grant in getattr(role_api, 'permission_grants', []):
                 resource_uid = permission_grant.get('resource_uid', None)
 
                 if resource_uid:
@@ -176,29 +224,66 @@ class RBACDefinitionsDBSyncer(object):
                     resource_type = None
 
                 permission_types = permission_grant['permission_types']
-                assignment_db = rbac_service.create_permission_grant(
-                    role_db=role_db,
-                    resource_uid=resource_uid,
-                    resource_type=resource_type,
-                    permission_types=permission_types)
+                permission_grants.append((resource_uid, resource_type, permission_types))
+
+            permission_grants_count += len(permission_grants)
+            roles.append((role_api.name, role_api.description, permission_grants))
+
+        created_role_dbs = rbac_service.create_roles_with_permission_grants(roles=roles)
+
+        # Permission grants and roles are each written using a single insert_many call
+        if permission_grants_count:
+            writes_count += 1
 
-                role_db.permission_grants.append(str(assignment_db.id))
-            created_role_dbs.append(role_db)
+        if created_role_dbs:
+            writes_count += 1
 
-        LOG.debug('Created %s new roles' % (len(created_role_dbs)))
-        LOG.info('Roles synchronized (%s created, %s updated, %s removed)' %
-                 (len(new_role_names), len(updated_role_names), len(removed_role_names)))
+        # Creating roles one by one takes one write per role plus two writes per permission
+        # grant (grant insert and role update)
+        per_grant_writes_count = (deletes_count + len(created_role_dbs) +
+                                  2 * permission_grants_count)
+        round_trips_saved = per_grant_writes_count - writes_count
+
+        # Store definition digests so the roles are left alone on the next sync if their
+        # definition doesn't change
+        set_role_digests([(role_db.name, role_db.id, role_api_digests[role_db.name])
+                          for role_db in created_role_dbs])
+        delete_role_digests(removed_role_names)
+
+        LOG.debug('Created %s new roles with %s permission grants' % (len(created_role_dbs),
+                                                                      permission_grants_count))
+        LOG.info('Roles synchronized (%s created, %s updated, %s unchanged, %s removed, %s '
+                 'database writes issued vs %s with per-grant writes, %s round trips saved)' %
+                 (len(new_role_names), len(updated_role_names), len(unchanged_role_names),
+                  len(removed_role_names), writes_count, per_grant_writes_count,
+                  round_trips_saved))
+
+        rbac_service.invalidate_caches()
+
+        if role_dbs_to_delete:
+            # Remote group sync needs to know roles referenced by the mappings might be gone
+            rbac_service.invalidate_group_to_role_maps()
+
+        # Note: Effective permissions for the users with new and updated roles are updated when
+        # the roles are created
+        rbac_service.update_effective_permissions(role_names=removed_role_names)
 
         return [created_role_dbs, role_dbs_to_delete]
 
-    def sync_users_role_assignments(self, role_assignment_apis):
+    def sync_users_role_assignments(self, role_assignment_apis, usernames=None):
         """
         Synchronize role assignments for all the users in the database.
 
+        Assignments for all the users are diffed in memory and all the changes are then written
+        using chunked bulk deletes and inserts.
+
         :param role_assignment_apis: Role assignments API objects for the assignments loaded
                                       from the files.
         :type role_assignment_apis: ``list`` of :class:`UserRoleAssignmentFileFormatAPI`
 
+        :param usernames: If provided, only assignments for those users are synchronized.
+        :type usernames: ``list`` of ``str``
+
         :return: Dictionary with created and removed role assignments for each user.
         :rtype: ``dict``
         """
@@ -208,11 +293,21 @@ class RBACDefinitionsDBSyncer(object):
 
         # Note: We exclude remote assignments because sync tool is not supposed to manipulate
         # remote assignments
-        role_assignment_dbs = rbac_service.get_all_role_assignments(include_remote=False)
-
-        user_dbs = User.get_all()
+        if usernames is None:
+            role_assignment_dbs = rbac_service.get_all_role_assignments(include_remote=False)
+            usernames = User.query().only('name').scalar('name')
+        else:
+            usernames = set(usernames)
+            queryset_filter = (Q(user__in=list(usernames)) &
+                               (Q(is_remote=False) | Q(is_remote__exists=False)))
+            role_assignment_dbs = UserRoleAssignmentDB.objects(queryset_filter)
+            role_assignment_apis = [role_assignment_api for role_assignment_api
+                                    in role_assignment_apis
+                                    if role_assignment_api.username in usernames]
+
+        # Names of all the roles are retrieved once so role existence can be checked in memory
+        role_names = set(Role.query().only('name').scalar('name'))
 
-        username_to_user_db_map = dict([(user_db.name, user_db) for user_db in user_dbs])
         username_to_role_assignment_apis_map = defaultdict(list)
         username_to_role_assignment_dbs_map = defaultdict(list)
 
@@ -228,38 +323,57 @@ class RBACDefinitionsDBSyncer(object):
         # and ones which are in the database). We want to make sure assignments are correctly
         # deleted from the database for users which existing in the database, but have no
         # assignment file on disk and for assignments for users which don't exist in the database.
-        all_usernames = (list(username_to_user_db_map.keys()) +
+        # Note: We allow assignments to be created for the users which don't exist in the DB yet
+        # because user creation in StackStorm is lazy (we only create UserDB) object when user
+        # first logs in.
+        all_usernames = (list(usernames) +
                          list(username_to_role_assignment_apis_map.keys()) +
                          list(username_to_role_assignment_dbs_map.keys()))
-        all_usernames = list(set(all_usernames))
+        all_usernames = sorted(set(all_usernames))
 
         results = {}
-        for username in all_usernames:
-            user_db = username_to_user_db_map.get(username, None)
-
-            if not user_db:
-                # Note: We allow assignments to be created for the users which don't exist in the
-                # DB yet because user creation in StackStorm is lazy (we only create UserDB) object
-                # when user first logs in.
-                user_db = UserDB(name=username)
-                LOG.debug(('User "%s" doesn\'t exist in the DB, creating assignment anyway' %
-                          (username)))
+        role_assignment_dbs_to_create = []
+        role_assignment_dbs_to_delete = []
 
-            role_assignment_apis = username_to_role_assignment_apis_map.get(username, [])
-            role_assignment_dbs = username_to_role_assignment_dbs_map.get(username, [])
+        for username in all_usernames:
+            user_role_assignment_apis = username_to_role_assignment_apis_map.get(username, [])
+            user_role_assignment_dbs = username_to_role_assignment_dbs_map.get(username, [])
 
             # Additional safety assert to ensure we don't accidentally manipulate remote
             # assignments
-            for role_assignment_db in role_assignment_dbs:
+            for role_assignment_db in user_role_assignment_dbs:
                 assert role_assignment_db.is_remote is False
 
-            result = self._sync_user_role_assignments(
-                user_db=user_db, role_assignment_dbs=role_assignment_dbs,
-                role_assignment_apis=role_assignment_apis)
+            result = self._get_user_role_assignments_diff(
+                username=username, role_assignment_dbs=user_role_assignment_dbs,
+                role_assignment_apis=user_role_assignment_apis, role_names=role_names)
 
+            role_assignment_dbs_to_create.extend(result[0])
+            role_assignment_dbs_to_delete.extend(result[1])
             results[username] = result
 
-        LOG.info('User role assignments synchronized')
+        # Note: Assignments are deleted first since updated assignments are re-created
+        role_assignment_ids_to_delete = [role_assignment_db.id for role_assignment_db
+                                         in role_assignment_dbs_to_delete]
+
+        for chunk in _chunks(role_assignment_ids_to_delete, BULK_WRITE_BATCH_SIZE):
+            queryset_filter = (Q(id__in=chunk) &
+                               (Q(is_remote=False) | Q(is_remote__exists=False)))
+            UserRoleAssignmentDB.objects(queryset_filter).delete()
+
+        for chunk in _chunks(role_assignment_dbs_to_create, BULK_WRITE_BATCH_SIZE):
+            ids = UserRoleAssignmentDB.objects.insert(chunk, load_bulk=False)
+
+            for role_assignment_db, role_assignment_id in zip(chunk, ids):
+                role_assignment_db.id = role_assignment_id
+
+        rbac_service.invalidate_caches()
+        rbac_service.update_effective_permissions(
+            usernames=[username for username, result in results.items()
+                       if result[0] or result[1]])
+
+        LOG.info('User role assignments synchronized (%s created, %s removed)' %
+                 (len(role_assignment_dbs_to_create), len(role_assignment_dbs_to_delete)))
         return results
 
     def sync_group_to_role_maps(self, group_to_role_map_apis):
@@ -284,14 +398,17 @@ class RBACDefinitionsDBSyncer(object):
                                                   enabled=group_to_role_map_api.enabled,
                                                   source=source)
 
+        rbac_service.invalidate_group_to_role_maps()
+
         LOG.info('Group to role map definitions synchronized.')
 
-    def _sync_user_role_assignments(self, user_db, role_assignment_dbs, role_assignment_apis):
+    def _get_user_role_assignments_diff(self, username, role_assignment_dbs, role_assignment_apis,
+                                        role_names):
         """
-        Synchronize role assignments for a particular user.
+        Compute role assignments which need to be created and deleted for a particular user.
 
-        :param user_db: User to synchronize the assignments for.
-        :type user_db: :class:`UserDB`
+        :param username: Name of the user to synchronize the assignments for.
+        :type username: ``str``
 
         :param role_assignment_dbs: Existing user role assignments.
         :type role_assignment_dbs: ``list`` of :class:`UserRoleAssignmentDB`
@@ -299,80 +416,68 @@ class RBACDefinitionsDBSyncer(object):
         :param role_assignment_apis: List of user role assignments to apply.
         :param role_assignment_apis: ``list`` of :class:`UserRoleAssignmentFileFormatAPI`
 
+        :param role_names: Names of all the roles which exist in the database.
+        :type role_names: ``set`` of ``str``
+
+        :return: (role_assignment_dbs_to_create, role_assignment_dbs_to_delete) tuple.
         :rtype: ``tuple``
         """
-        db_roles = set([(entry.role, entry.source) for entry in role_assignment_dbs])
+        db_roles = dict([((entry.role, entry.source), entry) for entry in role_assignment_dbs])
 
-        api_roles = [
-            list(izip_longest(entry.roles, [], fillvalue=entry.file_path))
-            for entry in role_assignment_apis
-        ]
+        api_roles = {}
+        for entry in role_assignment_apis:
+            description = getattr(entry, 'description', None)
 
-        api_roles = set(list(chain.from_iterable(api_roles)))
+            for role_name in entry.roles:
+                api_roles.setdefault((role_name, entry.file_path), description)
 
         # A list of new assignments which should be added to the database
-        new_roles = api_roles.difference(db_roles)
+        new_roles = set(api_roles.keys()).difference(db_roles.keys())
 
-        # A list of assignments which need to be updated in the database
-        updated_roles = db_roles.intersection(api_roles)
+        # A list of assignments which need to be updated in the database (only the description
+        # can change)
+        updated_roles = set([key for key in set(db_roles.keys()).intersection(api_roles.keys())
+                             if db_roles[key].description != api_roles[key]])
 
         # A list of assignments which should be removed from the database
-        removed_roles = (db_roles - api_roles)
+        removed_roles = set(db_roles.keys()).difference(api_roles.keys())
 
-        LOG.debug('New assignments for user "%s": %r' % (user_db.name, new_roles))
-        LOG.debug('Updated assignments for user "%s": %r' % (user_db.name, updated_roles))
-        LOG.debug('Removed assignments for user "%s": %r' % (user_db.name, removed_roles))
+        LOG.debug('New assignments for user "%s": %r' % (username, new_roles))
+        LOG.debug('Updated assignments for user "%s": %r' % (username, updated_roles))
+        LOG.debug('Removed assignments for user "%s": %r' % (username, removed_roles))
 
         # Build a list of role assignments to delete
         roles_to_delete = updated_roles.union(removed_roles)
-
         role_assignment_dbs_to_delete = [
             role_assignment_db for role_assignment_db in role_assignment_dbs
             if (role_assignment_db.role, role_assignment_db.source) in roles_to_delete
         ]
 
-        for role_name, assignment_source in roles_to_delete:
-            queryset_filter = (
-                Q(user=user_db.name) &
-                Q(role=role_name) &
-                Q(source=assignment_source) &
-                (Q(is_remote=False) | Q(is_remote__exists=False))
-            )
-
-            UserRoleAssignmentDB.objects(queryset_filter).delete()
-
-            LOG.debug('Removed role "%s" from "%s" for user "%s".' % (role_name, assignment_source,
-                                                                      user_db.name))
-
         # Build a list of roles assignments to create
         roles_to_create = new_roles.union(updated_roles)
-        created_role_assignment_dbs = []
+        role_assignment_dbs_to_create = []
 
-        for role_name, assignment_source in roles_to_create:
-            role_db = Role.get(name=role_name)
-            if not role_db:
+        for role_name, assignment_source in sorted(roles_to_create):
+            if role_name not in role_names:
                 msg = 'Role "%s" referenced in assignment file "%s" doesn\'t exist'
                 raise ValueError(msg % (role_name, assignment_source))
 
-            role_assignment_api = [r for r in role_assignment_apis if
-                                   r.file_path == assignment_source][0]
-            description = getattr(role_assignment_api, 'description', None)
+            description = api_roles[(role_name, assignment_source)]
+            role_assignment_db = UserRoleAssignmentDB(user=username, role=role_name,
+                                                      source=assignment_source,
+                                                      description=description, is_remote=False)
+            role_assignment_db.validate()
+            role_assignment_dbs_to_create.append(role_assignment_db)
 
-            assignment_db = rbac_service.assign_role_to_user(
-                role_db=role_db, user_db=user_db, source=assignment_source, description=description)
-
-            created_role_assignment_dbs.append(assignment_db)
-
-            LOG.debug('Assigned role "%s" from "%s" for user "%s".' %
-                (role_name, assignment_source, user_db.name))
-
-        return (created_role_assignment_dbs, role_assignment_dbs_to_delete)
+        return (role_assignment_dbs_to_create, role_assignment_dbs_to_delete)
 
 
 class RBACRemoteGroupToRoleSyncer(BaseRBACRemoteGroupToRoleSyncer):
     """
     Class which writes remote user role assignments based on the user group membership information
     provided by the auth backend and based on the group to role mapping definitions on disk.
+
+    Only the difference between the existing and the expected remote assignments is written.
     """
 
     def sync(self, user_db, groups):
@@ -392,79 +497,145 @@ class RBACRemoteGroupToRoleSyncer(BaseRBACRemoteGroupToRoleSyncer):
         LOG.info('Synchronizing remote role assignments for user "%s"' % (str(user_db)),
                  extra=extra)
 
-        # 1. Retrieve group to role mappings for the provided groups
-        all_mapping_dbs = GroupToRoleMapping.query(group__in=groups)
-        enabled_mapping_dbs = [mapping_db for mapping_db in all_mapping_dbs if
-                               mapping_db.enabled]
-        disabled_mapping_dbs = [mapping_db for mapping_db in all_mapping_dbs if
-                                not mapping_db.enabled]
+        # 1. Skip the sync if groups and mappings haven't changed since the last sync. Note:
+        # Fingerprint needs to be computed before the mappings are retrieved
+        fingerprint = None
 
-        if not all_mapping_dbs:
+        if cfg.CONF.rbac.remote_group_sync_fingerprint:
+            fingerprint = get_remote_sync_fingerprint(groups=groups)
+
+            if get_user_remote_sync_fingerprint(username=user_db.name) == fingerprint:
+                LOG.debug('Groups and group to role mappings for user "%s" haven\'t changed since '
+                          'the last sync, skipping sync' % (str(user_db)), extra=extra)
+                return ([], [])
+
+        # 2. Retrieve compiled group to role mappings for the provided groups
+        group_to_role_maps = get_group_to_role_maps(groups=groups)
+
+        if not group_to_role_maps:
             LOG.debug('No group to role mappings found for user "%s"' % (str(user_db)), extra=extra)
 
-        # 2. Remove all the existing remote role assignments
+        # 3. Compute assignments which should exist for the current groups. Note: Assignments
+        # for disabled mappings are not included which means they are removed
+        assignments = []
+        assignment_descriptions = {}
+
+        for group_to_role_map in group_to_role_maps:
+            if not group_to_role_map.enabled:
+                continue
+
+            for role_name in group_to_role_map.missing_roles:
+                # Gracefully skip assignment for role which doesn't exist in the db
+                LOG.info('Role with name "%s" for mapping "%s" not found, skipping assignment.'
+                         % (role_name, group_to_role_map.group), extra=extra)
+
+            description = ('Automatic role assignment based on the remote user membership in '
+                           'group "%s"' % (group_to_role_map.group))
+
+            for role_name in group_to_role_map.roles:
+                key = (role_name, group_to_role_map.source)
+
+                if key in assignment_descriptions:
+                    continue
+
+                assignments.append(key)
+                assignment_descriptions[key] = description
+
+        # 4. Diff them with the existing remote assignments
         remote_assignment_dbs = UserRoleAssignment.query(user=user_db.name, is_remote=True)
 
-        existing_role_names = [assignment_db.role for assignment_db in remote_assignment_dbs]
-        existing_role_names = set(existing_role_names)
-        current_role_names = set([])
+        existing_assignments = set([])
+        role_assignment_dbs_to_delete = []
 
-        for mapping_db in all_mapping_dbs:
-            for role in mapping_db.roles:
-                current_role_names.add(role)
+        for role_assignment_db in remote_assignment_dbs:
+            key = (role_assignment_db.role, role_assignment_db.source)
 
-        # A list of new role assignments which should be added to the database
-        new_role_names = current_role_names.difference(existing_role_names)
+            if (key not in assignment_descriptions or key in existing_assignments or
+                    assignment_descriptions[key] != role_assignment_db.description):
+                role_assignment_dbs_to_delete.append(role_assignment_db)
+                continue
 
-        # A list of role assignments which need to be updated in the database
-        updated_role_names = existing_role_names.intersection(current_role_names)
+            existing_assignments.add(key)
 
-        # A list of role assignments which should be removed from the database
-        removed_role_names = (existing_role_names - new_role_names)
+        role_assignment_dbs_to_create = []
 
-        # Also remove any assignments for mappings which are disabled in the database
-        for mapping_db in disabled_mapping_dbs:
-            for role in mapping_db.roles:
-                removed_role_names.add(role)
+        for role_name, source in assignments:
+            if (role_name, source) in existing_assignments:
+                continue
 
-        LOG.debug('New role assignments: %r' % (new_role_names))
-        LOG.debug('Updated role assignments: %r' % (updated_role_names))
-        LOG.debug('Removed role assignments: %r' % (removed_role_names))
+            role_assignment_db = UserRoleAssignmentDB(
+                user=user_db.name, role=role_name, source=source,
+                description=assignment_descriptions[(role_name, source)], is_remote=True)
+            role_assignment_db.validate()
+            role_assignment_dbs_to_create.append(role_assignment_db)
 
-        # Build a list of role assignments to delete
-        role_names_to_delete = updated_role_names.union(removed_role_names)
-        role_assignment_dbs_to_delete = [role_assignment_db for role_assignment_db
-                                         in remote_assignment_dbs
-                                         if role_assignment_db.role in role_names_to_delete]
+        LOG.debug('New role assignments: %r' % ([(role_assignment_db.role,
+                                                  role_assignment_db.source) for
+                                                 role_assignment_db in
+                                                 role_assignment_dbs_to_create]))
+        LOG.debug('Removed role assignments: %r' % ([(role_assignment_db.role,
+                                                      role_assignment_db.source) for
+                                                     role_assignment_db in
+                                                     role_assignment_dbs_to_delete]))
 
-        UserRoleAssignment.query(user=user_db.name, role__in=role_names_to_delete,
-                                 is_remote=True).delete()
+        # 5. Write only the delta
+        if role_assignment_dbs_to_delete:
+            role_assignment_ids_to_delete = [role_assignment_db.id for role_assignment_db
+                                             in role_assignment_dbs_to_delete]
+            UserRoleAssignment.query(id__in=role_assignment_ids_to_delete,
+                                     is_remote=True).delete()
 
-        # 3. Create role assignments for all the current groups
-        created_assignments_dbs = []
-        for mapping_db in enabled_mapping_dbs:
-            extra['mapping_db'] = mapping_db
+        if role_assignment_dbs_to_create:
+            _insert_remote_role_assignments(role_assignment_dbs_to_create)
 
-            for role_name in mapping_db.roles:
-                role_db = rbac_service.get_role_by_name(name=role_name)
+        LOG.debug('Created %s and removed %s remote role assignments for user "%s"' %
+                  (len(role_assignment_dbs_to_create), len(role_assignment_dbs_to_delete),
+                   str(user_db)), extra=extra)
 
-                if not role_db:
-                    # Gracefully skip assignment for role which doesn't exist in the db
-                    LOG.info('Role with name "%s" for mapping "%s" not found, skipping assignment.'
-                             % (role_name, str(mapping_db)), extra=extra)
-                    continue
+        if role_assignment_dbs_to_create or role_assignment_dbs_to_delete:
+            rbac_service.invalidate_caches(username=user_db.name)
+            rbac_service.update_effective_permissions(usernames=[user_db.name])
+
+        if fingerprint:
+            set_user_remote_sync_fingerprint(username=user_db.name, fingerprint=fingerprint)
+
+        return (role_assignment_dbs_to_create, role_assignment_dbs_to_delete)
 
-                description = ('Automatic role assignment based on the remote user membership in '
-                               'group "%s"' % (mapping_db.group))
-                assignment_db = rbac_service.assign_role_to_user(role_db=role_db, user_db=user_db,
-                                                                 description=description,
-                                                                 is_remote=True,
-                                                                 source=mapping_db.source,
-                                                                 ignore_already_exists_error=True)
-                assert assignment_db.is_remote is True
-                created_assignments_dbs.append(assignment_db)
 
-        LOG.debug('Created %s new remote role assignments for user "%s"' %
-                  (len(created_assignments_dbs), str(user_db)), extra=extra)
+def _insert_remote_role_assignments(role_assignment_dbs):
+    """
+    Insert the provided remote role assignments using a single bulk insert.
 
-        return (created_assignments_dbs, role_assignment_dbs_to_delete)
+    Assignments which have been created by a concurrent sync in the mean time are ignored and
+    replaced with the existing ones.
+    """
+    collection = UserRoleAssignmentDB._get_collection()
+    docs = [role_assignment_db.to_mongo().to_dict() for role_assignment_db in role_assignment_dbs]
+    duplicate_indexes = set([])
+
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get('writeErrors', []):
+            if error.get('code', None) != DUPLICATE_KEY_ERROR_CODE:
+                raise e
+
+            duplicate_indexes.add(error['index'])
+
+    for index, (role_assignment_db, doc) in enumerate(zip(role_assignment_dbs, docs)):
+        if index in duplicate_indexes:
+            existing_db = UserRoleAssignment.query(user=role_assignment_db.user,
+                                                   role=role_assignment_db.role,
+                                                   source=role_assignment_db.source).first()
+            role_assignment_db.id = existing_db.id if existing_db else None
+        else:
+            # Note: insert_many() sets "_id" on the inserted documents
+            role_assignment_db.id = doc['_id']
+
+
+def _chunks(values, size):
+    """
+    Split the provided list into chunks of the provided size.
+    """
+    for index in range(0, len(values), size):
+        yield values[index:index + size]
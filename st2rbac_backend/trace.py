@@ -0,0 +1,338 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module for tracing RBAC permission check decisions.
+
+When tracing is enabled (either for all the decisions or for a sampled fraction of them), each
+permission check records the evaluation steps, the matched grant and the outcome and emits them as
+a single structured record once the decision is made.
+
+Resolvers only start a trace when ACTIVE is True which means that the cost of tracing when it's
+disabled is a single boolean test per trace point:
+
+    trace = None
+    if decision_trace.ACTIVE:
+        trace = decision_trace.start_trace(self, {'user_db': user_db, ...})
+    ...
+    if trace:
+        trace.finish(True, 'Found a direct grant')
+
+When decision auditing is enabled (see st2rbac_backend.audit), every decision is traced and a
+compact audit record is passed to the audit sink, but only the sampled traces are logged.
+
+Checks which delegate to another resolver (e.g. rule trigger check delegating to the webhook
+resolver) are part of a single decision. Traces started while another trace is active on the same
+thread only add their steps to the active (outermost) trace and only the outermost trace is
+emitted.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import json
+import time
+import random
+import threading
+
+import six
+from oslo_config import cfg
+
+from st2common import log as logging
+
+__all__ = [
+    'DecisionTrace',
+
+    'configure',
+    'set_audit_sink',
+    'start_trace',
+    'add_listener',
+    'remove_listener'
+]
+
+LOG = logging.getLogger(__name__)
+
+# True if tracing is enabled for all or for a sampled fraction of decisions or if decisions are
+# being audited
+ACTIVE = False
+
+_STATE = {
+    'enabled': False,
+    'sample_rate': 0.0,
+    'audit_sink': None
+}
+
+# Functions which are called with every finished trace record
+_LISTENERS = []
+
+# Outermost trace which is active on the current thread. Note: When eventlet monkey patching is
+# used, this storage is local to each green thread (aka request)
+_THREAD_LOCAL = threading.local()
+
+
+class DecisionTrace(object):
+    """
+    Trace of a single permission check decision.
+    """
+
+    def __init__(self, resolver, method, context, sampled=True, parent=None):
+        self.resolver = resolver
+        self.method = method
+        self.context = context
+        self.sampled = sampled
+        self.steps = []
+        self.matched = None
+        self.outcome = None
+
+        # Outermost trace this (nested) trace belongs to
+        self.parent = parent
+
+        self._start_time = time.time()
+        self._end_time = None
+
+        # Frame of the function which started the (outermost) trace. Used to detect traces which
+        # have never been finished because the check raised
+        self._frame = None
+
+    def step(self, message):
+        """
+        Record an evaluation step.
+        """
+        if self.parent:
+            self.parent.step('%s.%s: %s' % (self.resolver, self.method, message))
+            return
+
+        self.steps.append(message)
+
+    def finish(self, outcome, message, matched=None):
+        """
+        Record the final decision and emit the trace record.
+
+        :param outcome: True if the permission has been granted.
+        :type outcome: ``bool``
+
+        :param message: Message describing the decision.
+        :type message: ``str``
+
+        :param matched: Optional id of the matched permission grant.
+        :type matched: ``str``
+        """
+        self.step(message)
+        self.outcome = outcome
+        self._end_time = time.time()
+
+        if matched is not None:
+            self.matched = matched
+
+        if self.parent:
+            # Nested trace, grant matched by the delegated check is the grant of the decision
+            if matched is not None:
+                self.parent.matched = matched
+            return
+
+        self._frame = None
+        if getattr(_THREAD_LOCAL, 'trace', None) is self:
+            _THREAD_LOCAL.trace = None
+
+        _emit(self)
+
+    def to_dict(self):
+        """
+        :rtype: ``dict``
+        """
+        context = dict([(key, _serialize_value(value))
+                        for key, value in six.iteritems(self.context)])
+
+        result = {
+            'resolver': self.resolver,
+            'method': self.method,
+            'context': context,
+            'steps': self.steps,
+            'matched': _serialize_value(self.matched),
+            'outcome': self.outcome,
+            'duration_ms': self._get_duration_ms()
+        }
+        return result
+
+    def to_audit_record(self):
+        """
+        Return compact record used for auditing decisions.
+
+        :rtype: ``dict``
+        """
+        context = self.context
+        user_db = context.get('user_db', None)
+        resource = (context.get('resource_uid', None) or context.get('resource_db', None) or
+                    context.get('resource_api', None))
+
+        result = {
+            'timestamp': self._end_time,
+            'user': getattr(user_db, 'name', None),
+            'permission_type': context.get('permission_type', None),
+            'resource_uid': _serialize_value(resource),
+            'outcome': self.outcome,
+            'matched': _serialize_value(self.matched),
+            'latency_ms': self._get_duration_ms()
+        }
+        return result
+
+    def _get_duration_ms(self):
+        if self._end_time is None:
+            return None
+
+        return round((self._end_time - self._start_time) * 1000, 3)
+
+    def __repr__(self):
+        return ('<DecisionTrace resolver=%s,method=%s,outcome=%s>' %
+                (self.resolver, self.method, self.outcome))
+
+
+def configure(enabled=None, sample_rate=None):
+    """
+    Configure decision tracing. Values which are not provided are read from the config
+    (rbac.decision_trace and rbac.decision_trace_sample_rate).
+    """
+    if enabled is None:
+        enabled = cfg.CONF.rbac.decision_trace
+
+    if sample_rate is None:
+        sample_rate = cfg.CONF.rbac.decision_trace_sample_rate
+
+    _STATE['enabled'] = bool(enabled)
+    _STATE['sample_rate'] = max(0.0, min(1.0, float(sample_rate or 0.0)))
+
+    _update_active()
+
+
+def set_audit_sink(sink):
+    """
+    Set sink every decision is recorded to (regardless of the trace sampling) or None to disable
+    auditing.
+
+    :param sink: Object with "enqueue(record)" method.
+    :type sink: :class:`st2rbac_backend.audit.DecisionAuditSink`
+    """
+    _STATE['audit_sink'] = sink
+    _update_active()
+
+
+def start_trace(resolver, context):
+    """
+    Start a new decision trace.
+
+    Note: This function should only be called when ACTIVE is True.
+
+    :param resolver: Resolver instance which is performing the check.
+
+    :param context: Decision context (user, permission type, resource, etc.).
+    :type context: ``dict``
+
+    :return: Trace or None if the decision hasn't been sampled.
+    :rtype: :class:`DecisionTrace`
+    """
+    frame = sys._getframe(1)
+    active_trace = _get_active_trace(frame=frame)
+
+    if active_trace:
+        return DecisionTrace(resolver=resolver.__class__.__name__, method=frame.f_code.co_name,
+                             context=context, sampled=active_trace.sampled, parent=active_trace)
+
+    sampled = _STATE['enabled'] or random.random() < _STATE['sample_rate']
+
+    if not sampled and _STATE['audit_sink'] is None:
+        return None
+
+    trace = DecisionTrace(resolver=resolver.__class__.__name__, method=frame.f_code.co_name,
+                          context=context, sampled=sampled)
+    trace._frame = frame
+    _THREAD_LOCAL.trace = trace
+
+    return trace
+
+
+def add_listener(func):
+    """
+    Register a function which is called with the record (dict) of each finished trace.
+    """
+    _LISTENERS.append(func)
+
+
+def remove_listener(func):
+    if func in _LISTENERS:
+        _LISTENERS.remove(func)
+
+
+def _get_active_trace(frame):
+    """
+    Return outermost trace which is active on the current thread or None if there is no active
+    trace.
+
+    :param frame: Frame of the function which is starting a new trace.
+    """
+    trace = getattr(_THREAD_LOCAL, 'trace', None)
+
+    if not trace:
+        return None
+
+    # Trace is only active if the function which started it is still running (it's one of the
+    # callers), otherwise the check raised before the trace has been finished
+    caller_frame = frame.f_back
+    while caller_frame is not None:
+        if caller_frame is trace._frame:
+            return trace
+
+        caller_frame = caller_frame.f_back
+
+    trace._frame = None
+    _THREAD_LOCAL.trace = None
+    return None
+
+
+def _update_active():
+    global ACTIVE
+
+    ACTIVE = (_STATE['enabled'] or _STATE['sample_rate'] > 0 or
+              _STATE['audit_sink'] is not None)
+
+
+def _emit(trace):
+    audit_sink = _STATE['audit_sink']
+
+    if audit_sink is not None:
+        audit_sink.enqueue(trace.to_audit_record())
+
+    if not trace.sampled:
+        return
+
+    record = trace.to_dict()
+
+    LOG.info('RBAC decision: %s' % (json.dumps(record, sort_keys=True)),
+             extra={'rbac_decision': record})
+
+    for func in _LISTENERS:
+        func(record)
+
+
+def _serialize_value(value):
+    if value is None or isinstance(value, (six.string_types, bool, int, float)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return [_serialize_value(item) for item in value]
+    elif hasattr(value, 'get_uid'):
+        return value.get_uid()
+    elif hasattr(value, 'name'):
+        return value.name
+
+    return str(value)
@@ -32,6 +32,8 @@ from st2common.util import action_db as action_utils
 from st2common.rbac.backends import get_rbac_backend
 from st2common.rbac.backends.base import BaseRBACUtils
 
+from st2rbac_backend.cache import request_scope
+from st2rbac_backend.cache import get_request_scope_stats
 from st2rbac_backend.service import RBACService as rbac_service
 
 __all__ = [
@@ -179,6 +181,28 @@ class RBACUtils(BaseRBACUtils):
                 msg = '"user" attribute can only be provided by admins'
                 raise AccessDeniedError(message=msg, user_db=user_db)
 
+    # Request scope memoization
+    @staticmethod
+    def request_scope():
+        """
+        Return a context manager which memoizes user role and permission grant lookups for the
+        code running inside it.
+
+        It's meant to be entered once at the beginning of the request and exited at the end of
+        it so all the permission checks performed during a request share the same lookups.
+        """
+        return request_scope()
+
+    @staticmethod
+    def get_request_scope_stats():
+        """
+        Return process wide request scope memoization counters (number of scopes, hits and
+        misses).
+
+        :rtype: ``dict``
+        """
+        return get_request_scope_stats()
+
     # Regular methods
     @staticmethod
     def user_is_admin(user_db):
@@ -282,6 +306,63 @@ class RBACUtils(BaseRBACUtils):
                                                           permission_type=permission_type)
         return result
 
+    @staticmethod
+    def user_has_resource_db_permissions(user_db, resource_dbs, permission_type):
+        """
+        Check that the provided user has specified permission on each of the provided resources.
+
+        User roles and permission grants are only loaded once for all the resources.
+
+        :return: List of booleans with the same length and order as resource_dbs.
+        :rtype: ``list`` of ``bool``
+        """
+        resource_dbs = list(resource_dbs)
+
+        if not cfg.CONF.rbac.enable:
+            return [True] * len(resource_dbs)
+
+        rbac_backend = get_rbac_backend()
+
+        resolver = rbac_backend.get_resolver_for_permission_type(permission_type=permission_type)
+        result = resolver.user_has_resource_db_permissions(user_db=user_db,
+                                                           resource_dbs=resource_dbs,
+                                                           permission_type=permission_type)
+        return result
+
+    @staticmethod
+    def filter_resource_dbs_by_permission(user_db, resource_dbs, permission_type):
+        """
+        Return a subset of the provided resources on which the user has the specified permission.
+
+        :rtype: ``list``
+        """
+        resource_dbs = list(resource_dbs)
+        has_permissions = RBACUtils.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=resource_dbs, permission_type=permission_type)
+
+        result = [resource_db for resource_db, has_permission in zip(resource_dbs, has_permissions)
+                  if has_permission]
+        return result
+
+    @staticmethod
+    def get_resource_db_query_filter(user_db, permission_type):
+        """
+        Return MongoDB filter expression which only matches resources on which the provided user
+        has the specified permission.
+
+        :return: MongoDB filter or None if no filtering is needed.
+        :rtype: ``dict`` or ``None``
+        """
+        if not cfg.CONF.rbac.enable:
+            return None
+
+        rbac_backend = get_rbac_backend()
+
+        resolver = rbac_backend.get_resolver_for_permission_type(permission_type=permission_type)
+        result = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                       permission_type=permission_type)
+        return result
+
     @staticmethod
     def user_has_rule_trigger_permission(user_db, trigger):
         """
@@ -0,0 +1,225 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Module containing watchers which detect changes to the RBAC definition files.
+
+inotify based watcher is used if pyinotify library is available, otherwise the directories are
+periodically polled for changes.
+
+Directories which don't exist yet (e.g. "assignments/" or "mappings/" on a fresh install) are
+watched as well - changes are detected as soon as they are created.
+"""
+
+from __future__ import absolute_import
+
+import os
+import glob
+import time
+
+from st2common import log as logging
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+__all__ = [
+    'InotifyWatcher',
+    'PollingWatcher',
+
+    'get_watcher',
+    'wait_for_changes'
+]
+
+LOG = logging.getLogger(__name__)
+
+DEFINITION_FILE_EXTENSION = '.yaml'
+
+if pyinotify:
+    WATCH_MASK = (pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                  pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO)
+
+
+class PollingWatcher(object):
+    """
+    Watcher which periodically compares modification time and size of the definition files.
+    """
+
+    def __init__(self, paths, poll_interval=1.0):
+        """
+        :param paths: Paths to the directories to watch (they don't need to exist yet).
+        :type paths: ``list`` of ``str``
+
+        :param poll_interval: How often (in seconds) to check the directories for changes.
+        :type poll_interval: ``float``
+        """
+        self._paths = paths
+        self._poll_interval = poll_interval
+        self._snapshot = self._get_snapshot()
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds for a change.
+
+        :return: True if a change has been detected.
+        :rtype: ``bool``
+        """
+        deadline = time.time() + timeout
+
+        while True:
+            snapshot = self._get_snapshot()
+
+            if snapshot != self._snapshot:
+                self._snapshot = snapshot
+                return True
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0:
+                return False
+
+            time.sleep(min(self._poll_interval, remaining))
+
+    def close(self):
+        pass
+
+    def _get_snapshot(self):
+        result = {}
+
+        for path in self._paths:
+            for file_path in glob.glob(os.path.join(path, '*' + DEFINITION_FILE_EXTENSION)):
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    # File has been removed in the mean time
+                    continue
+
+                result[file_path] = (stat.st_mtime, stat.st_size)
+
+        return result
+
+
+class InotifyWatcher(object):
+    """
+    Watcher which relies on inotify events.
+    """
+
+    def __init__(self, paths):
+        """
+        :param paths: Paths to the directories to watch (they don't need to exist yet).
+        :type paths: ``list`` of ``str``
+        """
+        self._paths = set([os.path.abspath(path) for path in paths])
+
+        self._changed = False
+        self._watch_manager = pyinotify.WatchManager()
+        self._notifier = pyinotify.Notifier(self._watch_manager,
+                                            default_proc_fun=self._process_event)
+
+        self._add_watches()
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds for a change.
+
+        :return: True if a change has been detected.
+        :rtype: ``bool``
+        """
+        if self._notifier.check_events(timeout=int(timeout * 1000)):
+            self._notifier.read_events()
+            self._notifier.process_events()
+
+        changed = self._changed
+        self._changed = False
+        return changed
+
+    def close(self):
+        self._notifier.stop()
+
+    def _add_watches(self):
+        """
+        Add watches for the definition directories. For directories which don't exist yet, the
+        closest existing parent directory is watched so we get notified when they are created.
+
+        :return: True if a watch for any of the definition directories has been added.
+        :rtype: ``bool``
+        """
+        added = False
+
+        for path in sorted(self._paths):
+            watch_path = path
+            while not os.path.isdir(watch_path) and os.path.dirname(watch_path) != watch_path:
+                watch_path = os.path.dirname(watch_path)
+
+            if self._watch_manager.get_wd(watch_path) is not None:
+                continue
+
+            self._watch_manager.add_watch(watch_path, WATCH_MASK)
+
+            if watch_path == path:
+                added = True
+
+        return added
+
+    def _process_event(self, event):
+        if event.dir:
+            # Definition directory (or one of its parents) might have been created
+            if event.mask & (pyinotify.IN_CREATE | pyinotify.IN_MOVED_TO) and self._add_watches():
+                self._changed = True
+            return
+
+        if os.path.abspath(event.path) not in self._paths:
+            # Event in a parent directory of a definition directory which doesn't exist yet
+            return
+
+        # Ignore temporary and swap files created by the editors
+        if event.pathname.endswith(DEFINITION_FILE_EXTENSION):
+            self._changed = True
+
+
+def get_watcher(paths, poll_interval=1.0):
+    """
+    Return watcher for the provided directories.
+
+    inotify based watcher is returned if pyinotify library is available, polling watcher
+    otherwise.
+    """
+    if pyinotify and paths:
+        try:
+            watcher = InotifyWatcher(paths=paths)
+        except Exception as e:
+            LOG.warning('Failed to set up inotify watcher, falling back to polling: %s' % (str(e)))
+        else:
+            LOG.debug('Using inotify watcher for: %s' % (', '.join(paths)))
+            return watcher
+
+    LOG.debug('Using polling watcher (interval %ss) for: %s' % (poll_interval, ', '.join(paths)))
+    return PollingWatcher(paths=paths, poll_interval=poll_interval)
+
+
+def wait_for_changes(watcher, debounce=0.5):
+    """
+    Block until a change is detected and no further changes have been detected for debounce
+    seconds.
+
+    This way a burst of changes (e.g. a config management run or a git checkout) is applied at
+    once.
+    """
+    while not watcher.wait(timeout=60):
+        pass
+
+    while watcher.wait(timeout=debounce):
+        pass
@@ -0,0 +1,555 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmarks for the RBAC backend hot paths (resolvers, RBACService queries and
+RBACDefinitionsDBSyncer).
+
+The script generates a synthetic dataset (users, roles, permission grants, packs and resources)
+in a dedicated database, runs the benchmarks and prints machine-readable (JSON) results.
+
+Usage:
+
+    python -m tests.benchmarks.rbac_benchmarks --users=200 --roles=50 --grants=100 \
+        --output=rbac-benchmarks.json
+
+By default the benchmarks run against a local mongod. Pass --mongomock to run them against an
+in-memory mongomock database instead (requires the mongomock package, results are only useful for
+comparing CPU overhead).
+
+NOTE: The benchmark database is dropped at the start of the run.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import timeit
+
+import bson
+import six
+from oslo_config import cfg
+
+from st2common.models.db import db_setup
+from st2common.models.db import db_teardown
+from st2common.models.db.auth import UserDB
+from st2common.models.db.auth import ApiKeyDB
+from st2common.models.db.pack import PackDB
+from st2common.models.db.runner import RunnerTypeDB
+from st2common.models.db.sensor import SensorTypeDB
+from st2common.models.db.action import ActionDB
+from st2common.models.db.actionalias import ActionAliasDB
+from st2common.models.db.rule import RuleDB
+from st2common.models.db.rule_enforcement import RuleEnforcementDB
+from st2common.models.db.execution import ActionExecutionDB
+from st2common.models.db.keyvalue import KeyValuePairDB
+from st2common.models.db.webhook import WebhookDB
+from st2common.models.db.trigger import TriggerDB
+from st2common.models.db.policy import PolicyTypeDB
+from st2common.models.db.policy import PolicyDB
+from st2common.models.db.trace import TraceDB
+from st2common.models.db.rbac import RoleDB
+from st2common.models.db.rbac import UserRoleAssignmentDB
+from st2common.models.db.rbac import PermissionGrantDB
+from st2common.models.api.rbac import RoleDefinitionFileFormatAPI
+from st2common.models.api.rbac import UserRoleAssignmentFileFormatAPI
+from st2common.models.api.rbac import AuthGroupToRoleMapAssignmentFileFormatAPI
+from st2common.persistence.auth import User
+from st2common.persistence.rbac import Role
+from st2common.persistence.rbac import UserRoleAssignment
+from st2common.persistence.rbac import PermissionGrant
+from st2common.rbac.types import PermissionType
+from st2common.rbac.types import ResourceType
+from st2common.rbac.migrations import run_all as run_all_rbac_migrations
+
+from st2rbac_backend.cache import request_scope
+from st2rbac_backend.resolvers import get_resolver_for_resource_type
+from st2rbac_backend.service import RBACService as rbac_service
+from st2rbac_backend.syncer import RBACDefinitionsDBSyncer
+
+__all__ = [
+    'main'
+]
+
+# Permission names which are granted on the packs and on the individual resources
+PACK_GRANT_PERMISSION_TYPES = [
+    PermissionType.ACTION_VIEW,
+    PermissionType.ACTION_EXECUTE,
+    PermissionType.RULE_VIEW,
+    PermissionType.SENSOR_VIEW,
+    PermissionType.ACTION_ALIAS_VIEW
+]
+
+RESOURCE_GRANT_PERMISSION_TYPES = {
+    ResourceType.ACTION: [PermissionType.ACTION_VIEW, PermissionType.ACTION_EXECUTE],
+    ResourceType.RULE: [PermissionType.RULE_VIEW, PermissionType.RULE_MODIFY],
+    ResourceType.SENSOR: [PermissionType.SENSOR_VIEW],
+    ResourceType.ACTION_ALIAS: [PermissionType.ACTION_ALIAS_VIEW]
+}
+
+# Caching modes resolvers are benchmarked in
+CACHE_MODE_NONE = 'none'
+CACHE_MODE_REQUEST_SCOPE = 'request_scope'
+CACHE_MODE_PROCESS = 'process'
+
+CACHE_MODES = [CACHE_MODE_NONE, CACHE_MODE_REQUEST_SCOPE, CACHE_MODE_PROCESS]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run RBAC backend micro-benchmarks')
+    parser.add_argument('--users', type=int, default=100, help='Number of users')
+    parser.add_argument('--roles', type=int, default=20, help='Number of custom roles')
+    parser.add_argument('--grants', type=int, default=50,
+                        help='Number of permission grants per role')
+    parser.add_argument('--roles-per-user', type=int, default=3,
+                        help='Number of roles assigned to each user')
+    parser.add_argument('--packs', type=int, default=20, help='Number of packs')
+    parser.add_argument('--resources-per-pack', type=int, default=10,
+                        help='Number of actions, rules, sensors, aliases and executions per pack')
+    parser.add_argument('--iterations', type=int, default=500,
+                        help='Number of checks per benchmark')
+    parser.add_argument('--checks-per-request', type=int, default=20,
+                        help='Number of checks performed inside a single request scope')
+    parser.add_argument('--sync-iterations', type=int, default=3,
+                        help='Number of RBACDefinitionsDBSyncer.sync runs')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the dataset')
+    parser.add_argument('--db-name', default='st2-rbac-benchmarks', help='Database name')
+    parser.add_argument('--db-host', default='127.0.0.1', help='Database host')
+    parser.add_argument('--db-port', type=int, default=27017, help='Database port')
+    parser.add_argument('--mongomock', action='store_true', default=False,
+                        help='Use in-memory mongomock database instead of mongod')
+    parser.add_argument('--output', default=None,
+                        help='Path to the file to write results to (defaults to stdout)')
+    return parser.parse_args(argv)
+
+
+def setup(args):
+    # Note: st2tests config registers all the options needed by st2common with test defaults
+    from st2tests import config as tests_config
+    tests_config.parse_args(args=[])
+
+    cfg.CONF.set_override(name='enable', override=True, group='rbac')
+    cfg.CONF.set_override(name='backend', override='default', group='rbac')
+
+    if args.mongomock:
+        import mongoengine
+        connection = mongoengine.connect(args.db_name, host='mongomock://localhost')
+    else:
+        connection = db_setup(db_name=args.db_name, db_host=args.db_host, db_port=args.db_port,
+                              ensure_indexes=True)
+
+    connection.drop_database(args.db_name)
+    run_all_rbac_migrations()
+
+
+def teardown(args):
+    if not args.mongomock:
+        db_teardown()
+
+
+class Dataset(object):
+    """
+    Synthetic RBAC dataset.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+
+        self.pack_names = ['pack_%s' % (index) for index in range(args.packs)]
+
+        # resource_type -> list of in-memory resource objects
+        self.resources = {}
+
+        self.user_dbs = []
+        self.role_definition_apis = []
+        self.role_assignment_apis = []
+        self.group_to_role_map_apis = []
+
+    def generate(self):
+        self._generate_resources()
+        self._generate_role_definitions()
+        self._generate_role_assignments()
+
+    def insert(self):
+        """
+        Insert the dataset into the database.
+        """
+        for role_definition_api in self.role_definition_apis:
+            role_db = RoleDB(name=role_definition_api.name,
+                             description=role_definition_api.description)
+            role_db = Role.add_or_update(role_db)
+
+            for permission_grant in role_definition_api.permission_grants:
+                resource_uid = permission_grant['resource_uid']
+                resource_type = resource_uid.split(':', 1)[0]
+                permission_grant_db = PermissionGrantDB(
+                    resource_uid=resource_uid, resource_type=resource_type,
+                    permission_types=permission_grant['permission_types'])
+                permission_grant_db = PermissionGrant.add_or_update(permission_grant_db)
+                role_db.permission_grants.append(str(permission_grant_db.id))
+
+            Role.add_or_update(role_db)
+
+        for role_assignment_api in self.role_assignment_apis:
+            user_db = User.add_or_update(UserDB(name=role_assignment_api.username))
+            self.user_dbs.append(user_db)
+
+            for role_name in role_assignment_api.roles:
+                role_assignment_db = UserRoleAssignmentDB(
+                    user=user_db.name, role=role_name, source=role_assignment_api.file_path)
+                UserRoleAssignment.add_or_update(role_assignment_db)
+
+        rbac_service.invalidate_caches()
+
+    def _generate_resources(self):
+        args = self.args
+
+        for pack_name in self.pack_names:
+            self._add_resource(ResourceType.PACK, PackDB(name=pack_name, ref=pack_name,
+                                                         description='', version='0.1.0',
+                                                         author='benchmarks',
+                                                         email='benchmarks@example.com'))
+
+            for index in range(args.resources_per_pack):
+                name = 'resource_%s' % (index)
+                ref = '%s.%s' % (pack_name, name)
+
+                action_db = ActionDB(pack=pack_name, name=name, entry_point='',
+                                     runner_type={'name': 'local-shell-cmd'})
+                rule_db = RuleDB(pack=pack_name, name=name, action={'ref': 'core.local'},
+                                 trigger='core.st2.key_value_pair.create')
+
+                self._add_resource(ResourceType.ACTION, action_db)
+                self._add_resource(ResourceType.RULE, rule_db)
+                self._add_resource(ResourceType.SENSOR, SensorTypeDB(pack=pack_name, name=name))
+                self._add_resource(ResourceType.ACTION_ALIAS,
+                                   ActionAliasDB(pack=pack_name, name=name, formats=['a'],
+                                                 action_ref=ref))
+                self._add_resource(ResourceType.TRIGGER,
+                                   TriggerDB(pack=pack_name, name=name, type='core.st2.webhook'))
+                self._add_resource(ResourceType.POLICY,
+                                   PolicyDB(pack=pack_name, name=name, resource_ref=ref,
+                                            policy_type='action.concurrency'))
+                self._add_resource(ResourceType.EXECUTION, ActionExecutionDB(
+                    action={'uid': action_db.get_uid(), 'pack': pack_name},
+                    runner={'name': 'local-shell-cmd'}, liveaction={'action': ref},
+                    status='requested'))
+                self._add_resource(ResourceType.RULE_ENFORCEMENT, RuleEnforcementDB(
+                    trigger_instance_id=str(bson.ObjectId()),
+                    execution_id=str(bson.ObjectId()),
+                    rule={'ref': rule_db.ref, 'uid': rule_db.uid, 'id': str(bson.ObjectId())}))
+
+        for index in range(args.resources_per_pack):
+            name = 'resource_%s' % (index)
+
+            self._add_resource(ResourceType.RUNNER, RunnerTypeDB(name=name))
+            self._add_resource(ResourceType.KEY_VALUE_PAIR, KeyValuePairDB(name=name, value='v'))
+            self._add_resource(ResourceType.WEBHOOK, WebhookDB(name='st2/%s' % (name)))
+            self._add_resource(ResourceType.API_KEY, ApiKeyDB(user='user_0', key_hash=name))
+            self._add_resource(ResourceType.TRACE, TraceDB(trace_tag=name))
+            self._add_resource(ResourceType.POLICY_TYPE,
+                               PolicyTypeDB(resource_type='action', name=name))
+
+    def _generate_role_definitions(self):
+        args = self.args
+
+        grant_resource_types = sorted(RESOURCE_GRANT_PERMISSION_TYPES.keys())
+
+        for role_index in range(args.roles):
+            permission_grants = []
+
+            for _ in range(args.grants):
+                # Roughly a third of grants are on packs and the rest on individual resources
+                if self.random.random() < 0.33:
+                    resource_db = self.random.choice(self.resources[ResourceType.PACK])
+                    permission_types = PACK_GRANT_PERMISSION_TYPES
+                else:
+                    resource_type = self.random.choice(grant_resource_types)
+                    resource_db = self.random.choice(self.resources[resource_type])
+                    permission_types = RESOURCE_GRANT_PERMISSION_TYPES[resource_type]
+
+                permission_types = self.random.sample(permission_types,
+                                                      self.random.randint(1, 2)
+                                                      if len(permission_types) > 1 else 1)
+                permission_grants.append({
+                    'resource_uid': resource_db.get_uid(),
+                    'permission_types': sorted(permission_types)
+                })
+
+            role_definition_api = RoleDefinitionFileFormatAPI(
+                name='role_%s' % (role_index), description='Benchmark role',
+                permission_grants=permission_grants)
+            self.role_definition_apis.append(role_definition_api)
+
+        # Remote group to role mappings
+        role_names = [api.name for api in self.role_definition_apis]
+        for index in range(max(1, args.roles // 5)):
+            group_to_role_map_api = AuthGroupToRoleMapAssignmentFileFormatAPI(
+                group='group_%s' % (index),
+                roles=self.random.sample(role_names, min(len(role_names), 2)),
+                file_path='mappings/group_%s.yaml' % (index))
+            self.group_to_role_map_apis.append(group_to_role_map_api)
+
+    def _generate_role_assignments(self):
+        args = self.args
+        role_names = [api.name for api in self.role_definition_apis]
+
+        for user_index in range(args.users):
+            username = 'user_%s' % (user_index)
+            roles = self.random.sample(role_names, min(len(role_names), args.roles_per_user))
+            role_assignment_api = UserRoleAssignmentFileFormatAPI(
+                username=username, roles=roles,
+                file_path='assignments/%s.yaml' % (username))
+            self.role_assignment_apis.append(role_assignment_api)
+
+    def _add_resource(self, resource_type, resource_db):
+        self.resources.setdefault(resource_type, []).append(resource_db)
+
+
+def time_calls(func, iterations):
+    """
+    Call func(index) the provided number of times and return timing statistics in microseconds.
+
+    :rtype: ``dict``
+    """
+    timings = []
+    result_counts = {True: 0, False: 0}
+
+    for index in range(iterations):
+        start = timeit.default_timer()
+        result = func(index)
+        timings.append((timeit.default_timer() - start) * 1000000)
+
+        if isinstance(result, bool):
+            result_counts[result] += 1
+
+    return _get_stats(timings, extra={'allowed': result_counts[True],
+                                      'denied': result_counts[False]})
+
+
+def _get_stats(timings, extra=None):
+    timings = sorted(timings)
+    count = len(timings)
+
+    result = {
+        'iterations': count,
+        'total_us': sum(timings),
+        'mean_us': sum(timings) / count,
+        'min_us': timings[0],
+        'median_us': timings[count // 2],
+        'p95_us': timings[min(count - 1, int(count * 0.95))],
+        'max_us': timings[-1]
+    }
+    result.update(extra or {})
+    return result
+
+
+def set_cache_mode(cache_mode):
+    if cache_mode == CACHE_MODE_PROCESS:
+        cfg.CONF.set_override(name='cache_size', override=10000, group='rbac')
+    else:
+        cfg.CONF.clear_override(name='cache_size', group='rbac')
+
+    rbac_service.invalidate_caches()
+
+
+def run_check(cache_mode, checks_per_request, index, func):
+    """
+    Run a single check using the provided caching mode.
+    """
+    if cache_mode == CACHE_MODE_REQUEST_SCOPE:
+        # Simulate multiple checks per request (e.g. list API endpoint)
+        with request_scope():
+            for _ in range(checks_per_request):
+                result = func(index)
+        return result
+
+    return func(index)
+
+
+def benchmark_resolvers(args, dataset):
+    results = []
+
+    resource_types = sorted(ResourceType.get_valid_values())
+
+    for resource_type in resource_types:
+        try:
+            resolver = get_resolver_for_resource_type(resource_type=resource_type)
+        except ValueError:
+            continue
+
+        resource_dbs = dataset.resources.get(resource_type, [])
+        valid_permission_types = PermissionType.get_valid_permissions_for_resource_type(
+            resource_type=resource_type)
+
+        view_permission_type = PermissionType.get_permission_type(
+            resource_type=resource_type, permission_name='view')
+
+        if resource_dbs and view_permission_type in valid_permission_types:
+            name = 'resolver.%s.user_has_resource_db_permission' % (resource_type)
+
+            def check(index, resolver=resolver, resource_dbs=resource_dbs,
+                      permission_type=view_permission_type):
+                user_db = dataset.user_dbs[index % len(dataset.user_dbs)]
+                resource_db = resource_dbs[index % len(resource_dbs)]
+                return resolver.user_has_resource_db_permission(user_db=user_db,
+                                                                resource_db=resource_db,
+                                                                permission_type=permission_type)
+        else:
+            name = 'resolver.%s.user_has_permission' % (resource_type)
+
+            def check(index, resolver=resolver, permission_type=valid_permission_types[0]):
+                user_db = dataset.user_dbs[index % len(dataset.user_dbs)]
+                return resolver.user_has_permission(user_db=user_db,
+                                                    permission_type=permission_type)
+
+        for cache_mode in CACHE_MODES:
+            set_cache_mode(cache_mode)
+            checks_per_request = args.checks_per_request
+
+            def run(index, check=check, cache_mode=cache_mode):
+                return run_check(cache_mode=cache_mode, checks_per_request=checks_per_request,
+                                 index=index, func=check)
+
+            try:
+                stats = time_calls(run, args.iterations)
+            except NotImplementedError:
+                continue
+
+            if cache_mode == CACHE_MODE_REQUEST_SCOPE:
+                # Report per check timings
+                for key in ['total_us', 'mean_us', 'min_us', 'median_us', 'p95_us', 'max_us']:
+                    stats[key] = stats[key] / checks_per_request
+
+            stats.update({'name': name, 'cache_mode': cache_mode})
+            results.append(stats)
+
+    set_cache_mode(CACHE_MODE_NONE)
+    return results
+
+
+def benchmark_service(args, dataset):
+    results = []
+
+    def get_user_db(index):
+        return dataset.user_dbs[index % len(dataset.user_dbs)]
+
+    action_dbs = dataset.resources[ResourceType.ACTION]
+
+    benchmarks = [
+        ('service.get_roles_for_user',
+         lambda index: list(rbac_service.get_roles_for_user(user_db=get_user_db(index)))),
+        ('service.get_all_permission_grants_for_user',
+         lambda index: list(rbac_service.get_all_permission_grants_for_user(
+             user_db=get_user_db(index)))),
+        ('service.get_all_permission_grants_for_user.filtered',
+         lambda index: list(rbac_service.get_all_permission_grants_for_user(
+             user_db=get_user_db(index),
+             resource_uid=action_dbs[index % len(action_dbs)].get_uid(),
+             resource_types=[ResourceType.ACTION],
+             permission_types=[PermissionType.ACTION_VIEW]))),
+        ('service.user_has_any_permission_grant',
+         lambda index: rbac_service.user_has_any_permission_grant(
+             user_db=get_user_db(index),
+             resource_uid=action_dbs[index % len(action_dbs)].get_uid(),
+             resource_types=[ResourceType.ACTION],
+             permission_types=[PermissionType.ACTION_VIEW])),
+        ('service.get_permission_index_for_user',
+         lambda index: rbac_service.get_permission_index_for_user(user_db=get_user_db(index)))
+    ]
+
+    # Note: Aggregation ($lookup, $toObjectId) is not supported by mongomock
+    aggregation_modes = [False] if args.mongomock else [False, True]
+
+    for aggregation in aggregation_modes:
+        cfg.CONF.set_override(name='permission_grants_aggregation', override=aggregation,
+                              group='rbac')
+
+        for name, func in benchmarks:
+            stats = time_calls(func, args.iterations)
+            stats.update({'name': name, 'aggregation': aggregation})
+            results.append(stats)
+
+    cfg.CONF.clear_override(name='permission_grants_aggregation', group='rbac')
+    return results
+
+
+def benchmark_syncer(args, dataset):
+    results = []
+    syncer = RBACDefinitionsDBSyncer()
+
+    def sync(index):
+        syncer.sync(role_definition_apis=dataset.role_definition_apis,
+                    role_assignment_apis=dataset.role_assignment_apis,
+                    group_to_role_map_apis=dataset.group_to_role_map_apis)
+
+    stats = time_calls(sync, args.sync_iterations)
+    stats.update({'name': 'syncer.sync'})
+    results.append(stats)
+
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    setup(args)
+
+    try:
+        dataset = Dataset(args=args)
+        dataset.generate()
+
+        start = time.time()
+        dataset.insert()
+        insert_duration = time.time() - start
+
+        results = []
+        results.extend(benchmark_resolvers(args=args, dataset=dataset))
+        results.extend(benchmark_service(args=args, dataset=dataset))
+        results.extend(benchmark_syncer(args=args, dataset=dataset))
+    finally:
+        teardown(args)
+
+    output = {
+        'metadata': {
+            'timestamp': int(time.time()),
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'database': 'mongomock' if args.mongomock else 'mongod',
+            'dataset_insert_duration_s': insert_duration,
+            'parameters': dict([(key, value) for key, value in six.iteritems(vars(args))
+                                if key != 'output'])
+        },
+        'results': results
+    }
+
+    content = json.dumps(output, indent=2, sort_keys=True)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(content)
+    else:
+        sys.stdout.write(content + '\n')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+
+import mock
+import unittest2
+
+from st2common.models.db.auth import UserDB
+from st2common.models.db.action import ActionDB
+from st2common.models.db.keyvalue import KeyValuePairDB
+from st2common.rbac.types import PermissionType
+from st2common.rbac.types import ResourceType
+
+from st2rbac_backend import trace as decision_trace
+from st2rbac_backend.audit import RBACAuditDB
+from st2rbac_backend.audit import DecisionAuditSink
+from st2rbac_backend.audit import FileAuditWriter
+from st2rbac_backend.audit import MongoAuditWriter
+from st2rbac_backend.index import UserPermissionIndex
+from st2rbac_backend.resolvers import ActionPermissionsResolver
+from st2rbac_backend.resolvers import KeyValuePermissionsResolver
+
+__all__ = [
+    'DecisionAuditSinkTestCase',
+    'FileAuditWriterTestCase',
+    'MongoAuditWriterTestCase',
+    'DecisionAuditTestCase'
+]
+
+MOCK_PERMISSION_GRANTS = [
+    ('grant_1', 'pack:test_pack_1', ResourceType.PACK, [PermissionType.ACTION_EXECUTE])
+]
+
+
+class DecisionAuditSinkTestCase(unittest2.TestCase):
+    def test_records_are_written_in_batches(self):
+        writer = mock.Mock()
+        sink = DecisionAuditSink(writer=writer, buffer_size=10, batch_size=2)
+
+        for index in range(5):
+            self.assertTrue(sink.enqueue({'index': index}))
+
+        self.assertEqual(sink.flush(), 5)
+        self.assertEqual(writer.write.call_count, 3)
+        self.assertEqual(writer.write.call_args_list[0][0][0], [{'index': 0}, {'index': 1}])
+        self.assertEqual(writer.write.call_args_list[2][0][0], [{'index': 4}])
+
+        stats = sink.get_stats()
+        self.assertEqual(stats['enqueued'], 5)
+        self.assertEqual(stats['written'], 5)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_records_are_dropped_when_buffer_is_full(self):
+        writer = mock.Mock()
+        sink = DecisionAuditSink(writer=writer, buffer_size=2, batch_size=10)
+
+        self.assertTrue(sink.enqueue({'index': 0}))
+        self.assertTrue(sink.enqueue({'index': 1}))
+        self.assertFalse(sink.enqueue({'index': 2}))
+
+        stats = sink.get_stats()
+        self.assertEqual(stats['enqueued'], 2)
+        self.assertEqual(stats['dropped'], 1)
+        self.assertEqual(stats['pending'], 2)
+
+        sink.flush()
+        self.assertTrue(sink.enqueue({'index': 3}))
+
+    def test_concurrent_enqueue_respects_buffer_size(self):
+        writer = mock.Mock()
+        sink = DecisionAuditSink(writer=writer, buffer_size=100, batch_size=1000)
+
+        def enqueue_records():
+            for index in range(50):
+                sink.enqueue({'index': index})
+
+        threads = [threading.Thread(target=enqueue_records) for _ in range(10)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        stats = sink.get_stats()
+        self.assertEqual(stats['pending'], 100)
+        self.assertEqual(stats['enqueued'], 100)
+        self.assertEqual(stats['dropped'], 400)
+
+    def test_failed_writes_are_counted(self):
+        writer = mock.Mock()
+        writer.write.side_effect = Exception('failure')
+        sink = DecisionAuditSink(writer=writer, buffer_size=10, batch_size=10)
+
+        sink.enqueue({'index': 0})
+        self.assertEqual(sink.flush(), 0)
+
+        stats = sink.get_stats()
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_stop_flushes_pending_records(self):
+        writer = mock.Mock()
+        sink = DecisionAuditSink(writer=writer, buffer_size=10, batch_size=10,
+                                 flush_interval=60)
+        sink.start()
+        sink.enqueue({'index': 0})
+        sink.stop()
+
+        writer.write.assert_called_once_with([{'index': 0}])
+        writer.close.assert_called_once_with()
+
+
+class FileAuditWriterTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(FileAuditWriterTestCase, self).setUp()
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def test_write_and_rotate(self):
+        file_path = os.path.join(self.temp_dir, 'audit.log')
+        writer = FileAuditWriter(file_path=file_path, max_bytes=100, backup_count=2)
+
+        writer.write([{'user': 'user_1', 'outcome': True}, {'user': 'user_2', 'outcome': False}])
+        writer.close()
+
+        with open(file_path, 'r') as fp:
+            lines = fp.read().splitlines()
+
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'user': 'user_1', 'outcome': True},
+                          {'user': 'user_2', 'outcome': False}])
+
+        writer = FileAuditWriter(file_path=file_path, max_bytes=100, backup_count=2)
+        writer.write([{'user': 'user_%s' % (index)} for index in range(10)])
+        writer.close()
+
+        self.assertTrue(os.path.isfile(file_path + '.1'))
+        self.assertFalse(os.path.isfile(file_path + '.3'))
+
+
+class MongoAuditWriterTestCase(unittest2.TestCase):
+    @mock.patch.object(RBACAuditDB, '_get_collection')
+    @mock.patch.object(RBACAuditDB, '_get_db')
+    def test_write_to_custom_collection(self, mock_get_db, mock_get_collection):
+        db = mock.MagicMock()
+        mock_get_db.return_value = db
+        collection = db.__getitem__.return_value
+
+        writer = MongoAuditWriter(collection_name='custom_audit')
+        writer.write([{'user': 'user_1'}])
+        writer.write([{'user': 'user_2'}])
+
+        # Indexes are created once on the configured collection and the default model collection
+        # is never touched
+        db.__getitem__.assert_called_once_with('custom_audit')
+        self.assertEqual(mock_get_collection.call_count, 0)
+        self.assertEqual(collection.create_index.call_args_list,
+                         [mock.call([('timestamp', 1)], background=True),
+                          mock.call([('user', 1)], background=True)])
+        self.assertEqual(collection.insert_many.call_args_list,
+                         [mock.call([{'user': 'user_1'}], ordered=False),
+                          mock.call([{'user': 'user_2'}], ordered=False)])
+
+    @mock.patch.object(RBACAuditDB, '_get_db')
+    def test_write_to_default_collection(self, mock_get_db):
+        db = mock.MagicMock()
+        mock_get_db.return_value = db
+
+        writer = MongoAuditWriter()
+        writer.write([{'user': 'user_1'}])
+
+        db.__getitem__.assert_called_once_with('rbac_audit')
+
+
+class DecisionAuditTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(DecisionAuditTestCase, self).setUp()
+
+        self.records = []
+        decision_trace.add_listener(self.records.append)
+
+        self.sink = DecisionAuditSink(writer=mock.Mock(), buffer_size=10, batch_size=10)
+        decision_trace.configure(enabled=False, sample_rate=0)
+        decision_trace.set_audit_sink(self.sink)
+
+        permission_index = UserPermissionIndex(username='user_1', role_names=['custom_role_1'],
+                                               permission_grants=MOCK_PERMISSION_GRANTS)
+        patcher = mock.patch.object(ActionPermissionsResolver, '_get_permission_index',
+                                    mock.Mock(return_value=permission_index))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        super(DecisionAuditTestCase, self).tearDown()
+
+        decision_trace.remove_listener(self.records.append)
+        decision_trace.set_audit_sink(None)
+
+    def test_every_decision_is_audited(self):
+        self.assertTrue(decision_trace.ACTIVE)
+
+        resolver = ActionPermissionsResolver()
+        user_db = UserDB(name='user_1')
+
+        for pack in ['test_pack_1', 'test_pack_2']:
+            action_db = ActionDB(pack=pack, name='action_1', entry_point='',
+                                 runner_type={'name': 'local-shell-cmd'})
+            resolver.user_has_resource_db_permission(user_db=user_db, resource_db=action_db,
+                                                     permission_type=PermissionType.ACTION_EXECUTE)
+
+        # Tracing is disabled so nothing is logged, but all the decisions are audited
+        self.assertEqual(self.records, [])
+        self.assertEqual(self.sink.get_stats()['pending'], 2)
+
+        self.sink.flush()
+        records = self.sink.writer.write.call_args[0][0]
+
+        self.assertEqual(records[0]['user'], 'user_1')
+        self.assertEqual(records[0]['permission_type'], PermissionType.ACTION_EXECUTE)
+        self.assertEqual(records[0]['resource_uid'], 'action:test_pack_1:action_1')
+        self.assertEqual(records[0]['matched'], 'grant_1')
+        self.assertTrue(records[0]['outcome'])
+        self.assertTrue(records[0]['latency_ms'] >= 0)
+
+        self.assertEqual(records[1]['resource_uid'], 'action:test_pack_2:action_1')
+        self.assertEqual(records[1]['matched'], None)
+        self.assertFalse(records[1]['outcome'])
+
+        decision_trace.set_audit_sink(None)
+        self.assertFalse(decision_trace.ACTIVE)
+
+    def test_key_value_decisions_are_audited(self):
+        resolver = KeyValuePermissionsResolver()
+        user_db = UserDB(name='user_1')
+        kvp_db = KeyValuePairDB(name='key_1', value='value_1')
+
+        self.assertTrue(resolver.user_has_permission(user_db=user_db,
+            permission_type=PermissionType.KEY_VALUE_VIEW))
+        self.assertTrue(resolver.user_has_resource_db_permission(user_db=user_db,
+            resource_db=kvp_db, permission_type=PermissionType.KEY_VALUE_SET))
+
+        self.sink.flush()
+        records = self.sink.writer.write.call_args[0][0]
+
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['user'], 'user_1')
+        self.assertEqual(records[0]['permission_type'], PermissionType.KEY_VALUE_VIEW)
+        self.assertTrue(records[0]['outcome'])
+        self.assertEqual(records[1]['permission_type'], PermissionType.KEY_VALUE_SET)
+        self.assertEqual(records[1]['resource_uid'], kvp_db.get_uid())
+        self.assertTrue(records[1]['outcome'])
@@ -0,0 +1,142 @@
+# Copyright 2020 The StackStorm Authors.
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from st2rbac_backend.cache import LRUCache
+from st2rbac_backend.cache import request_scope
+from st2rbac_backend.cache import get_request_scope
+from st2rbac_backend.cache import get_request_scope_stats
+from st2rbac_backend.cache import reset_request_scope_stats
+
+__all__ = [
+    'RequestScopeTestCase',
+    'LRUCacheTestCase'
+]
+
+
+class RequestScopeTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(RequestScopeTestCase, self).setUp()
+        reset_request_scope_stats()
+
+    def test_no_active_scope(self):
+        self.assertEqual(get_request_scope(), None)
+
+    def test_get_or_set_memoizes_values(self):
+        func = mock.Mock(return_value=['role_1'])
+
+        with request_scope() as scope:
+            self.assertEqual(get_request_scope(), scope)
+
+            self.assertEqual(scope.get_or_set('key_1', func), ['role_1'])
+            self.assertEqual(scope.get_or_set('key_1', func), ['role_1'])
+            self.assertEqual(scope.get_or_set('key_1', func), ['role_1'])
+
+            self.assertEqual(func.call_count, 1)
+            self.assertEqual(scope.hits, 2)
+            self.assertEqual(scope.misses, 1)
+
+            # Cleared scope should fetch the value again
+            scope.clear()
+            self.assertEqual(scope.get_or_set('key_1', func), ['role_1'])
+            self.assertEqual(func.call_count, 2)
+
+        self.assertEqual(get_request_scope(), None)
+
+        stats = get_request_scope_stats()
+        self.assertEqual(stats, {'scopes': 1, 'hits': 2, 'misses': 2})
+
+    def test_nested_scopes_share_values(self):
+        func = mock.Mock(return_value=1)
+
+        with request_scope() as outer_scope:
+            outer_scope.get_or_set('key_1', func)
+
+            with request_scope() as inner_scope:
+                self.assertEqual(inner_scope, outer_scope)
+                inner_scope.get_or_set('key_1', func)
+
+            # Exiting nested scope shouldn't deactivate the outer one
+            self.assertEqual(get_request_scope(), outer_scope)
+
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(get_request_scope_stats()['scopes'], 1)
+
+
+class LRUCacheTestCase(unittest2.TestCase):
+    def test_get_and_set(self):
+        cache = LRUCache(max_size=10, ttl=None)
+
+        self.assertEqual(cache.get('key_1'), None)
+        self.assertEqual(cache.get('key_1', 'default'), 'default')
+
+        cache.set('key_1', [])
+        self.assertEqual(cache.get('key_1'), [])
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['size'], 1)
+
+        cache.delete('key_1')
+        self.assertEqual(cache.get('key_1'), None)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(max_size=2, ttl=None)
+
+        cache.set('key_1', 1)
+        cache.set('key_2', 2)
+
+        # Access key_1 so key_2 becomes the least recently used entry
+        self.assertEqual(cache.get('key_1'), 1)
+
+        cache.set('key_3', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('key_1'), 1)
+        self.assertEqual(cache.get('key_2'), None)
+        self.assertEqual(cache.get('key_3'), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    @mock.patch('st2rbac_backend.cache.time.time')
+    def test_entries_expire_after_ttl(self, mock_time):
+        mock_time.return_value = 100
+        func = mock.Mock(return_value='value')
+        cache = LRUCache(max_size=10, ttl=5)
+
+        self.assertEqual(cache.get_or_set('key_1', func), 'value')
+        self.assertEqual(cache.get_or_set('key_1', func), 'value')
+        self.assertEqual(func.call_count, 1)
+
+        mock_time.return_value = 104
+        self.assertEqual(cache.get_or_set('key_1', func), 'value')
+        self.assertEqual(func.call_count, 1)
+
+        mock_time.return_value = 105
+        self.assertEqual(cache.get_or_set('key_1', func), 'value')
+        self.assertEqual(func.call_count, 2)
+
+    def test_clear(self):
+        cache = LRUCache(max_size=10, ttl=60)
+        cache.set('key_1', 1)
+        cache.set('key_2', 2)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('key_1'), None)
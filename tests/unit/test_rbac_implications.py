@@ -0,0 +1,120 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from st2common.models.db.auth import UserDB
+from st2common.models.db.action import ActionDB
+from st2common.rbac.types import PermissionType
+from st2common.rbac.types import ResourceType
+
+from st2rbac_backend.implications import PermissionImplication
+from st2rbac_backend.implications import get_permission_implication
+from st2rbac_backend.implications import get_permission_implications
+from st2rbac_backend.index import UserPermissionIndex
+from st2rbac_backend.resolvers import ActionPermissionsResolver
+
+__all__ = [
+    'PermissionImplicationsTestCase'
+]
+
+
+class PermissionImplicationsTestCase(unittest2.TestCase):
+    def test_view_permission_is_implied_by_other_resource_permissions(self):
+        implication = get_permission_implication(PermissionType.ACTION_VIEW)
+        self.assertEqual(implication.permission_types, frozenset([
+            PermissionType.ACTION_VIEW,
+            PermissionType.ACTION_ALL,
+            PermissionType.ACTION_CREATE,
+            PermissionType.ACTION_MODIFY,
+            PermissionType.ACTION_DELETE,
+            PermissionType.ACTION_EXECUTE
+        ]))
+        self.assertEqual(implication.resource_types, (ResourceType.ACTION, ResourceType.PACK))
+
+    def test_all_permission_implies_other_resource_permissions(self):
+        implication = get_permission_implication(PermissionType.RULE_MODIFY)
+        self.assertEqual(implication.permission_types,
+                         frozenset([PermissionType.RULE_ALL, PermissionType.RULE_MODIFY]))
+
+        implication = get_permission_implication(PermissionType.WEBHOOK_CREATE)
+        self.assertEqual(implication.permission_types,
+                         frozenset([PermissionType.WEBHOOK_ALL, PermissionType.WEBHOOK_CREATE]))
+        self.assertEqual(implication.resource_types, (ResourceType.WEBHOOK,))
+
+        # Pack and runner permissions are only satisfied by a direct grant
+        implication = get_permission_implication(PermissionType.PACK_VIEW)
+        self.assertEqual(implication.permission_types, frozenset([PermissionType.PACK_VIEW]))
+
+    def test_execution_permissions_are_implied_by_action_permissions(self):
+        implication = get_permission_implication(PermissionType.EXECUTION_STOP)
+        self.assertEqual(implication.permission_types,
+                         frozenset([PermissionType.ACTION_ALL, PermissionType.ACTION_EXECUTE]))
+        self.assertEqual(implication.resource_types, (ResourceType.ACTION, ResourceType.PACK))
+
+        implication = get_permission_implication(PermissionType.EXECUTION_VIEW)
+        self.assertEqual(implication.permission_types,
+                         frozenset([PermissionType.ACTION_ALL, PermissionType.ACTION_VIEW]))
+
+    def test_rule_enforcement_permissions_are_implied_by_rule_permissions(self):
+        implication = get_permission_implication(PermissionType.RULE_ENFORCEMENT_VIEW)
+        self.assertEqual(implication.permission_types,
+                         get_permission_implication(PermissionType.RULE_VIEW).permission_types)
+        self.assertEqual(implication.resource_types, (ResourceType.RULE, ResourceType.PACK))
+
+        implication = get_permission_implication(PermissionType.RULE_ENFORCEMENT_LIST)
+        self.assertEqual(implication.permission_types,
+                         frozenset([PermissionType.RULE_ALL, PermissionType.RULE_LIST]))
+
+    def test_invalid_permission_type(self):
+        self.assertRaisesRegexp(ValueError, 'Invalid permission type',
+                                get_permission_implication, PermissionType.EXECUTION_LIST)
+
+        implications = get_permission_implications()
+        self.assertTrue(all(isinstance(implication.permission_types, frozenset)
+                            for implication in implications.values()))
+
+    def test_resolvers_look_grants_up_on_implication_resource_types(self):
+        permission_grants = [
+            ('grant_1', 'pack:test_pack_1', ResourceType.PACK, [PermissionType.ACTION_EXECUTE])
+        ]
+        permission_index = UserPermissionIndex(username='user_1', role_names=['custom_role_1'],
+                                               permission_grants=permission_grants)
+
+        resolver = ActionPermissionsResolver()
+        user_db = UserDB(name='user_1')
+        action_db = ActionDB(pack='test_pack_1', name='action_1', entry_point='',
+                             runner_type={'name': 'local-shell-cmd'})
+
+        with mock.patch.object(ActionPermissionsResolver, '_get_permission_index',
+                               mock.Mock(return_value=permission_index)):
+            # Grant on the parent pack satisfies the permission
+            self.assertTrue(resolver.user_has_resource_db_permission(
+                user_db=user_db, resource_db=action_db,
+                permission_type=PermissionType.ACTION_EXECUTE))
+
+            # Parent pack is not one of the implication resource types
+            implication = PermissionImplication(
+                permission_types=frozenset([PermissionType.ACTION_EXECUTE]),
+                resource_types=(ResourceType.ACTION,))
+
+            with mock.patch('st2rbac_backend.resolvers.get_permission_implication',
+                            mock.Mock(return_value=implication)):
+                self.assertFalse(resolver.user_has_resource_db_permission(
+                    user_db=user_db, resource_db=action_db,
+                    permission_type=PermissionType.ACTION_EXECUTE))
@@ -0,0 +1,119 @@
+# Copyright 2020 The StackStorm Authors.
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest2
+
+from st2common.rbac.types import PermissionType
+from st2common.rbac.types import ResourceType
+from st2common.rbac.types import SystemRole
+
+from st2rbac_backend.index import UserPermissionIndex
+
+__all__ = [
+    'UserPermissionIndexTestCase'
+]
+
+MOCK_PERMISSION_GRANTS = [
+    ('grant_1', 'pack:test_pack_1', ResourceType.PACK, [PermissionType.ACTION_EXECUTE]),
+    ('grant_2', 'action:test_pack_2:action_1', ResourceType.ACTION,
+     [PermissionType.ACTION_VIEW, PermissionType.ACTION_MODIFY]),
+    ('grant_3', None, None, [PermissionType.ACTION_LIST]),
+    ('grant_4', None, ResourceType.INQUIRY, [PermissionType.INQUIRY_RESPOND])
+]
+
+
+class UserPermissionIndexTestCase(unittest2.TestCase):
+    def test_system_role_flags(self):
+        permission_index = UserPermissionIndex(username='user_1',
+                                               role_names=[SystemRole.ADMIN, 'custom_role_1'],
+                                               permission_grants=[])
+        self.assertFalse(permission_index.is_system_admin)
+        self.assertTrue(permission_index.is_admin)
+        self.assertFalse(permission_index.is_observer)
+
+        permission_index = UserPermissionIndex(username='user_1', role_names=[],
+                                               permission_grants=[])
+        self.assertFalse(permission_index.is_system_admin)
+        self.assertFalse(permission_index.is_admin)
+        self.assertFalse(permission_index.is_observer)
+
+    def test_find_permission_grant_resource_grants(self):
+        permission_index = UserPermissionIndex(username='user_1', role_names=['custom_role_1'],
+                                               permission_grants=MOCK_PERMISSION_GRANTS)
+
+        grant_id = permission_index.find_permission_grant(
+            resource_uid='pack:test_pack_1', resource_types=[ResourceType.PACK],
+            permission_types=[PermissionType.ACTION_ALL, PermissionType.ACTION_EXECUTE])
+        self.assertEqual(grant_id, 'grant_1')
+
+        grant_id = permission_index.find_permission_grant(
+            resource_uid='action:test_pack_2:action_1', resource_types=[ResourceType.ACTION],
+            permission_types=[PermissionType.ACTION_MODIFY])
+        self.assertEqual(grant_id, 'grant_2')
+
+        # Resource type doesn't match
+        grant_id = permission_index.find_permission_grant(
+            resource_uid='pack:test_pack_1', resource_types=[ResourceType.ACTION],
+            permission_types=[PermissionType.ACTION_EXECUTE])
+        self.assertEqual(grant_id, None)
+
+        # Permission type doesn't match
+        grant_id = permission_index.find_permission_grant(
+            resource_uid='action:test_pack_2:action_1', resource_types=[ResourceType.ACTION],
+            permission_types=[PermissionType.ACTION_DELETE])
+        self.assertEqual(grant_id, None)
+
+    def test_find_permission_grant_resource_type_and_global_grants(self):
+        permission_index = UserPermissionIndex(username='user_1', role_names=['custom_role_1'],
+                                               permission_grants=MOCK_PERMISSION_GRANTS)
+
+        self.assertTrue(permission_index.find_permission_grant(
+            resource_types=[ResourceType.INQUIRY],
+            permission_types=[PermissionType.INQUIRY_VIEW, PermissionType.INQUIRY_RESPOND]))
+        self.assertFalse(permission_index.find_permission_grant(
+            resource_types=[ResourceType.INQUIRY], permission_types=[PermissionType.INQUIRY_ALL]))
+
+        self.assertTrue(permission_index.find_permission_grant(
+            permission_types=[PermissionType.ACTION_LIST]))
+        self.assertTrue(permission_index.find_permission_grant(
+            permission_types=[PermissionType.ACTION_EXECUTE]))
+        self.assertFalse(permission_index.find_permission_grant(
+            permission_types=[PermissionType.RULE_LIST]))
+
+    def test_find_resource_permission_grant(self):
+        permission_index = UserPermissionIndex(username='user_1', role_names=['custom_role_1'],
+                                               permission_grants=MOCK_PERMISSION_GRANTS)
+
+        # Grant on the parent pack
+        resources = [('action:test_pack_1:action_1', ResourceType.ACTION),
+                     ('pack:test_pack_1', ResourceType.PACK)]
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=resources, permission_types=[PermissionType.ACTION_EXECUTE])
+        self.assertEqual(matched_grant, ('grant_1', 'pack:test_pack_1', ResourceType.PACK))
+
+        # Direct grant on the resource
+        resources = [('action:test_pack_2:action_1', ResourceType.ACTION),
+                     ('pack:test_pack_2', ResourceType.PACK)]
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=resources, permission_types=[PermissionType.ACTION_VIEW])
+        self.assertEqual(matched_grant, ('grant_2', 'action:test_pack_2:action_1',
+                                         ResourceType.ACTION))
+
+        # No matching grants
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=resources, permission_types=[PermissionType.ACTION_EXECUTE])
+        self.assertEqual(matched_grant, None)
@@ -0,0 +1,80 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+from st2tests.base import CleanDbTestCase
+
+from st2common.models.db.rbac import PermissionGrantDB
+from st2common.models.db.rbac import UserRoleAssignmentDB
+from st2common.persistence.rbac import UserRoleAssignment
+
+from st2rbac_backend.indexes import QUERY_SHAPES
+from st2rbac_backend.indexes import QueryShape
+from st2rbac_backend.indexes import explain_query_shape
+from st2rbac_backend.indexes import get_covering_index
+from st2rbac_backend.indexes import create_recommended_index
+
+__all__ = [
+    'RBACIndexesTestCase'
+]
+
+
+class RBACIndexesTestCase(CleanDbTestCase):
+    def setUp(self):
+        super(RBACIndexesTestCase, self).setUp()
+
+        UserRoleAssignment.add_or_update(UserRoleAssignmentDB(user='user_1', role='role_1',
+                                                              source='assignments/user_1.yaml'))
+
+    def test_explain_all_query_shapes(self):
+        for query_shape in QUERY_SHAPES:
+            plan = explain_query_shape(query_shape=query_shape)
+            self.assertEqual(plan.shape, query_shape.name)
+            self.assertTrue(plan.stages)
+
+    def test_permission_grants_for_user_shape_is_not_served_by_id_index(self):
+        query_shape = [query_shape for query_shape in QUERY_SHAPES
+                       if query_shape.name == 'permission_grants_for_user'][0]
+
+        index_name = get_covering_index(query_shape=query_shape)
+        if not index_name:
+            index_name = create_recommended_index(query_shape=query_shape)
+            self.addCleanup(PermissionGrantDB._get_collection().drop_index, index_name)
+
+        plan = explain_query_shape(query_shape=query_shape)
+        self.assertFalse(plan.collection_scan)
+        self.assertNotIn('_id_', plan.index_names)
+
+    def test_missing_index_is_reported_and_created(self):
+        query_shape = QueryShape(name='role_assignments_for_description',
+                                 model=UserRoleAssignmentDB,
+                                 get_filter=lambda collection: {'description': 'dummy'},
+                                 recommended_index=[('description', 1)])
+
+        self.assertIsNone(get_covering_index(query_shape=query_shape))
+
+        plan = explain_query_shape(query_shape=query_shape)
+        self.assertTrue(plan.collection_scan)
+        self.assertEqual(plan.index_names, [])
+
+        index_name = create_recommended_index(query_shape=query_shape)
+        self.assertEqual(get_covering_index(query_shape=query_shape), index_name)
+
+        plan = explain_query_shape(query_shape=query_shape)
+        self.assertFalse(plan.collection_scan)
+        self.assertEqual(plan.index_names, [index_name])
+
+        UserRoleAssignmentDB._get_collection().drop_index(index_name)
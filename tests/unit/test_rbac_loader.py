@@ -15,6 +15,9 @@
 
 from __future__ import absolute_import
 import os
+import glob
+import shutil
+import tempfile
 
 import unittest2
 import mock
@@ -110,6 +113,108 @@ class RBACDefinitionsLoaderTestCase(unittest2.TestCase):
         expected_msg = 'Duplicate definition file found for role "role_three_name_conflict"'
         self.assertRaisesRegexp(ValueError, expected_msg, loader.load_role_definitions)
 
+    def test_load_role_definitions_duplicate_role_definition_multiple_workers(self):
+        loader = RBACDefinitionsLoader(workers=2)
+
+        file_path1 = os.path.join(get_fixtures_base_path(), 'rbac_invalid/roles/role_three1.yaml')
+        file_path2 = os.path.join(get_fixtures_base_path(), 'rbac_invalid/roles/role_three2.yaml')
+        file_paths = [file_path1, file_path2]
+
+        loader._get_role_definitions_file_paths = mock.Mock()
+        loader._get_role_definitions_file_paths.return_value = file_paths
+
+        expected_msg = 'Duplicate definition file found for role "role_three_name_conflict"'
+        self.assertRaisesRegexp(ValueError, expected_msg, loader.load_role_definitions)
+
+    def test_load_role_definitions_multiple_workers(self):
+        file_paths = sorted(glob.glob(os.path.join(get_fixtures_base_path(), 'rbac/roles/*.yaml')))
+
+        loader = RBACDefinitionsLoader(workers=1)
+        loader._get_role_definitions_file_paths = mock.Mock()
+        loader._get_role_definitions_file_paths.return_value = file_paths
+        expected_result = loader.load_role_definitions()
+
+        loader = RBACDefinitionsLoader(workers=3)
+        loader._get_role_definitions_file_paths = mock.Mock()
+        loader._get_role_definitions_file_paths.return_value = file_paths
+        result = loader.load_role_definitions()
+
+        self.assertEqual(list(result.keys()), list(expected_result.keys()))
+        for role_name, role_definition_api in result.items():
+            self.assertEqual(role_definition_api.file_path,
+                             expected_result[role_name].file_path)
+            self.assertEqual(role_definition_api.permission_grants,
+                             expected_result[role_name].permission_grants)
+
+        # Validation error in one of the files is propagated as is
+        file_path = os.path.join(get_fixtures_base_path(), 'rbac_invalid/roles/role_one.yaml')
+        loader._get_role_definitions_file_paths.return_value = file_paths + [file_path]
+
+        expected_msg = 'Invalid permission type "rule_all" for resource type "action"'
+        self.assertRaisesRegexp(ValueError, expected_msg, loader.load_role_definitions)
+
+    def test_load_role_definitions_manifest(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+
+        manifest_path = os.path.join(temp_dir, 'manifest.json')
+        file_paths = []
+        for file_name in ['role_three.yaml', 'role_seven.yaml', 'role_disabled.yaml']:
+            file_path = os.path.join(temp_dir, file_name)
+            shutil.copy(os.path.join(get_fixtures_base_path(), 'rbac/roles', file_name), file_path)
+            file_paths.append(file_path)
+
+        def get_loader(file_paths):
+            loader = RBACDefinitionsLoader(manifest_path=manifest_path)
+            loader._get_role_definitions_file_paths = mock.Mock()
+            loader._get_role_definitions_file_paths.return_value = file_paths
+            loader.load_role_definition_from_file = mock.Mock(
+                wraps=loader.load_role_definition_from_file)
+            return loader
+
+        # First run, all the files are loaded
+        loader = get_loader(file_paths)
+        expected_result = loader.load_role_definitions()
+        loader.save_manifest()
+
+        self.assertEqual(loader.load_role_definition_from_file.call_count, 3)
+        self.assertEqual(sorted(expected_result.keys()), ['role_seven', 'role_three'])
+        self.assertEqual(loader.get_changes()['roles'], {
+            'added': ['role_seven', 'role_three'],
+            'modified': [],
+            'removed': []
+        })
+
+        # Second run, nothing has changed so no file is loaded again
+        loader = get_loader(file_paths)
+        result = loader.load_role_definitions()
+        loader.save_manifest()
+
+        self.assertEqual(loader.load_role_definition_from_file.call_count, 0)
+        self.assertEqual(sorted(result.keys()), sorted(expected_result.keys()))
+        self.assertEqual(result['role_three'].permission_grants,
+                         expected_result['role_three'].permission_grants)
+        self.assertEqual(loader.get_changes()['roles'], {
+            'added': [],
+            'modified': [],
+            'removed': []
+        })
+
+        # Third run, one file has been modified and one removed
+        with open(file_paths[0], 'a') as fp:
+            fp.write('\n# comment\n')
+
+        loader = get_loader(file_paths[:1])
+        result = loader.load_role_definitions()
+
+        self.assertEqual(loader.load_role_definition_from_file.call_count, 1)
+        self.assertEqual(list(result.keys()), ['role_three'])
+        self.assertEqual(loader.get_changes()['roles'], {
+            'added': [],
+            'modified': ['role_three'],
+            'removed': ['role_seven']
+        })
+
     def test_load_role_definitions_disabled_role_definition(self):
         loader = RBACDefinitionsLoader()
 
@@ -16,6 +16,7 @@
 from __future__ import absolute_import
 
 import six
+import mock
 import unittest2
 from oslo_config import cfg
 
@@ -35,6 +36,8 @@ from st2common.models.db.pack import PackDB
 from st2common.rbac.migrations import insert_system_roles
 from st2tests.base import CleanDbTestCase
 
+from st2rbac_backend import resolvers
+from st2rbac_backend.cache import LRUCache
 from st2rbac_backend.backend import RBACBackend
 from st2rbac_backend.service import RBACService as rbac_service
 
@@ -307,3 +310,83 @@ class PermissionsResolverUtilsTestCase(unittest2.TestCase):
         self.assertRaisesRegexp(ValueError, expected_msg,
                                 self.backend.get_resolver_for_resource_type,
                                 resource_type='alias')
+
+    def test_get_resolver_returns_singleton_instances(self):
+        resolver_1 = self.backend.get_resolver_for_resource_type(resource_type=ResourceType.ACTION)
+        resolver_2 = self.backend.get_resolver_for_permission_type(
+            permission_type=PermissionType.ACTION_EXECUTE)
+        self.assertTrue(resolver_1 is resolver_2)
+
+        resolver_3 = self.backend.get_resolver_for_permission_type(
+            permission_type=PermissionType.EXECUTION_VIEWS_FILTERS_LIST)
+        self.assertTrue(isinstance(resolver_3, resolvers.ExecutionPermissionsResolver))
+
+    def test_register_resolver(self):
+        class MockResolver(resolvers.PermissionsResolver):
+            resource_type = 'mock_resource'
+
+        self.addCleanup(resolvers._RESOLVERS_BY_RESOURCE_TYPE.pop, 'mock_resource')
+        self.addCleanup(resolvers._PERMISSION_TYPE_TO_RESOURCE_TYPE.pop, 'mock_custom', None)
+        self.addCleanup(resolvers._PERMISSION_TYPE_TO_RESOURCE_TYPE.pop, 'mock_resource_view',
+                        None)
+
+        resolver = resolvers.register_resolver('mock_resource', MockResolver,
+                                               permission_types=['mock_custom'])
+
+        self.assertTrue(self.backend.get_resolver_for_resource_type('mock_resource') is resolver)
+        self.assertTrue(self.backend.get_resolver_for_permission_type('mock_resource_view') is
+                        resolver)
+        self.assertTrue(self.backend.get_resolver_for_permission_type('mock_custom') is resolver)
+
+    def test_decision_cache(self):
+        class MockResolver(resolvers.PermissionsResolver):
+            resource_type = ResourceType.PACK
+            calls = []
+
+            @resolvers.cached_permission_decision
+            def user_has_permission(self, user_db, permission_type):
+                self.calls.append(permission_type)
+                return False
+
+            @resolvers.cached_resource_db_permission_decision
+            def user_has_resource_db_permission(self, user_db, resource_db, permission_type):
+                self.calls.append(resource_db.get_uid())
+                return resource_db.ref == 'pack_1'
+
+        resolver = MockResolver()
+        user_db = UserDB(name='user_1')
+        pack_1_db = PackDB(ref='pack_1', name='pack_1')
+        pack_2_db = PackDB(ref='pack_2', name='pack_2')
+
+        # Cache disabled
+        with mock.patch.object(rbac_service, 'get_permission_decision_cache',
+                               mock.Mock(return_value=None)):
+            for _ in range(2):
+                resolver.user_has_resource_db_permission(
+                    user_db=user_db, resource_db=pack_1_db,
+                    permission_type=PermissionType.PACK_VIEW)
+
+        self.assertEqual(len(MockResolver.calls), 2)
+
+        # Cache enabled, denials are cached as well
+        cache = LRUCache(max_size=10, ttl=60)
+        MockResolver.calls = []
+
+        with mock.patch.object(rbac_service, 'get_permission_decision_cache',
+                               mock.Mock(return_value=cache)):
+            for _ in range(3):
+                self.assertTrue(resolver.user_has_resource_db_permission(
+                    user_db=user_db, resource_db=pack_1_db,
+                    permission_type=PermissionType.PACK_VIEW))
+                self.assertFalse(resolver.user_has_resource_db_permission(
+                    user_db, pack_2_db, PermissionType.PACK_VIEW))
+                self.assertFalse(resolver.user_has_permission(
+                    user_db=user_db, permission_type=PermissionType.PACK_LIST))
+
+            self.assertEqual(MockResolver.calls, ['pack:pack_1', 'pack:pack_2',
+                                                  PermissionType.PACK_LIST])
+            self.assertEqual(len(cache), 3)
+
+            cache.clear()
+            resolver.user_has_permission(user_db=user_db, permission_type=PermissionType.PACK_LIST)
+            self.assertEqual(len(MockResolver.calls), 4)
@@ -436,3 +436,92 @@ class ExecutionPermissionsResolverTestCase(BasePermissionsResolverTestCase):
             user_db=user_db,
             resource_db=resource_db,
             permission_types=all_permission_types)
+
+    def test_user_has_resource_db_permissions(self):
+        resolver = ExecutionPermissionsResolver()
+
+        runner = {'name': 'python-script'}
+        status = action_constants.LIVEACTION_STATUS_REQUESTED
+
+        # Execution of an action in an unrelated pack
+        action = {'uid': 'action:test_pack_1:action2', 'pack': 'test_pack_1'}
+        exec_2_db = ActionExecutionDB(action=action, runner=runner,
+                                      liveaction={'action': 'test_pack_1.action2'},
+                                      status=status)
+        exec_2_db = ActionExecution.add_or_update(exec_2_db)
+
+        resource_dbs = [self.resources['exec_1'], exec_2_db, self.resources['exec_1']]
+
+        # Admin user, should always return true
+        user_db = self.users['admin']
+        result = resolver.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=resource_dbs,
+            permission_type=PermissionType.EXECUTION_VIEW)
+        self.assertEqual(result, [True, True, True])
+
+        # No roles, should return false for everything
+        user_db = self.users['no_roles']
+        result = resolver.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=resource_dbs,
+            permission_type=PermissionType.EXECUTION_VIEW)
+        self.assertEqual(result, [False, False, False])
+
+        # Grant on the parent pack of the first execution action
+        user_db = self.users['custom_role_pack_action_view_grant']
+        result = resolver.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=resource_dbs,
+            permission_type=PermissionType.EXECUTION_VIEW)
+        self.assertEqual(result, [True, False, True])
+
+        result = resolver.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=resource_dbs,
+            permission_type=PermissionType.EXECUTION_STOP)
+        self.assertEqual(result, [False, False, False])
+
+        # Grant on the action of the first execution
+        user_db = self.users['custom_role_action_execute_grant']
+        result = resolver.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=resource_dbs,
+            permission_type=PermissionType.EXECUTION_STOP)
+        self.assertEqual(result, [True, False, True])
+
+        # Empty list of resources
+        result = resolver.user_has_resource_db_permissions(
+            user_db=user_db, resource_dbs=[], permission_type=PermissionType.EXECUTION_STOP)
+        self.assertEqual(result, [])
+
+    def test_get_resource_db_query_filter(self):
+        resolver = ExecutionPermissionsResolver()
+        permission_type = PermissionType.EXECUTION_VIEW
+
+        # Admin user, no filtering needed
+        user_db = self.users['admin']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(query_filter, None)
+
+        # No roles, filter shouldn't match anything
+        user_db = self.users['no_roles']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(ActionExecutionDB.objects(__raw__=query_filter).count(), 0)
+
+        # "action_view" grant on the parent pack of the action
+        user_db = self.users['custom_role_pack_action_view_grant']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(query_filter, {'action.pack': {'$in': ['test_pack_2']}})
+        self.assertEqual(ActionExecutionDB.objects(__raw__=query_filter).count(), 1)
+
+        # Grant doesn't cover the requested permission
+        query_filter = resolver.get_resource_db_query_filter(
+            user_db=user_db, permission_type=PermissionType.EXECUTION_STOP)
+        self.assertEqual(ActionExecutionDB.objects(__raw__=query_filter).count(), 0)
+
+        # "action_execute" grant on the action
+        user_db = self.users['custom_role_action_execute_grant']
+        query_filter = resolver.get_resource_db_query_filter(
+            user_db=user_db, permission_type=PermissionType.EXECUTION_STOP)
+        action_uid = self.resources['action_1'].get_uid()
+        self.assertEqual(query_filter, {'action.uid': {'$in': [action_uid]}})
+        self.assertEqual(ActionExecutionDB.objects(__raw__=query_filter).count(), 1)
@@ -437,3 +437,42 @@ class RuleEnforcementPermissionsResolverTestCase(BasePermissionsResolverTestCase
             user_db=user_db,
             resource_db=resource_db,
             permission_type=PermissionType.RULE_ENFORCEMENT_VIEW)
+
+    def test_get_resource_db_query_filter(self):
+        resolver = RuleEnforcementPermissionsResolver()
+        permission_type = PermissionType.RULE_ENFORCEMENT_VIEW
+
+        def get_enforcement_ids(query_filter):
+            enforcement_dbs = RuleEnforcementDB.objects(__raw__=query_filter)
+            return sorted([str(enforcement_db.id) for enforcement_db in enforcement_dbs])
+
+        # Admin user, no filtering needed
+        user_db = self.users['admin']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(query_filter, None)
+
+        # No roles, filter shouldn't match anything
+        user_db = self.users['no_roles']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(get_enforcement_ids(query_filter), [])
+
+        # "rule_view" grant on the parent pack of rule_1 and rule_2
+        user_db = self.users['custom_role_rule_pack_grant']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(query_filter, {'rule.ref': {'$regex': '^test_pack_1\\.'}})
+
+        expected_ids = sorted([str(self.resources['rule_enforcement_1'].id),
+                               str(self.resources['rule_enforcement_2'].id)])
+        self.assertEqual(get_enforcement_ids(query_filter), expected_ids)
+
+        # "rule_view" grant on rule_3
+        user_db = self.users['custom_role_rule_grant']
+        query_filter = resolver.get_resource_db_query_filter(user_db=user_db,
+                                                             permission_type=permission_type)
+        self.assertEqual(query_filter, {'rule.uid': {'$in': [self.resources['rule_3'].get_uid()]}})
+
+        expected_ids = [str(self.resources['rule_enforcement_3'].id)]
+        self.assertEqual(get_enforcement_ids(query_filter), expected_ids)
@@ -23,14 +23,21 @@ from st2common.rbac.types import PermissionType
 from st2common.rbac.types import ResourceType
 from st2common.rbac.types import SystemRole
 from st2common.persistence.auth import User
+from st2common.persistence.rbac import Role
 from st2common.persistence.rbac import UserRoleAssignment
+from st2common.persistence.rbac import PermissionGrant
 from st2common.persistence.rule import Rule
 from st2common.models.db.auth import UserDB
 from st2common.models.db.rbac import UserRoleAssignmentDB
 from st2common.models.db.rule import RuleDB
 from st2common.exceptions.db import StackStormDBObjectConflictError
 
+from st2rbac_backend.generation import get_generation
+from st2rbac_backend.generation import bump_generation
+from st2rbac_backend.index import DatabasePermissionIndex
+from st2rbac_backend.index import EffectivePermissionIndex
 from st2rbac_backend.service import RBACService as rbac_service
+from st2rbac_backend.service import _get_permission_grants_for_user_pipeline
 
 __all__ = [
     'RBACServiceTestCase'
@@ -178,6 +185,24 @@ class RBACServiceTestCase(CleanDbTestCase):
         self.assertRaisesRegexp(ValueError, expected_msg, rbac_service.create_role,
                                 name=SystemRole.OBSERVER)
 
+    def test_create_roles_with_permission_grants_failure_leaves_no_orphans(self):
+        permission_grants_count = PermissionGrant.count()
+        roles_count = Role.count()
+
+        # Second role already exists so the roles insert fails after the grants have been inserted
+        roles = [
+            ('new_role_1', 'description', [('pack:test1', ResourceType.PACK,
+                                            [PermissionType.PACK_VIEW])]),
+            ('custom_role_1', 'description', [('pack:test2', ResourceType.PACK,
+                                               [PermissionType.PACK_VIEW])])
+        ]
+        self.assertRaises(Exception, rbac_service.create_roles_with_permission_grants,
+                          roles=roles)
+
+        self.assertEqual(PermissionGrant.count(), permission_grants_count)
+        self.assertEqual(Role.count(), roles_count)
+        self.assertEqual(Role.query(name='new_role_1').count(), 0)
+
     def test_delete_system_role(self):
         # System roles can't be deleted
         system_roles = SystemRole.get_valid_values()
@@ -312,6 +337,245 @@ class RBACServiceTestCase(CleanDbTestCase):
             resource_types=[ResourceType.RULE])
         self.assertItemsEqual(permission_grants, [permission_grant])
 
+    def test_get_all_permission_grants_for_user_aggregation(self):
+        cfg.CONF.set_override(name='permission_grants_aggregation', override=True, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='permission_grants_aggregation',
+                        group='rbac')
+
+        # Both implementations should return the same results
+        self.test_get_all_permission_grants_for_user()
+
+        user_db = self.users['1_custom_role']
+        resource_db = self.resources['rule_1']
+
+        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_MODIFY])
+        self.assertEqual(len(permission_grants), 1)
+        self.assertEqual(permission_grants[0].resource_uid, resource_db.get_uid())
+
+        permission_grants = rbac_service.get_all_permission_grants_for_user(user_db=user_db,
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_DELETE])
+        self.assertEqual(permission_grants, [])
+
+        # User with no role assignments
+        permission_grants = rbac_service.get_all_permission_grants_for_user(
+            user_db=self.users['no_roles'])
+        self.assertEqual(permission_grants, [])
+
+    def test_get_permission_grants_for_user_pipeline(self):
+        user_db = self.users['1_custom_role']
+
+        pipeline = _get_permission_grants_for_user_pipeline(user_db=user_db,
+            resource_uid='rule:pack1:rule1', resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_VIEW])
+
+        # Grant filters are applied inside the permission grants lookup and not after the join
+        self.assertEqual([list(stage.keys())[0] for stage in pipeline],
+                         ['$match', '$lookup', '$unwind', '$unwind', '$group', '$lookup',
+                          '$unwind', '$replaceRoot'])
+
+        lookup = pipeline[5]['$lookup']
+        self.assertEqual(lookup['let'], {'permission_grant_ids': '$permission_grant_ids'})
+        self.assertNotIn('localField', lookup)
+        self.assertEqual(lookup['pipeline'], [
+            {'$match': {
+                '$expr': {'$in': ['$_id', '$$permission_grant_ids']},
+                'resource_uid': 'rule:pack1:rule1',
+                'resource_type': {'$in': [ResourceType.RULE]},
+                'permission_types': {'$in': [PermissionType.RULE_VIEW]}
+            }}
+        ])
+
+        # Existence check only retrieves the id of the first matching grant
+        pipeline = _get_permission_grants_for_user_pipeline(user_db=user_db, exists_only=True)
+        lookup = pipeline[5]['$lookup']
+        self.assertEqual(lookup['pipeline'], [
+            {'$match': {'$expr': {'$in': ['$_id', '$$permission_grant_ids']}}},
+            {'$limit': 1},
+            {'$project': {'_id': 1}}
+        ])
+
+    def test_user_has_any_permission_grant(self):
+        user_db = self.users['1_custom_role']
+        role_db = self.roles['custom_role_1']
+        resource_db = self.resources['rule_1']
+
+        self.assertFalse(rbac_service.user_has_any_permission_grant(user_db=user_db))
+
+        rbac_service.create_permission_grant_for_resource_db(
+            role_db=role_db,
+            resource_db=resource_db,
+            permission_types=[PermissionType.RULE_VIEW])
+
+        self.assertTrue(rbac_service.user_has_any_permission_grant(user_db=user_db))
+        self.assertTrue(rbac_service.user_has_any_permission_grant(user_db=user_db,
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_VIEW]))
+        self.assertFalse(rbac_service.user_has_any_permission_grant(user_db=user_db,
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_DELETE]))
+        self.assertFalse(rbac_service.user_has_any_permission_grant(user_db=user_db,
+            resource_types=[ResourceType.PACK]))
+        self.assertFalse(rbac_service.user_has_any_permission_grant(
+            user_db=self.users['no_roles']))
+
+        # Aggregation based implementation should return the same results
+        cfg.CONF.set_override(name='permission_grants_aggregation', override=True, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='permission_grants_aggregation',
+                        group='rbac')
+
+        self.assertTrue(rbac_service.user_has_any_permission_grant(user_db=user_db,
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_VIEW]))
+        self.assertFalse(rbac_service.user_has_any_permission_grant(user_db=user_db,
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_DELETE]))
+
+    def test_get_permission_index_for_user(self):
+        user_db = self.users['1_custom_role']
+        role_db = self.roles['custom_role_1']
+
+        # User with a single custom role and no grants
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertEqual(permission_index.role_names, frozenset(['custom_role_1']))
+        self.assertFalse(permission_index.is_system_admin)
+        self.assertFalse(permission_index.is_admin)
+        self.assertFalse(permission_index.is_observer)
+        self.assertFalse(permission_index.find_permission_grant(
+            permission_types=[PermissionType.RULE_CREATE]))
+
+        # Grant some permissions
+        resource_db = self.resources['rule_1']
+        permission_types = [PermissionType.RULE_CREATE, PermissionType.RULE_MODIFY]
+
+        permission_grant = rbac_service.create_permission_grant_for_resource_db(
+            role_db=role_db,
+            resource_db=resource_db,
+            permission_types=permission_types)
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+
+        grant_id = permission_index.find_permission_grant(
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_MODIFY])
+        self.assertEqual(grant_id, str(permission_grant.id))
+
+        self.assertTrue(permission_index.find_permission_grant(
+            resource_types=[ResourceType.RULE], permission_types=[PermissionType.RULE_CREATE]))
+        self.assertFalse(permission_index.find_permission_grant(
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.PACK],
+            permission_types=[PermissionType.RULE_CREATE]))
+        self.assertFalse(permission_index.find_permission_grant(
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_DELETE]))
+
+        # User with no roles
+        permission_index = rbac_service.get_permission_index_for_user(
+            user_db=self.users['no_roles'])
+        self.assertEqual(permission_index.role_names, frozenset([]))
+
+    def test_process_wide_cache_is_invalidated_on_changes(self):
+        cfg.CONF.set_override(name='cache_size', override=100, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='cache_size', group='rbac')
+        rbac_service.invalidate_caches()
+
+        user_db = self.users['1_custom_role']
+        role_db = self.roles['custom_role_1']
+        resource_db = self.resources['rule_1']
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertEqual(permission_index.role_names, frozenset(['custom_role_1']))
+
+        # Index should be served from the cache on subsequent calls
+        self.assertTrue(rbac_service.get_permission_index_for_user(user_db=user_db) is
+                        permission_index)
+        stats = rbac_service.get_cache_stats()
+        self.assertEqual(stats['permission_index']['hits'], 1)
+
+        # Granting a permission should invalidate the cache
+        rbac_service.create_permission_grant_for_resource_db(
+            role_db=role_db, resource_db=resource_db,
+            permission_types=[PermissionType.RULE_VIEW])
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertTrue(permission_index.find_permission_grant(
+            resource_uid=resource_db.get_uid(), resource_types=[ResourceType.RULE],
+            permission_types=[PermissionType.RULE_VIEW]))
+
+        # Role assignment change should invalidate the cache
+        rbac_service.assign_role_to_user(role_db=self.roles['custom_role_2'], user_db=user_db)
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertEqual(permission_index.role_names,
+                         frozenset(['custom_role_1', 'custom_role_2']))
+
+        role_names = [role_db.name for role_db in rbac_service.get_roles_for_user(user_db)]
+        self.assertItemsEqual(role_names, ['custom_role_1', 'custom_role_2'])
+
+        rbac_service.revoke_role_from_user(role_db=self.roles['custom_role_2'], user_db=user_db)
+
+        role_names = [role_db.name for role_db in rbac_service.get_roles_for_user(user_db)]
+        self.assertItemsEqual(role_names, ['custom_role_1'])
+
+    def test_decision_cache_is_purged_on_changes(self):
+        self.assertEqual(rbac_service.get_permission_decision_cache(), None)
+
+        cfg.CONF.set_override(name='decision_cache_size', override=100, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='decision_cache_size', group='rbac')
+        rbac_service.invalidate_caches()
+
+        user_db = self.users['1_custom_role']
+        cache = rbac_service.get_permission_decision_cache()
+        cache.set((user_db.name, PermissionType.RULE_VIEW, 'rule:pack1:rule_1', 'pack1'), False)
+        cache.set(('other_user', PermissionType.RULE_LIST, None, None), True)
+
+        # Role assignment change for a single user should purge all the cached decisions
+        rbac_service.assign_role_to_user(role_db=self.roles['custom_role_2'], user_db=user_db)
+        self.assertEqual(len(rbac_service.get_permission_decision_cache()), 0)
+
+        cache.set(('other_user', PermissionType.RULE_LIST, None, None), True)
+        rbac_service.create_role(name='decision_cache_role')
+        self.assertEqual(len(rbac_service.get_permission_decision_cache()), 0)
+
+    def test_generation_is_bumped_on_changes(self):
+        generation = get_generation()
+
+        rbac_service.create_role(name='generation_role')
+        self.assertEqual(get_generation(), generation + 1)
+
+        rbac_service.invalidate_caches()
+        self.assertEqual(get_generation(), generation + 2)
+
+    def test_process_wide_cache_is_invalidated_on_generation_change(self):
+        cfg.CONF.set_override(name='cache_size', override=100, group='rbac')
+        cfg.CONF.set_override(name='cache_generation_check_interval', override=0, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='cache_size', group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='cache_generation_check_interval',
+                        group='rbac')
+        rbac_service.invalidate_caches()
+
+        user_db = self.users['1_custom_role']
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertEqual(permission_index.role_names, frozenset(['custom_role_1']))
+
+        # Simulate another process changing the data directly in the database
+        role_assignment_db = UserRoleAssignmentDB(user=user_db.name, role='custom_role_2',
+                                                  source='assignments/%s.yaml' % user_db.name)
+        UserRoleAssignment.add_or_update(role_assignment_db)
+
+        # Stale data is served until the generation changes
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertEqual(permission_index.role_names, frozenset(['custom_role_1']))
+
+        bump_generation()
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertEqual(permission_index.role_names,
+                         frozenset(['custom_role_1', 'custom_role_2']))
+
     def test_create_and_remove_permission_grant(self):
         role_db = self.roles['custom_role_2']
         resource_db = self.resources['rule_1']
@@ -368,3 +632,57 @@ class RBACServiceTestCase(CleanDbTestCase):
                                 rbac_service.remove_permission_grant_for_resource_db,
                                 role_db=role_db, resource_db=resource_db,
                                 permission_types=permission_types)
+
+    def test_effective_permissions_are_maintained_incrementally(self):
+        cfg.CONF.set_override(name='effective_permissions', override=True, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='effective_permissions', group='rbac')
+
+        user_db = self.users['1_custom_role']
+        role_db = self.roles['custom_role_1']
+        resource_db = self.resources['rule_1']
+
+        # User hasn't been materialized yet, regular lookups are used
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertTrue(isinstance(permission_index, DatabasePermissionIndex))
+
+        # Grant is added to the user role, effective permissions are materialized
+        permission_grant_db = rbac_service.create_permission_grant_for_resource_db(
+            role_db=role_db, resource_db=resource_db, permission_types=[PermissionType.RULE_VIEW])
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertTrue(isinstance(permission_index, EffectivePermissionIndex))
+        self.assertEqual(permission_index.role_names, frozenset(['custom_role_1']))
+        self.assertTrue(permission_index.find_permission_grant(
+            permission_types=[PermissionType.RULE_VIEW], resource_uid=resource_db.get_uid(),
+            resource_types=[ResourceType.RULE]))
+        self.assertFalse(permission_index.find_permission_grant(
+            permission_types=[PermissionType.RULE_MODIFY], resource_uid=resource_db.get_uid(),
+            resource_types=[ResourceType.RULE]))
+        matched_grant = permission_index.find_resource_permission_grant(
+            resources=[('pack:test1', ResourceType.PACK),
+                       (resource_db.get_uid(), ResourceType.RULE)],
+            permission_types=[PermissionType.RULE_ALL, PermissionType.RULE_VIEW])
+        self.assertEqual((matched_grant.resource_uid, matched_grant.resource_type),
+                         (resource_db.get_uid(), ResourceType.RULE))
+        self.assertEqual(matched_grant.permission_grant_id, str(permission_grant_db.id))
+        self.assertEqual(permission_index.get_resource_uids(
+            resource_type=ResourceType.RULE, permission_types=[PermissionType.RULE_VIEW]),
+            set([resource_db.get_uid()]))
+
+        # Role is revoked from the user
+        rbac_service.revoke_role_from_user(role_db=role_db, user_db=user_db)
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertTrue(isinstance(permission_index, EffectivePermissionIndex))
+        self.assertEqual(permission_index.role_names, frozenset([]))
+        self.assertFalse(permission_index.find_permission_grant(
+            permission_types=[PermissionType.RULE_VIEW], resource_uid=resource_db.get_uid(),
+            resource_types=[ResourceType.RULE]))
+
+        # Role is assigned to the user again
+        rbac_service.assign_role_to_user(role_db=role_db, user_db=user_db)
+
+        permission_index = rbac_service.get_permission_index_for_user(user_db=user_db)
+        self.assertTrue(permission_index.find_permission_grant(
+            permission_types=[PermissionType.RULE_VIEW], resource_uid=resource_db.get_uid(),
+            resource_types=[ResourceType.RULE]))
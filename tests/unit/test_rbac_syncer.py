@@ -15,17 +15,22 @@
 
 from __future__ import absolute_import
 
+import mock
 from pymongo import MongoClient
 
+from oslo_config import cfg
+
 from st2tests.base import CleanDbTestCase
 from st2common.persistence.auth import User
 from st2common.persistence.rbac import Role
 from st2common.persistence.rbac import PermissionGrant
 from st2common.persistence.rbac import GroupToRoleMapping
+from st2common.persistence.rbac import UserRoleAssignment
 from st2common.models.db.auth import UserDB
 from st2common.models.db.rbac import UserRoleAssignmentDB
 from st2common.models.api.rbac import RoleDefinitionFileFormatAPI
 from st2common.models.api.rbac import UserRoleAssignmentFileFormatAPI
+from st2rbac_backend.mappings import invalidate_group_to_role_maps_table
 from st2rbac_backend.service import RBACService as rbac_service
 from st2rbac_backend.syncer import RBACDefinitionsDBSyncer
 from st2rbac_backend.syncer import RBACRemoteGroupToRoleSyncer
@@ -163,6 +168,97 @@ class RBACDefinitionsDBSyncerTestCase(BaseRBACDefinitionsDBSyncerTestCase):
         self.assertEqual(grant_db.resource_type, None)
         self.assertEqual(grant_db.permission_types, permission_grants[2]['permission_types'])
 
+    @mock.patch.object(rbac_service, 'create_permission_grant')
+    @mock.patch.object(rbac_service, 'create_role')
+    def test_sync_roles_uses_bulk_inserts(self, mock_create_role, mock_create_permission_grant):
+        syncer = RBACDefinitionsDBSyncer()
+
+        apis = []
+        for index in range(0, 3):
+            permission_grants = [
+                {
+                    'resource_uid': 'pack:pack_%s_%s' % (index, grant_index),
+                    'permission_types': ['pack_all']
+                }
+                for grant_index in range(0, index)
+            ]
+            api = RoleDefinitionFileFormatAPI(name='test_role_%s' % (index),
+                                              description='description %s' % (index),
+                                              permission_grants=permission_grants)
+            apis.append(api)
+
+        created_role_dbs, _ = syncer.sync_roles(role_definition_apis=apis)
+
+        # Roles and grants should be inserted in bulk and not one by one
+        self.assertEqual(mock_create_role.call_count, 0)
+        self.assertEqual(mock_create_permission_grant.call_count, 0)
+
+        self.assertEqual([role_db.name for role_db in created_role_dbs],
+                         ['test_role_0', 'test_role_1', 'test_role_2'])
+
+        for index, created_role_db in enumerate(created_role_dbs):
+            role_db = Role.get(name=created_role_db.name)
+            self.assertEqual(role_db.id, created_role_db.id)
+            self.assertEqual(role_db.description, 'description %s' % (index))
+            self.assertEqual(role_db.permission_grants, created_role_db.permission_grants)
+            self.assertEqual(len(role_db.permission_grants), index)
+
+            for grant_index, permission_grant_id in enumerate(role_db.permission_grants):
+                grant_db = PermissionGrant.get_by_id(permission_grant_id)
+                self.assertEqual(grant_db.resource_uid, 'pack:pack_%s_%s' % (index, grant_index))
+                self.assertEqual(grant_db.resource_type, 'pack')
+
+    @mock.patch('st2rbac_backend.syncer.LOG')
+    def test_sync_roles_logs_round_trips_saved(self, mock_log):
+        syncer = RBACDefinitionsDBSyncer()
+
+        def get_apis(description_2):
+            apis = []
+            for index in range(0, 3):
+                permission_grants = [
+                    {
+                        'resource_uid': 'pack:pack_%s_%s' % (index, grant_index),
+                        'permission_types': ['pack_all']
+                    }
+                    for grant_index in range(0, index)
+                ]
+                description = description_2 if index == 2 else 'description %s' % (index)
+                api = RoleDefinitionFileFormatAPI(name='test_role_%s' % (index),
+                                                  description=description,
+                                                  permission_grants=permission_grants)
+                apis.append(api)
+            return apis
+
+        def get_synchronized_message():
+            messages = [call[0][0] for call in mock_log.info.call_args_list
+                        if call[0][0].startswith('Roles synchronized')]
+            self.assertEqual(len(messages), 1)
+            mock_log.reset_mock()
+            return messages[0]
+
+        # 3 roles with 3 grants in total are written using one grants and one roles insert vs 3
+        # role writes and 6 grant writes
+        syncer.sync_roles(role_definition_apis=get_apis('description 2'))
+        self.assertEqual(get_synchronized_message(),
+                         'Roles synchronized (3 created, 0 updated, 0 unchanged, 0 removed, 2 '
+                         'database writes issued vs 9 with per-grant writes, 7 round trips '
+                         'saved)')
+
+        # Role 0 is removed and role 2 (2 grants) is updated. Stale roles and grants are removed
+        # using one delete each
+        syncer.sync_roles(role_definition_apis=get_apis('updated description')[1:])
+        self.assertEqual(get_synchronized_message(),
+                         'Roles synchronized (0 created, 1 updated, 1 unchanged, 1 removed, 4 '
+                         'database writes issued vs 7 with per-grant writes, 3 round trips '
+                         'saved)')
+
+        # Nothing changed, nothing is written
+        syncer.sync_roles(role_definition_apis=get_apis('updated description')[1:])
+        self.assertEqual(get_synchronized_message(),
+                         'Roles synchronized (0 created, 0 updated, 2 unchanged, 0 removed, 0 '
+                         'database writes issued vs 0 with per-grant writes, 0 round trips '
+                         'saved)')
+
     def test_sync_roles_locally_removed_roles_are_removed_from_db(self):
         syncer = RBACDefinitionsDBSyncer()
 
@@ -182,16 +278,65 @@ class RBACDefinitionsDBSyncerTestCase(BaseRBACDefinitionsDBSyncerTestCase):
         self.assertRoleDBObjectExists(role_db=created_role_dbs[0])
         self.assertRoleDBObjectExists(role_db=created_role_dbs[1])
 
-        # We sync again, this time with one role (role 1) removed locally
+        # We sync again, this time with one role (role 1) removed locally. Role 2 hasn't changed
+        # so it's left alone
         created_role_dbs, deleted_role_dbs = syncer.sync_roles(role_definition_apis=[api2])
-        self.assertEqual(len(created_role_dbs), 1)
-        self.assertEqual(len(deleted_role_dbs), 2)
+        self.assertEqual(len(created_role_dbs), 0)
+        self.assertEqual(len(deleted_role_dbs), 1)
+        self.assertEqual(deleted_role_dbs[0].name, 'test_role_1')
 
         # Assert role and grants have been created in the DB
         self.assertEqual(len(Role.get_all()), 1)
-        self.assertRoleDBObjectExists(role_db=created_role_dbs[0])
         self.assertEqual(Role.get_all()[0].name, 'test_role_2')
 
+    def test_sync_roles_unchanged_roles_are_not_recreated(self):
+        syncer = RBACDefinitionsDBSyncer()
+
+        permission_grants = [
+            {
+                'resource_uid': 'pack:mapack1',
+                'permission_types': ['pack_all']
+            },
+            {
+                'permission_types': ['sensor_list', 'action_list']
+            }
+        ]
+        api1 = RoleDefinitionFileFormatAPI(name='test_role_1', description='test description 1',
+                                           permission_grants=permission_grants)
+        api2 = RoleDefinitionFileFormatAPI(name='test_role_2', description='test description 2',
+                                           permission_grants=[])
+        created_role_dbs, _ = syncer.sync_roles(role_definition_apis=[api1, api2])
+        self.assertEqual(len(created_role_dbs), 2)
+        role_1_db = Role.get(name='test_role_1')
+
+        # Order of the grants and permission types doesn't affect the digest
+        permission_grants = [
+            {
+                'permission_types': ['action_list', 'sensor_list']
+            },
+            {
+                'resource_uid': 'pack:mapack1',
+                'permission_types': ['pack_all']
+            }
+        ]
+        api1 = RoleDefinitionFileFormatAPI(name='test_role_1', description='test description 1',
+                                           permission_grants=permission_grants)
+        api2 = RoleDefinitionFileFormatAPI(name='test_role_2', description='updated description',
+                                           permission_grants=[])
+        created_role_dbs, deleted_role_dbs = syncer.sync_roles(role_definition_apis=[api1, api2])
+        self.assertEqual([role_db.name for role_db in created_role_dbs], ['test_role_2'])
+        self.assertEqual([role_db.name for role_db in deleted_role_dbs], ['test_role_2'])
+        self.assertEqual(Role.get(name='test_role_1').id, role_1_db.id)
+        self.assertEqual(Role.get(name='test_role_2').description, 'updated description')
+
+        # Manipulating grants directly invalidates the digest
+        rbac_service.create_permission_grant(role_db=role_1_db, resource_uid=None,
+                                             resource_type=None,
+                                             permission_types=['rule_list'])
+        created_role_dbs, deleted_role_dbs = syncer.sync_roles(role_definition_apis=[api1, api2])
+        self.assertEqual([role_db.name for role_db in created_role_dbs], ['test_role_1'])
+        self.assertEqual(len(Role.get(name='test_role_1').permission_grants), 2)
+
     def test_sync_user_assignments_single_role_assignment(self):
         syncer = RBACDefinitionsDBSyncer()
 
@@ -321,6 +466,90 @@ class RBACDefinitionsDBSyncerTestCase(BaseRBACDefinitionsDBSyncerTestCase):
         sources = [r.source for r in role_assignment_dbs]
         self.assertIn('assignments/user2b.yaml', sources)
 
+    @mock.patch.object(rbac_service, 'assign_role_to_user')
+    def test_sync_user_assignments_uses_bulk_operations(self, mock_assign_role_to_user):
+        syncer = RBACDefinitionsDBSyncer()
+
+        self._insert_mock_roles()
+
+        apis = [
+            UserRoleAssignmentFileFormatAPI(username='user_1', roles=['role_1', 'role_2'],
+                                            file_path='assignments/user1.yaml'),
+            UserRoleAssignmentFileFormatAPI(username='user_2', roles=['role_1'],
+                                            file_path='assignments/user2.yaml'),
+            UserRoleAssignmentFileFormatAPI(username='user_7', roles=['role_3'],
+                                            file_path='assignments/user7.yaml')
+        ]
+        results = syncer.sync_users_role_assignments(role_assignment_apis=apis)
+
+        self.assertEqual(mock_assign_role_to_user.call_count, 0)
+        self.assertEqual(len(results['user_1'][0]), 2)
+        self.assertEqual(len(results['user_7'][0]), 1)
+
+        # Assignment for user which doesn't exist in the database yet should be created as well
+        role_dbs = rbac_service.get_roles_for_user(user_db=UserDB(name='user_7'))
+        self.assertEqual(list(role_dbs), [self.roles['role_3']])
+
+        role_assignment_dbs = rbac_service.get_role_assignments_for_user(
+            user_db=self.users['user_1'])
+        role_assignment_ids = sorted([str(role_assignment_db.id) for role_assignment_db in
+                                      role_assignment_dbs])
+        self.assertEqual(sorted([str(role_assignment_db.id) for role_assignment_db in
+                                 results['user_1'][0]]), role_assignment_ids)
+
+        # Unchanged assignments should be left alone
+        apis[1] = UserRoleAssignmentFileFormatAPI(username='user_2', roles=['role_2'],
+                                                  file_path='assignments/user2.yaml')
+        results = syncer.sync_users_role_assignments(role_assignment_apis=apis)
+
+        self.assertEqual(results['user_1'], ([], []))
+        self.assertEqual(len(results['user_2'][0]), 1)
+        self.assertEqual(len(results['user_2'][1]), 1)
+
+        role_assignment_dbs = rbac_service.get_role_assignments_for_user(
+            user_db=self.users['user_1'])
+        self.assertEqual(sorted([str(role_assignment_db.id) for role_assignment_db in
+                                 role_assignment_dbs]), role_assignment_ids)
+
+        role_dbs = rbac_service.get_roles_for_user(user_db=self.users['user_2'])
+        self.assertEqual(list(role_dbs), [self.roles['role_2']])
+
+    def test_sync_user_assignments_for_subset_of_users(self):
+        syncer = RBACDefinitionsDBSyncer()
+
+        self._insert_mock_roles()
+
+        apis = [
+            UserRoleAssignmentFileFormatAPI(username='user_1', roles=['role_1'],
+                                            file_path='assignments/user1.yaml'),
+            UserRoleAssignmentFileFormatAPI(username='user_2', roles=['role_2'],
+                                            file_path='assignments/user2.yaml')
+        ]
+        syncer.sync_users_role_assignments(role_assignment_apis=apis)
+
+        # Only assignments for the provided users are touched, assignments for the other users
+        # are left alone even though they are not in the provided list
+        api = UserRoleAssignmentFileFormatAPI(username='user_1', roles=['role_3'],
+                                              file_path='assignments/user1.yaml')
+        results = syncer.sync_users_role_assignments(role_assignment_apis=[api],
+                                                     usernames=['user_1'])
+
+        self.assertEqual(list(results.keys()), ['user_1'])
+
+        role_dbs = rbac_service.get_roles_for_user(user_db=self.users['user_1'])
+        self.assertEqual(list(role_dbs), [self.roles['role_3']])
+
+        role_dbs = rbac_service.get_roles_for_user(user_db=self.users['user_2'])
+        self.assertEqual(list(role_dbs), [self.roles['role_2']])
+
+        # Assignments for removed users are removed
+        results = syncer.sync_users_role_assignments(role_assignment_apis=apis[1:],
+                                                     usernames=['user_1'])
+        self.assertEqual(len(results['user_1'][1]), 1)
+
+        role_dbs = rbac_service.get_roles_for_user(user_db=self.users['user_1'])
+        self.assertItemsEqual(role_dbs, [])
+
     def test_sync_user_assignments_locally_removed_assignments_are_removed_from_db(self):
         syncer = RBACDefinitionsDBSyncer()
 
@@ -772,9 +1001,12 @@ class RBACRemoteGroupToRoleSyncerTestCase(BaseRBACDefinitionsDBSyncerTestCase):
         result = syncer.sync(user_db=self.users['user_1'], groups=groups)
         created_role_assignment_dbs = result[0]
         removed_role_assignment_dbs = result[1]
-        self.assertEqual(len(created_role_assignment_dbs), 1)
-        self.assertEqual(len(removed_role_assignment_dbs), 2)
-        self.assertEqual(created_role_assignment_dbs[0].role, 'mock_remote_role_3')
+
+        # Only the assignment for the removed group should be removed, the other one is left alone
+        self.assertEqual(created_role_assignment_dbs, [])
+        self.assertEqual(len(removed_role_assignment_dbs), 1)
+        self.assertEqual(removed_role_assignment_dbs[0].role, 'mock_remote_role_3')
+        self.assertEqual(removed_role_assignment_dbs[0].source, 'mappings/testers.yaml')
 
         role_assignment_dbs = rbac_service.get_role_assignments_for_user(
             user_db=self.users['user_1'])
@@ -915,11 +1147,9 @@ class RBACRemoteGroupToRoleSyncerTestCase(BaseRBACDefinitionsDBSyncerTestCase):
         result = syncer.sync(user_db=self.users['user_1'], groups=groups)
         created_role_assignment_dbs = result[0]
         removed_role_assignment_dbs = result[1]
-        self.assertEqual(len(created_role_assignment_dbs), 1)
-        self.assertEqual(len(removed_role_assignment_dbs), 2)
-        self.assertEqual(created_role_assignment_dbs[0].role, 'mock_remote_role_3')
-        self.assertEqual(removed_role_assignment_dbs[0].role, 'mock_remote_role_3')
-        self.assertEqual(removed_role_assignment_dbs[1].role, 'mock_remote_role_4')
+        self.assertEqual(created_role_assignment_dbs, [])
+        self.assertEqual(len(removed_role_assignment_dbs), 1)
+        self.assertEqual(removed_role_assignment_dbs[0].role, 'mock_remote_role_4')
 
         # Verify post sync run state - mock_remote_role_4 assignment should be removed
         role_dbs = rbac_service.get_roles_for_user(user_db=user_db, include_remote=True)
@@ -928,6 +1158,121 @@ class RBACRemoteGroupToRoleSyncerTestCase(BaseRBACDefinitionsDBSyncerTestCase):
         self.assertEqual(role_dbs[1], self.roles['mock_local_role_2'])
         self.assertEqual(role_dbs[2], self.roles['mock_remote_role_3'])
 
+    def test_sync_unchanged_assignments_are_not_rewritten(self):
+        syncer = RBACRemoteGroupToRoleSyncer()
+        user_db = self.users['user_1']
+
+        rbac_service.create_group_to_role_map(group='CN=stormers,OU=groups,DC=stackstorm,DC=net',
+                                              roles=['mock_remote_role_3', 'mock_remote_role_4'],
+                                              source='mappings/stormers.yaml')
+
+        groups = ['CN=stormers,OU=groups,DC=stackstorm,DC=net']
+
+        result = syncer.sync(user_db=user_db, groups=groups)
+        self.assertEqual(len(result[0]), 2)
+        self.assertEqual(result[1], [])
+
+        role_assignment_ids = sorted([str(role_assignment_db.id) for role_assignment_db in
+                                      UserRoleAssignment.query(user=user_db.name,
+                                                               is_remote=True)])
+        self.assertEqual(sorted([str(role_assignment_db.id) for role_assignment_db in result[0]]),
+                         role_assignment_ids)
+
+        # Nothing has changed so nothing should be written
+        with mock.patch.object(rbac_service, 'invalidate_caches') as mock_invalidate_caches:
+            result = syncer.sync(user_db=user_db, groups=groups)
+
+        self.assertEqual(result, ([], []))
+        self.assertEqual(mock_invalidate_caches.call_count, 0)
+        self.assertEqual(sorted([str(role_assignment_db.id) for role_assignment_db in
+                                 UserRoleAssignment.query(user=user_db.name, is_remote=True)]),
+                         role_assignment_ids)
+
+    def test_sync_is_skipped_when_fingerprint_is_unchanged(self):
+        cfg.CONF.set_override(name='remote_group_sync_fingerprint', override=True, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='remote_group_sync_fingerprint',
+                        group='rbac')
+
+        syncer = RBACRemoteGroupToRoleSyncer()
+        user_db = self.users['user_1']
+
+        rbac_service.create_group_to_role_map(group='CN=stormers,OU=groups,DC=stackstorm,DC=net',
+                                              roles=['mock_remote_role_3'],
+                                              source='mappings/stormers.yaml')
+
+        groups = ['CN=stormers,OU=groups,DC=stackstorm,DC=net']
+
+        result = syncer.sync(user_db=user_db, groups=groups)
+        self.assertEqual(len(result[0]), 1)
+
+        # Groups and mappings haven't changed, mappings shouldn't even be retrieved
+        with mock.patch.object(GroupToRoleMapping, 'query') as mock_query:
+            result = syncer.sync(user_db=user_db, groups=groups)
+
+        self.assertEqual(result, ([], []))
+        self.assertEqual(mock_query.call_count, 0)
+
+        # Groups changed
+        groups.append('CN=testers,OU=groups,DC=stackstorm,DC=net')
+        rbac_service.create_group_to_role_map(group='CN=testers,OU=groups,DC=stackstorm,DC=net',
+                                              roles=['mock_remote_role_4'],
+                                              source='mappings/testers.yaml')
+
+        result = syncer.sync(user_db=user_db, groups=groups)
+        self.assertEqual(len(result[0]), 1)
+        self.assertEqual(result[0][0].role, 'mock_remote_role_4')
+
+        # Remote assignment revoked outside of the syncer, fingerprint is discarded
+        rbac_service.revoke_role_from_user(role_db=self.roles['mock_remote_role_4'],
+                                           user_db=user_db)
+
+        result = syncer.sync(user_db=user_db, groups=groups)
+        self.assertEqual(len(result[0]), 1)
+        self.assertEqual(result[0][0].role, 'mock_remote_role_4')
+
+    def test_sync_with_compiled_group_to_role_maps_table(self):
+        cfg.CONF.set_override(name='group_to_role_maps_cache', override=True, group='rbac')
+        self.addCleanup(cfg.CONF.clear_override, name='group_to_role_maps_cache', group='rbac')
+        self.addCleanup(invalidate_group_to_role_maps_table)
+
+        syncer = RBACRemoteGroupToRoleSyncer()
+        user_db = self.users['user_1']
+
+        rbac_service.create_group_to_role_map(group='CN=stormers,OU=groups,DC=stackstorm,DC=net',
+                                              roles=['mock_remote_role_3', 'doesnt_exist'],
+                                              source='mappings/stormers.yaml')
+
+        groups = [
+            'CN=stormers,OU=groups,DC=stackstorm,DC=net',
+            'CN=testers,OU=groups,DC=stackstorm,DC=net'
+        ]
+
+        result = syncer.sync(user_db=user_db, groups=groups)
+        self.assertEqual(len(result[0]), 1)
+        self.assertEqual(result[0][0].role, 'mock_remote_role_3')
+
+        # Table has already been compiled, no mapping and role queries should be performed
+        with mock.patch.object(GroupToRoleMapping, 'query') as mock_mapping_query:
+            with mock.patch.object(Role, 'query') as mock_role_query:
+                result = syncer.sync(user_db=user_db, groups=groups)
+
+        self.assertEqual(result, ([], []))
+        self.assertEqual(mock_mapping_query.call_count, 0)
+        self.assertEqual(mock_role_query.call_count, 0)
+
+        # Mapping created through the service, table is rebuilt
+        rbac_service.create_group_to_role_map(group='CN=testers,OU=groups,DC=stackstorm,DC=net',
+                                              roles=['mock_remote_role_4'],
+                                              source='mappings/testers.yaml')
+
+        result = syncer.sync(user_db=user_db, groups=groups)
+        self.assertEqual(len(result[0]), 1)
+        self.assertEqual(result[0][0].role, 'mock_remote_role_4')
+
+        role_dbs = rbac_service.get_roles_for_user(user_db=user_db, include_remote=True)
+        self.assertEqual(role_dbs[2], self.roles['mock_remote_role_3'])
+        self.assertEqual(role_dbs[3], self.roles['mock_remote_role_4'])
+
     def test_no_mappings_in_db_old_mappings_are_deleted(self):
         # Test case which verifies that existing / old mappings are deleted from db if no mappings
         # exist on disk for a particular set of groups.
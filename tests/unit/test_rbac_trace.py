@@ -0,0 +1,153 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from st2common.models.db.auth import UserDB
+from st2common.models.db.action import ActionDB
+from st2common.constants.triggers import WEBHOOK_TRIGGER_TYPE
+from st2common.rbac.types import PermissionType
+from st2common.rbac.types import ResourceType
+
+from st2rbac_backend import trace as decision_trace
+from st2rbac_backend.index import UserPermissionIndex
+from st2rbac_backend.resolvers import ActionPermissionsResolver
+from st2rbac_backend.resolvers import RulePermissionsResolver
+from st2rbac_backend.resolvers import WebhookPermissionsResolver
+
+__all__ = [
+    'DecisionTraceTestCase'
+]
+
+MOCK_PERMISSION_GRANTS = [
+    ('grant_1', 'pack:test_pack_1', ResourceType.PACK, [PermissionType.ACTION_EXECUTE]),
+    ('grant_2', 'webhook:git', ResourceType.WEBHOOK, [PermissionType.WEBHOOK_CREATE])
+]
+
+
+class DecisionTraceTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(DecisionTraceTestCase, self).setUp()
+
+        self.records = []
+        decision_trace.add_listener(self.records.append)
+
+        self.user_db = UserDB(name='user_1')
+        self.resolver = ActionPermissionsResolver()
+
+        self.permission_index = UserPermissionIndex(username='user_1',
+                                                    role_names=['custom_role_1'],
+                                                    permission_grants=MOCK_PERMISSION_GRANTS)
+
+        for resolver_cls in [ActionPermissionsResolver, WebhookPermissionsResolver]:
+            patcher = mock.patch.object(resolver_cls, '_get_permission_index',
+                                        mock.Mock(return_value=self.permission_index))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        super(DecisionTraceTestCase, self).tearDown()
+
+        decision_trace.remove_listener(self.records.append)
+        decision_trace.configure(enabled=False, sample_rate=0)
+
+    def _check(self, pack):
+        action_db = ActionDB(pack=pack, name='action_1', entry_point='',
+                             runner_type={'name': 'local-shell-cmd'})
+        return self.resolver.user_has_resource_db_permission(
+            user_db=self.user_db, resource_db=action_db,
+            permission_type=PermissionType.ACTION_EXECUTE)
+
+    def test_tracing_disabled(self):
+        decision_trace.configure(enabled=False, sample_rate=0)
+        self.assertFalse(decision_trace.ACTIVE)
+
+        self.assertTrue(self._check(pack='test_pack_1'))
+        self.assertEqual(self.records, [])
+
+    def test_tracing_enabled_records_decision(self):
+        decision_trace.configure(enabled=True, sample_rate=0)
+        self.assertTrue(decision_trace.ACTIVE)
+
+        self.assertTrue(self._check(pack='test_pack_1'))
+        self.assertFalse(self._check(pack='test_pack_2'))
+
+        self.assertEqual(len(self.records), 2)
+
+        record = self.records[0]
+        self.assertEqual(record['resolver'], 'ActionPermissionsResolver')
+        self.assertEqual(record['method'], '_user_has_resource_permission')
+        self.assertEqual(record['context']['resource_uid'], 'action:test_pack_1:action_1')
+        self.assertEqual(record['matched'], 'grant_1')
+        self.assertEqual(record['steps'][-1], 'Found a grant on the action parent pack')
+        self.assertTrue(record['outcome'])
+
+        record = self.records[1]
+        self.assertEqual(record['matched'], None)
+        self.assertEqual(record['steps'][-1], 'No matching grants found')
+        self.assertFalse(record['outcome'])
+
+    @mock.patch('st2rbac_backend.trace.random.random')
+    def test_tracing_sampled(self, mock_random):
+        decision_trace.configure(enabled=False, sample_rate=0.1)
+        self.assertTrue(decision_trace.ACTIVE)
+
+        mock_random.return_value = 0.5
+        self._check(pack='test_pack_1')
+        self.assertEqual(self.records, [])
+
+        mock_random.return_value = 0.05
+        self._check(pack='test_pack_1')
+        self.assertEqual(len(self.records), 1)
+
+    def test_nested_checks_are_recorded_in_a_single_trace(self):
+        decision_trace.configure(enabled=True, sample_rate=0)
+
+        # Rule trigger check delegates to the webhook resolver
+        resolver = RulePermissionsResolver()
+        trigger = {'type': WEBHOOK_TRIGGER_TYPE, 'parameters': {'url': 'git'}}
+        self.assertTrue(resolver.user_has_trigger_permission(user_db=self.user_db,
+                                                             trigger=trigger))
+
+        self.assertEqual(len(self.records), 1)
+
+        record = self.records[0]
+        self.assertEqual(record['resolver'], 'RulePermissionsResolver')
+        self.assertEqual(record['method'], 'user_has_trigger_permission')
+        self.assertEqual(record['matched'], 'grant_2')
+        self.assertEqual(record['steps'], [
+            'WebhookPermissionsResolver.user_has_resource_db_permission: Found a grant on the '
+            'webhook',
+            'Found a matching trigger grant'
+        ])
+        self.assertTrue(record['outcome'])
+
+    def test_trace_of_failed_check_is_discarded(self):
+        decision_trace.configure(enabled=True, sample_rate=0)
+
+        ActionPermissionsResolver._get_permission_index.side_effect = [Exception('failure'),
+                                                                      self.permission_index]
+
+        self.assertRaises(Exception, self._check, pack='test_pack_1')
+        self.assertEqual(self.records, [])
+
+        # Trace of the failed check is not treated as active so the next check is emitted
+        self.assertTrue(self._check(pack='test_pack_1'))
+        self.assertEqual(len(self.records), 1)
+        self.assertEqual(self.records[0]['steps'][0],
+                         'Checking grants via system role permissions')
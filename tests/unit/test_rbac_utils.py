@@ -25,6 +25,7 @@ from st2common.models.db.rbac import UserRoleAssignmentDB
 from st2common.rbac.types import SystemRole
 from st2common.rbac.migrations import insert_system_roles
 
+from st2rbac_backend.cache import reset_request_scope_stats
 from st2rbac_backend.utils import RBACUtils as rbac_utils
 
 __all__ = [
@@ -97,3 +98,21 @@ class RBACUtilsTestCase(DbTestCase):
 
         # Regular user
         self.assertFalse(rbac_utils.user_has_role(user_db=self.regular_user, role=SystemRole.ADMIN))
+
+    def test_request_scope_memoizes_role_lookups(self):
+        # Make sure RBAC is enabled for the tests
+        cfg.CONF.set_override(name='enable', override=True, group='rbac')
+        reset_request_scope_stats()
+
+        with rbac_utils.request_scope():
+            # user_is_admin checks both system_admin and admin role which means the second check
+            # should be served from the request scope
+            self.assertFalse(rbac_utils.user_is_admin(user_db=self.regular_user))
+            self.assertTrue(rbac_utils.user_is_admin(user_db=self.admin_user))
+            self.assertTrue(rbac_utils.user_has_role(user_db=self.admin_user,
+                                                     role=SystemRole.ADMIN))
+
+        stats = rbac_utils.get_request_scope_stats()
+        self.assertEqual(stats['scopes'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hits'], 3)
@@ -0,0 +1,76 @@
+# Copyright 2020 The StackStorm Authors
+# Copyright (C) 2020 Extreme Networks, Inc - All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+import unittest2
+
+from st2rbac_backend.watcher import PollingWatcher
+
+__all__ = [
+    'PollingWatcherTestCase'
+]
+
+
+class PollingWatcherTestCase(unittest2.TestCase):
+    def setUp(self):
+        super(PollingWatcherTestCase, self).setUp()
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def _write_file(self, file_name, content):
+        with open(os.path.join(self.temp_dir, file_name), 'w') as fp:
+            fp.write(content)
+
+    def test_wait(self):
+        self._write_file('role_one.yaml', 'name: role_one\n')
+
+        watcher = PollingWatcher(paths=[self.temp_dir], poll_interval=0.01)
+        self.assertFalse(watcher.wait(timeout=0.05))
+
+        # New file
+        self._write_file('role_two.yaml', 'name: role_two\n')
+        self.assertTrue(watcher.wait(timeout=0.05))
+        self.assertFalse(watcher.wait(timeout=0.05))
+
+        # Modified file
+        self._write_file('role_one.yaml', 'name: role_one\ndescription: changed\n')
+        self.assertTrue(watcher.wait(timeout=0.05))
+
+        # Removed file
+        os.remove(os.path.join(self.temp_dir, 'role_two.yaml'))
+        self.assertTrue(watcher.wait(timeout=0.05))
+
+        # Non definition files are ignored
+        self._write_file('.role_one.yaml.swp', 'foo')
+        self.assertFalse(watcher.wait(timeout=0.05))
+
+    def test_wait_directory_created_later(self):
+        path = os.path.join(self.temp_dir, 'assignments')
+
+        watcher = PollingWatcher(paths=[path], poll_interval=0.01)
+        self.assertFalse(watcher.wait(timeout=0.05))
+
+        # Directory is created, but it's still empty
+        os.mkdir(path)
+        self.assertFalse(watcher.wait(timeout=0.05))
+
+        self._write_file(os.path.join('assignments', 'user_one.yaml'), 'username: user_one\n')
+        self.assertTrue(watcher.wait(timeout=0.05))